@@ -2,18 +2,24 @@ import os
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Callable
 import streamlit as st
 from streamlit_chat import message
 
 # Local imports
-from memory_agent import conversation_graph, search_memories, store_interaction
+from memory_agent import (
+    run_turn, warmup, get_search_cache_stats, get_semantic_cache_stats, get_stage_latency_summary,
+    get_storage_gate_stats, get_memory_dedup_stats
+)
+from metrics import start_metrics_exporters
+from user_registry import get_user_registry
+from qdrant_pool import get_qdrant_client
+from setup_qdrant import ensure_payload_indexes
 from config import Config
 
 # Additional imports for user management
 try:
-    from qdrant_client import QdrantClient
-    from qdrant_client.models import Filter, FieldCondition, MatchAny, models
+    from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
     QDRANT_AVAILABLE = True
 except ImportError:
     QDRANT_AVAILABLE = False
@@ -113,88 +119,97 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def get_user_statistics(user_id: str) -> Dict[str, Any]:
+@st.cache_resource
+def ensure_memory_indexes(collection_name: str) -> bool:
+    """Create missing payload indexes once per process rather than on every rerun."""
+    ensure_payload_indexes(get_qdrant_client(), collection_name)
+    return True
+
+def get_user_memory_counts(user_ids: List[str]) -> Dict[str, int]:
+    """
+    Count stored memories for a batch of users with a single Qdrant query.
+    Returns a mapping of user ID to memory count for users that have memories.
+    """
+    user_ids = [user_id for user_id in user_ids if user_id]
+    if not user_ids or not QDRANT_AVAILABLE:
+        return {}
+
+    try:
+        collection_name = Config.get_qdrant_config()["config"]["collection_name"]
+        client = get_qdrant_client()
+
+        user_filter = Filter(
+            must=[
+                FieldCondition(
+                    key="user_id",
+                    match=MatchAny(any=user_ids)
+                )
+            ]
+        )
+
+        # Facet counts need a keyword index on user_id; only missing indexes are created
+        try:
+            ensure_memory_indexes(collection_name)
+        except Exception as e:
+            logger.debug(f"Could not ensure user_id payload index: {e}")
+
+        try:
+            response = client.facet(
+                collection_name=collection_name,
+                key="user_id",
+                facet_filter=user_filter,
+                limit=len(user_ids),
+                exact=True
+            )
+            return {str(hit.value): hit.count for hit in response.hits if hit.count > 0}
+        except Exception as e:
+            # Older Qdrant servers have no facet API; fall back to cheap count queries
+            logger.debug(f"Facet query unavailable, counting per user: {e}")
+
+        counts = {}
+        for user_id in user_ids:
+            count = client.count(
+                collection_name=collection_name,
+                count_filter=Filter(
+                    must=[FieldCondition(key="user_id", match=MatchValue(value=user_id))]
+                ),
+                exact=True
+            ).count
+            if count > 0:
+                counts[user_id] = count
+        return counts
+
+    except Exception as e:
+        logger.error(f"Failed to count memories for users: {e}")
+        return {}
+
+def get_user_statistics(user_id: str, memory_count: int = None) -> Dict[str, Any]:
     """
     Get detailed statistics for a specific user.
     Returns information like memory count, last activity, etc.
+    Pass memory_count when it is already known from get_user_memory_counts.
     """
     try:
         # Get memory statistics
-        memories = search_memories("", user_id, limit=100)  # Get up to 100 memories
-        memory_count = len(memories.get('results', [])) if memories else 0
+        if memory_count is None:
+            memory_count = get_user_memory_counts([user_id]).get(user_id, 0)
 
-        # Try to get more detailed information from Qdrant
+        # Activity information is maintained incrementally by the user registry
         last_activity = None
         conversation_count = 0
 
-        if QDRANT_AVAILABLE:
-            try:
-                qdrant_config = Config.get_qdrant_config()
-                qdrant_url = qdrant_config["config"]["url"]
-                collection_name = qdrant_config["config"]["collection_name"]
-                api_key = qdrant_config["config"]["api_key"]
-
-                if api_key:
-                    client = QdrantClient(url=qdrant_url, api_key=api_key)
-                else:
-                    client = QdrantClient(url=qdrant_url)
-
-                # Search for user-specific records with timestamp information
-                from qdrant_client.models import Filter, FieldCondition
-
-                # Try to find records for this user
-                user_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="user_id",
-                            match={"value": user_id}
-                        )
-                    ]
-                )
-
-                # Get some records to estimate activity
-                try:
-                    records, _ = client.scroll(
-                        collection_name=collection_name,
-                        scroll_filter=user_filter,
-                        limit=50,
-                        with_payload=True
-                    )
-
-                    if records:
-                        conversation_count = len(records)
-                        # Extract timestamp information if available
-                        timestamps = []
-                        for record in records:
-                            if record.payload:
-                                # Look for timestamp in various possible locations
-                                timestamp = None
-                                if 'timestamp' in record.payload:
-                                    timestamp = record.payload['timestamp']
-                                elif 'metadata' in record.payload and 'timestamp' in record.payload['metadata']:
-                                    timestamp = record.payload['metadata']['timestamp']
-                                elif 'created_at' in record.payload:
-                                    timestamp = record.payload['created_at']
-
-                                if timestamp:
-                                    timestamps.append(timestamp)
-
-                        if timestamps:
-                            # Get the most recent timestamp
-                            last_activity = max(timestamps)
-
-                except Exception as e:
-                    logger.debug(f"Could not get detailed stats for user {user_id}: {e}")
-
-            except Exception as e:
-                logger.debug(f"Qdrant not available for user stats: {e}")
+        registry_entry = get_user_registry().get_user(user_id)
+        if registry_entry:
+            last_activity = registry_entry['last_activity']
+            # None for backfilled users, whose earlier conversations were never counted
+            conversation_count = registry_entry['interaction_count'] if registry_entry['interaction_count_known'] else None
 
         return {
             'user_id': user_id,
             'memory_count': memory_count,
             'conversation_count': conversation_count,
             'last_activity': last_activity,
-            'has_data': memory_count > 0 or conversation_count > 0
+            'has_data': memory_count > 0 or bool(conversation_count)
         }
 
     except Exception as e:
@@ -209,88 +224,31 @@ def get_user_statistics(user_id: str) -> Dict[str, Any]:
 
 def scan_existing_users() -> set:
     """
-    Scan Qdrant vector database to find existing user IDs.
-    Returns a set of unique user IDs found in the database.
+    Load existing user IDs from the persistent user registry.
+    The registry is backfilled from Qdrant once, the first time it is used.
     """
-    if not QDRANT_AVAILABLE:
-        logger.warning("Qdrant client not available, cannot scan existing users")
-        return set()
+    registry = get_user_registry()
 
-    try:
-        # Get Qdrant configuration
-        qdrant_config = Config.get_qdrant_config()
-        qdrant_url = qdrant_config["config"]["url"]
-        collection_name = qdrant_config["config"]["collection_name"]
-        api_key = qdrant_config["config"]["api_key"]
-
-        # Initialize Qdrant client
-        if api_key:
-            client = QdrantClient(url=qdrant_url, api_key=api_key)
+    if not registry.is_backfilled():
+        if not QDRANT_AVAILABLE:
+            logger.warning("Qdrant client not available, cannot backfill user registry")
         else:
-            client = QdrantClient(url=qdrant_url)
-
-        # Check if collection exists
-        try:
-            collections = client.get_collections().collections
-            collection_exists = any(collection.name == collection_name for collection in collections)
-            if not collection_exists:
-                logger.info(f"Collection '{collection_name}' does not exist, no existing users")
-                return set()
-        except Exception as e:
-            logger.warning(f"Could not verify collection existence: {e}")
-            return set()
-
-        # Scroll through all points to extract user IDs
-        logger.info(f"Scanning existing users from collection '{collection_name}'")
-
-        all_users = set()
-        offset = None
-        limit = 100  # Process in batches
-
-        while True:
             try:
-                # Scroll through records
-                records, next_page_offset = client.scroll(
-                    collection_name=collection_name,
-                    offset=offset,
-                    limit=limit,
-                    with_payload=True
-                )
-
-                # Extract user IDs from payloads
-                for record in records:
-                    if record.payload:
-                        # Look for user_id in different possible payload structures
-                        user_id = None
-
-                        # Check direct user_id field
-                        if 'user_id' in record.payload:
-                            user_id = record.payload['user_id']
-
-                        # Check nested structure (Mem0 might store it this way)
-                        elif 'metadata' in record.payload and 'user_id' in record.payload['metadata']:
-                            user_id = record.payload['metadata']['user_id']
-
-                        # Check if user_id is in the payload as a string
-                        if user_id and isinstance(user_id, str) and user_id.strip():
-                            all_users.add(user_id.strip())
-
-                # Check if there are more records
-                if next_page_offset is None:
-                    break
-
-                offset = next_page_offset
+                collection_name = Config.get_qdrant_config()["config"]["collection_name"]
+                client = get_qdrant_client()
 
+                collections = client.get_collections().collections
+                if any(collection.name == collection_name for collection in collections):
+                    logger.info(f"Backfilling user registry from collection '{collection_name}'")
+                    registry.backfill(client, collection_name)
+                else:
+                    logger.info(f"Collection '{collection_name}' does not exist, no existing users")
             except Exception as e:
-                logger.error(f"Error scanning batch of users: {e}")
-                break
-
-        logger.info(f"Found {len(all_users)} existing users in database")
-        return all_users
+                logger.error(f"Failed to backfill user registry from Qdrant: {e}")
 
-    except Exception as e:
-        logger.error(f"Failed to scan existing users from Qdrant: {e}")
-        return set()
+    all_users = registry.get_user_ids()
+    logger.info(f"Found {len(all_users)} existing users in registry")
+    return all_users
 
 def init_session_state():
     """Initialize Streamlit session state variables."""
@@ -384,68 +342,34 @@ def add_message_to_session(session_id: str, role: str, content: str, memories: L
     st.session_state.sessions[session_id]['messages'].append(message_data)
     st.session_state.sessions[session_id]['last_updated'] = datetime.now().isoformat()
 
-def get_conversation_response(user_input: str, user_id: str) -> Tuple[str, List[Dict]]:
-    """Get response from the conversation agent with retry mechanism."""
+def get_conversation_response(user_input: str, user_id: str,
+                              on_partial: Callable[[str], None] = None) -> Tuple[str, List[Dict]]:
+    """
+    Get response from the conversation agent with retry mechanism.
+    on_partial, if given, receives the partial response text as tokens stream in.
+    """
     import time
 
-    # Import here to avoid circular imports
-    from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-
     max_retries = 3
     retry_delay = 2  # seconds
 
     for attempt in range(max_retries):
         try:
-            # Search for relevant memories
-            memories = search_memories(user_input, user_id, limit=5)
-            memory_list = memories.get('results', []) if memories else []
-
-            # Extract memory context
-            memory_context = ""
-            if memory_list:
-                memory_context = "Relevant information from previous conversations:\n"
-                for i, mem in enumerate(memory_list, 1):
-                    memory_context += f"{i}. {mem.get('memory', '')}\n"
-
-            # Create system message with memory context
-            system_content = """你是忆语 (YiYu)，一个具有记忆功能的智能对话伙伴。请根据提供的上下文信息，为用户提供个性化的回应。
-
-            指导原则：
-            1. 利用记忆中的信息提供连贯的对话体验
-            2. 记住用户的偏好和过去的交互
-            3. 保持友好和专业的语调
-            4. 如果没有相关记忆，就基于当前问题进行回答
-            5. 用中文回答
-
-            """ + memory_context
-
-            # Get response from conversation graph
-            config = {"configurable": {"thread_id": user_id}}
-            state = {
-                "messages": [HumanMessage(content=user_input)],
-                "mem0_user_id": user_id
-            }
-
-            response_content = ""
-            for event in conversation_graph.stream(state, config):
-                for value in event.values():
-                    if value.get("messages"):
-                        response_content = value["messages"][-1].content
-                        break
-
-            # Store the interaction in memory
-            interaction = [
-                {
-                    "role": "user",
-                    "content": user_input
-                },
-                {
-                    "role": "assistant",
-                    "content": response_content
-                }
-            ]
-
-            store_interaction(interaction, user_id)
+            # Each attempt streams its reply from scratch
+            partial_tokens = []
+
+            def handle_token(token: str):
+                partial_tokens.append(token)
+                if on_partial:
+                    on_partial("".join(partial_tokens))
+
+            # The graph searches memories, generates the reply and stores the
+            # interaction exactly once; we only consume its results here
+            turn = run_turn(user_input, user_id, on_token=handle_token)
+            response_content = turn["response"]
+            memory_list = turn["memories"]
+            st.session_state.last_turn_operations = turn["operations"]
+            st.session_state.last_turn_ttft = turn["time_to_first_token"]
 
             # Update API status on success
             st.session_state.api_status = "normal"
@@ -530,8 +454,15 @@ def process_ai_response():
             # Get AI response
             user_input, user_id = st.session_state.pending_response
 
+            # Render the reply incrementally while it is being generated
+            stream_placeholder = st.empty()
+
+            def render_partial(partial_response: str):
+                stream_placeholder.markdown(partial_response + "▌")
+
             with st.spinner("🤖 正在思考..."):
-                response, memories = get_conversation_response(user_input, user_id)
+                response, memories = get_conversation_response(user_input, user_id, on_partial=render_partial)
+            stream_placeholder.empty()
 
             # Add assistant response to session
             add_message_to_session(
@@ -597,6 +528,43 @@ def render_sidebar():
         st.sidebar.success("✅ API服务正常")
         st.sidebar.caption("随时可用")
 
+    # Memory operations performed by the last turn
+    last_ops = st.session_state.get('last_turn_operations')
+    if last_ops:
+        st.sidebar.caption(
+            f"上轮记忆操作: 嵌入 {last_ops['embed']} · 检索 {last_ops['search']} · 写入 {last_ops['add']}"
+        )
+    last_ttft = st.session_state.get('last_turn_ttft')
+    if last_ttft is not None:
+        st.sidebar.caption(f"上轮首字延迟: {last_ttft:.2f} 秒")
+    search_stats = get_search_cache_stats()
+    if search_stats.get('hits', 0) + search_stats.get('misses', 0):
+        st.sidebar.caption(f"检索缓存命中率: {search_stats['hit_rate']:.0%}")
+    semantic_stats = get_semantic_cache_stats()
+    if semantic_stats.get('hits', 0) + semantic_stats.get('misses', 0):
+        st.sidebar.caption(f"相似问题复用率: {semantic_stats['hit_rate']:.0%}")
+    gate_stats = get_storage_gate_stats()
+    if gate_stats.get('decisions'):
+        st.sidebar.caption(f"写入过滤: 已节省 {gate_stats['saved_add_calls']}/{gate_stats['decisions']} 次记忆写入")
+    dedup_stats = get_memory_dedup_stats()
+    if dedup_stats['checks']:
+        st.sidebar.caption(f"重复记忆跳过率: {dedup_stats['skip_rate']:.0%} ({dedup_stats['duplicates']} 次)")
+        if dedup_stats['shadow_duplicates']:
+            st.sidebar.caption(f"重复记忆 (影子模式, 未跳过): {dedup_stats['shadow_duplicates']} 次")
+
+    # Live hot-path latencies from the in-process metrics registry
+    stage_summary = get_stage_latency_summary()
+    if stage_summary:
+        with st.sidebar.expander("📈 实时指标", expanded=False):
+            stage_labels = {"search": "记忆检索", "llm": "LLM 生成", "store": "记忆写入", "chatbot": "整轮对话"}
+            for stage, label in stage_labels.items():
+                summary = stage_summary.get(stage)
+                if summary and summary["count"]:
+                    st.caption(
+                        f"{label}: p50 {summary['p50'] * 1000:.0f}ms · "
+                        f"p95 {summary['p95'] * 1000:.0f}ms ({summary['count']} 次)"
+                    )
+
     # User ID input
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 👤 用户设置")
@@ -605,19 +573,16 @@ def render_sidebar():
     db_users = set()
     local_users = set()
 
+    # Classify all known users with one batched count query
+    user_memory_counts = get_user_memory_counts(sorted(st.session_state.user_history))
+
     # Separate users into database users and locally created users
-    if st.session_state.user_history:
-        for user in st.session_state.user_history:
-            if user != "web_user":
-                # Check if user is from database (heuristic: check if it has memories)
-                try:
-                    memories = search_memories("test", user, limit=1)
-                    if memories and memories.get('results'):
-                        db_users.add(user)
-                    else:
-                        local_users.add(user)
-                except:
-                    local_users.add(user)
+    for user in st.session_state.user_history:
+        if user != "web_user":
+            if user_memory_counts.get(user, 0) > 0:
+                db_users.add(user)
+            else:
+                local_users.add(user)
 
     # Create organized user options
     user_options = ["web_user"]
@@ -705,13 +670,9 @@ def render_sidebar():
             local_users_list = []
 
             for user in sorted(list(st.session_state.user_history)):
-                try:
-                    memories = search_memories("test", user, limit=1)
-                    if memories and memories.get('results'):
-                        db_users_list.append(user)
-                    else:
-                        local_users_list.append(user)
-                except:
+                if user_memory_counts.get(user, 0) > 0:
+                    db_users_list.append(user)
+                else:
                     local_users_list.append(user)
 
             # Display database users with statistics
@@ -719,7 +680,7 @@ def render_sidebar():
                 st.sidebar.markdown("**🗄️ 数据库用户 (有记忆):**")
                 for user in db_users_list:
                     # Get user statistics
-                    stats = get_user_statistics(user)
+                    stats = get_user_statistics(user, user_memory_counts.get(user, 0))
 
                     with st.sidebar.container():
                         col1, col2, col3, col4 = st.sidebar.columns([2, 1, 1, 1])
@@ -1179,8 +1140,19 @@ def render_chat_interface():
         # Rerun to show user message immediately
         st.rerun()
 
+@st.cache_resource
+def start_agent_warmup():
+    """Load the models in the background once per process, without blocking the page."""
+    import threading
+
+    start_metrics_exporters()
+    thread = threading.Thread(target=warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
 def main():
     """Main application entry point."""
+    start_agent_warmup()
     init_session_state()
 
     # Render sidebar
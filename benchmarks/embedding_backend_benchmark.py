@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark: PyTorch vs ONNX Runtime (fp32 / int8).
+
+Reports per-query latency (single-string encodes, as search_memories does)
+and cosine agreement of each ONNX variant against the torch model.
+
+Usage:
+    python onnx_embedder.py export
+    python benchmarks/embedding_backend_benchmark.py --threads 1 2 4
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+
+QUERIES = [
+    "我叫什么名字？",
+    "你还记得我的名字吗",
+    "我喜欢喝咖啡，尤其是拿铁",
+    "我下个月要去日本旅行，有什么推荐的地方吗？",
+    "我对花生过敏，推荐一些零食",
+    "我是一名软件工程师，主要写 Python",
+    "今天天气怎么样",
+    "帮我回忆一下我们上次聊了什么",
+    "我住在杭州，周末喜欢去西湖散步",
+    "你的记忆功能是怎么工作的？",
+    "推荐几本关于机器学习的入门书籍",
+    "我的猫叫咪咪，今年三岁了",
+]
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+
+def measure(embed, queries, repeats):
+    # One warm-up pass so lazy initialization isn't counted
+    for query in queries[:2]:
+        embed(query)
+
+    latencies = []
+    vectors = []
+    for _ in range(repeats):
+        # Keep the timed vectors of the last pass for the parity check
+        vectors = []
+        for query in queries:
+            start = time.perf_counter()
+            vector = embed(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            vectors.append(np.asarray(vector, dtype=np.float32))
+    return latencies, np.stack(vectors)
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    onnx_config = Config.get_onnx_embedding_config()
+
+    parser = argparse.ArgumentParser(description="嵌入后端基准测试 (PyTorch vs ONNX Runtime)")
+    parser.add_argument("--model", default=Config.get_embedding_config()["config"]["model"], help="HuggingFace 模型")
+    parser.add_argument("--onnx-dir", default=onnx_config["model_dir"], help="ONNX 模型目录")
+    parser.add_argument("--threads", type=int, nargs="+", default=[onnx_config["num_threads"]], help="ONNX 线程数 (可多个)")
+    parser.add_argument("--repeats", type=int, default=5, help="每条查询的重复次数")
+    parser.add_argument("--output", help="保存 JSON 结果的路径")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    from onnx_embedder import OnnxEmbedding, INT8_FILENAME
+
+    results = []
+
+    torch_model = SentenceTransformer(args.model, device="cpu")
+    torch_latencies, reference = measure(
+        lambda text: torch_model.encode(text, convert_to_numpy=True), QUERIES, args.repeats
+    )
+    results.append({
+        "backend": "torch",
+        "threads": None,
+        "p50_ms": percentile(torch_latencies, 50),
+        "p95_ms": percentile(torch_latencies, 95),
+        "cosine_mean": 1.0,
+        "cosine_min": 1.0
+    })
+
+    variants = [False]
+    if os.path.exists(os.path.join(args.onnx_dir, INT8_FILENAME)):
+        variants.append(True)
+
+    for quantized in variants:
+        for threads in args.threads:
+            embedder = OnnxEmbedding(model_dir=args.onnx_dir, quantized=quantized, num_threads=threads)
+            latencies, vectors = measure(embedder.embed, QUERIES, args.repeats)
+            agreement = cosine_rows(vectors, reference)
+            results.append({
+                "backend": "onnx-int8" if quantized else "onnx-fp32",
+                "threads": threads,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "cosine_mean": float(agreement.mean()),
+                "cosine_min": float(agreement.min())
+            })
+
+    print(f"\n📊 单条查询嵌入延迟 ({len(QUERIES)} 条查询 × {args.repeats} 次)")
+    print(f"{'后端':<12}{'线程':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'余弦均值':>10}{'余弦最小':>10}")
+    for row in results:
+        threads = "-" if row["threads"] is None else (row["threads"] or "auto")
+        print(f"{row['backend']:<12}{threads:>6}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{row['cosine_mean']:>10.4f}{row['cosine_min']:>10.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-user load generator.
+
+Simulates --users users, each with its own mem0_user_id, arriving as a
+Poisson process at --arrival-rate users/second. Every user replays a
+scripted multi-turn conversation with exponential think time between
+turns. Turns go either
+  - in-process through memory_agent.run_conversation (--target inprocess),
+    optionally against the stub LLM and embedded Qdrant (--offline), or
+  - over HTTP to server.py's POST /v1/chat (--target http --url ...).
+
+Reports throughput, latency percentiles, error / 429 / 503 counts, resident
+memory growth of the serving process and a per-window timeline, so the
+point where throughput stops growing (and latency climbs) is visible. For
+in-process runs the embedding batch and cache statistics are included to
+show whether the embedder saturates.
+
+Usage:
+    python benchmarks/load_generator.py --offline --embedder hash --users 50 --arrival-rate 5
+    python server.py &
+    python benchmarks/load_generator.py --target http --url http://localhost:8000 --users 100 --server-pid $!
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import threading
+import contextlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONVERSATIONS = [
+    ["你好，我叫王芳，是一名小学老师", "我喜欢在周末做烘焙", "你还记得我的职业吗？", "推荐一个简单的蛋糕做法"],
+    ["我住在成都，很喜欢吃火锅", "最近在学吉他，进步有点慢", "有什么练习建议吗？", "我刚才说我住在哪里？"],
+    ["我是一名数据分析师，主要用 SQL 和 Python", "帮我解释一下什么是窗口函数", "我平时用什么语言工作？"],
+    ["我对猫毛过敏，但很想养宠物", "有什么适合我的宠物吗？", "我下周要搬家，有什么注意事项？", "你还记得我对什么过敏吗？"],
+    ["我叫赵磊，在准备马拉松比赛", "赛前一周饮食该怎么安排？", "我的目标是四小时内完赛", "帮我总结一下我们聊的内容"],
+]
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+
+class ResidentMemorySampler:
+    """Samples the RSS of a process in the background (start, peak, end)."""
+
+    def __init__(self, pid, interval=0.5):
+        import psutil
+
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.start_bytes = self.process.memory_info().rss
+        self.peak_bytes = self.start_bytes
+        self.end_bytes = self.start_bytes
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.process.memory_info().rss
+            self.peak_bytes = max(self.peak_bytes, rss)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.end_bytes = self.process.memory_info().rss
+
+    def summary(self):
+        return {
+            "start_mb": self.start_bytes / 2**20,
+            "peak_mb": self.peak_bytes / 2**20,
+            "end_mb": self.end_bytes / 2**20,
+            "growth_mb": (self.end_bytes - self.start_bytes) / 2**20,
+        }
+
+
+class LoadRecorder:
+    """Thread-safe record of (finish time, latency, outcome) per turn."""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, finished_at, latency_ms, outcome):
+        with self._lock:
+            self.records.append((finished_at, latency_ms, outcome))
+
+
+def is_rate_limited(error):
+    """Whether an exception, or one it was raised from, is an HTTP 429 (openai.RateLimitError, httpx)."""
+    for _ in range(10):
+        if error is None:
+            return False
+        status = getattr(error, "status_code", None)
+        if status is None:
+            status = getattr(getattr(error, "response", None), "status_code", None)
+        if status == 429:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def make_inprocess_turn():
+    import memory_agent
+
+    def turn(session, message, user_id):
+        try:
+            memory_agent.run_conversation(message, user_id)
+        except Exception as e:
+            # Counted with the HTTP target's 429s rather than as a generic error
+            if is_rate_limited(e):
+                return "429"
+            raise
+        return "ok"
+
+    return turn
+
+
+def make_http_turn(url, timeout):
+    endpoint = url.rstrip("/") + "/v1/chat"
+
+    def turn(session, message, user_id):
+        response = session.post(endpoint, json={"message": message, "user_id": user_id}, timeout=timeout)
+        if response.status_code in (429, 503):
+            return str(response.status_code)
+        return "ok" if response.status_code == 200 else "error"
+
+    return turn
+
+
+def simulate_user(index, args, turn, recorder, start_time, rng_seed):
+    """Replay one scripted conversation for one user."""
+    rng = random.Random(rng_seed)
+    user_id = f"{args.user_prefix}_{index}"
+    script = CONVERSATIONS[index % len(CONVERSATIONS)]
+    session = None
+    if args.target == "http":
+        import requests
+        session = requests.Session()
+
+    for message in script[:args.turns_per_user]:
+        if args.duration and time.perf_counter() - start_time > args.duration:
+            break
+        started = time.perf_counter()
+        try:
+            outcome = turn(session, message, user_id)
+        except Exception:
+            outcome = "error"
+        finished = time.perf_counter()
+        recorder.add(finished - start_time, (finished - started) * 1000, outcome)
+
+        if args.think_time > 0:
+            time.sleep(rng.expovariate(1.0 / args.think_time))
+
+
+def build_timeline(records, window):
+    """Throughput and p95 latency per time window."""
+    if not records:
+        return []
+    end = max(finished for finished, _, _ in records)
+    timeline = []
+    for start in np.arange(0.0, end + window, window):
+        in_window = [latency for finished, latency, outcome in records
+                     if start <= finished < start + window and outcome == "ok"]
+        timeline.append({
+            "start_s": float(start),
+            "turns_per_s": len(in_window) / window,
+            "p95_ms": percentile(in_window, 95),
+        })
+    return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多用户并发压测工具")
+    parser.add_argument("--target", choices=["inprocess", "http"], default="inprocess", help="压测对象")
+    parser.add_argument("--url", default="http://localhost:8000", help="HTTP 服务地址 (--target http)")
+    parser.add_argument("--server-pid", type=int, help="HTTP 服务进程 PID, 用于统计内存增长")
+    parser.add_argument("--users", type=int, default=20, help="模拟用户数")
+    parser.add_argument("--arrival-rate", type=float, default=2.0, help="用户到达速率 (人/秒, 泊松过程), 0 表示同时到达")
+    parser.add_argument("--turns-per-user", type=int, default=4, help="每个用户最多对话轮数")
+    parser.add_argument("--think-time", type=float, default=1.0, help="两轮之间的平均思考时间 (秒, 指数分布)")
+    parser.add_argument("--duration", type=float, default=0, help="最长压测时间 (秒), 0 为不限")
+    parser.add_argument("--timeout", type=float, default=120, help="HTTP 请求超时 (秒)")
+    parser.add_argument("--window", type=float, default=5.0, help="时间线统计窗口 (秒)")
+    parser.add_argument("--user-prefix", default="load_user", help="用户ID前缀")
+    parser.add_argument("--offline", action="store_true", help="进程内压测使用模拟 LLM 和嵌入式 Qdrant")
+    parser.add_argument("--embedder", choices=["model", "hash"], default="model", help="离线模式的嵌入模型")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="离线模式的模拟首字延迟 (毫秒, 对数正态)")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="离线模式的模拟逐字间隔 (毫秒)")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="保存 JSON 结果的路径")
+    args = parser.parse_args()
+
+    stub = None
+    if args.target == "inprocess":
+        if args.offline:
+            from stub_services import LatencyModel, StubLLMServer, configure_offline_environment
+
+            stub = StubLLMServer(
+                ttft=LatencyModel("lognormal", args.ttft_ms, 0.3, seed=args.seed),
+                token_latency=LatencyModel("fixed", args.token_ms)
+            ).start()
+            configure_offline_environment(
+                stub.base_url,
+                data_dir=tempfile.mkdtemp(prefix="load_generator_"),
+                collection_name="load_generator",
+                hash_embedder=args.embedder == "hash"
+            )
+
+        import memory_agent
+        memory_agent.warmup()
+        turn = make_inprocess_turn()
+        pid = os.getpid()
+    else:
+        turn = make_http_turn(args.url, args.timeout)
+        pid = args.server_pid
+
+    sampler = ResidentMemorySampler(pid).start() if pid else None
+    recorder = LoadRecorder()
+    rng = random.Random(args.seed)
+
+    print(f"⏳ {args.users} 个用户, 到达速率 {args.arrival_rate or '同时'} 人/秒, 目标 {args.target}...")
+    start_time = time.perf_counter()
+
+    # run_conversation prints streamed tokens; discard them so they neither clutter
+    # the report nor accumulate in memory and inflate the RSS growth figure
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+            ThreadPoolExecutor(max_workers=args.users) as executor:
+        for index in range(args.users):
+            executor.submit(simulate_user, index, args, turn, recorder, start_time, args.seed + index)
+            if args.arrival_rate > 0:
+                time.sleep(rng.expovariate(args.arrival_rate))
+
+    elapsed = time.perf_counter() - start_time
+    if sampler:
+        sampler.stop()
+    if stub:
+        stub.stop()
+
+    outcomes = Counter(outcome for _, _, outcome in recorder.records)
+    latencies = [latency for _, latency, outcome in recorder.records if outcome == "ok"]
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_s": elapsed,
+        "turns": len(recorder.records),
+        "throughput_turns_per_s": outcomes["ok"] / elapsed if elapsed else 0.0,
+        "outcomes": dict(outcomes),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else 0.0,
+        },
+        "resident_memory": sampler.summary() if sampler else None,
+        "timeline": build_timeline(recorder.records, args.window),
+    }
+
+    if args.target == "inprocess":
+        import memory_agent
+        results["embedding_batches"] = memory_agent.get_embedding_batch_stats()
+        results["embedding_cache"] = memory_agent.get_embedding_cache_stats()
+        results["search_cache"] = memory_agent.get_search_cache_stats()
+
+    latency = results["latency_ms"]
+    print(f"\n📊 {results['turns']} 轮对话, 用时 {elapsed:.1f} 秒")
+    print(f"   吞吐量: {results['throughput_turns_per_s']:.2f} 轮/秒")
+    print(f"   延迟 (ms): p50 {latency['p50']:.0f} · p90 {latency['p90']:.0f} · "
+          f"p95 {latency['p95']:.0f} · p99 {latency['p99']:.0f} · max {latency['max']:.0f}")
+    print(f"   成功 {outcomes['ok']} · 错误 {outcomes['error']} · 429 {outcomes['429']} · 503 {outcomes['503']}")
+    if sampler:
+        memory = results["resident_memory"]
+        print(f"   内存 (MB): 起始 {memory['start_mb']:.0f} · 峰值 {memory['peak_mb']:.0f} · "
+              f"增长 {memory['growth_mb']:+.0f}")
+    if results.get("embedding_batches"):
+        print(f"   嵌入平均批大小: {results['embedding_batches']['mean_batch_size']:.2f}")
+
+    print(f"\n📈 时间线 (每 {args.window:g} 秒)")
+    print(f"{'开始(s)':>8}{'轮/秒':>10}{'p95(ms)':>10}")
+    for row in results["timeline"]:
+        print(f"{row['start_s']:>8.0f}{row['turns_per_s']:>10.2f}{row['p95_ms']:>10.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Qdrant storage mode benchmark: float32 / int8 scalar / binary quantization,
+each with vectors in RAM or memmapped on disk.
+
+Builds one temporary collection per mode on the configured Qdrant server
+(embedded mode is rejected)
+from the same synthetic, clustered dataset (points spread over users, and
+every query filtered by user_id as Mem0 does), then reports recall@k
+against exact brute-force search, p50/p99 search latency, the estimated
+vector RAM and the change in the server's resident memory.
+
+Usage:
+    python benchmarks/quantization_benchmark.py
+    python benchmarks/quantization_benchmark.py --points 50000 --modes float32 scalar binary
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from qdrant_pool import get_qdrant_client, is_embedded  # noqa: E402
+from setup_qdrant import build_quantization_config, ensure_payload_indexes  # noqa: E402
+
+# name -> (quantization, vectors on disk)
+MODES = {
+    "float32": ("none", False),
+    "float32-disk": ("none", True),
+    "scalar": ("scalar", False),
+    "scalar-disk": ("scalar", True),
+    "binary": ("binary", False),
+    "binary-disk": ("binary", True),
+}
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+
+def make_dataset(points, dims, users, clusters, seed):
+    """Clustered unit vectors, so nearest neighbours are meaningful."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dims)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=points)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(points, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    owners = rng.integers(0, users, size=points)
+    return vectors, owners
+
+
+def make_queries(vectors, owners, count, seed):
+    """Perturbed copies of stored vectors, each searched within its owner's memories."""
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.integers(0, len(vectors), size=count)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(count, vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries, owners[picks]
+
+
+def exact_top_k(vectors, owners, queries, query_owners, k):
+    truth = []
+    for query, owner in zip(queries, query_owners):
+        candidates = np.flatnonzero(owners == owner)
+        scores = vectors[candidates] @ query
+        truth.append(set(candidates[np.argsort(-scores)[:k]].tolist()))
+    return truth
+
+
+def server_resident_bytes():
+    """Resident memory of the Qdrant server from its /metrics endpoint, if exposed."""
+    import requests
+
+    qdrant_config = Config.get_qdrant_config()["config"]
+    headers = {"api-key": qdrant_config["api_key"]} if qdrant_config["api_key"] else {}
+    try:
+        response = requests.get(f"{qdrant_config['url'].rstrip('/')}/metrics", headers=headers, timeout=5)
+        for line in response.text.splitlines():
+            if line.startswith("memory_resident_bytes"):
+                return int(float(line.split()[-1]))
+    except Exception:
+        pass
+    return None
+
+
+def estimated_vector_ram(points, dims, quantization, on_disk):
+    """Bytes of vector data Qdrant keeps in RAM (HNSW links and payload excluded)."""
+    ram = 0 if on_disk else points * dims * 4
+    if quantization == "scalar":
+        ram += points * dims
+    elif quantization == "binary":
+        ram += points * dims // 8
+    return ram
+
+
+def build_collection(client, name, vectors, owners, quantization, on_disk, batch_size, index_timeout=600.0):
+    from qdrant_client.http.models import (
+        Distance, VectorParams, HnswConfigDiff, OptimizersConfigDiff, PointStruct, CollectionStatus
+    )
+
+    collection_config = Config.get_qdrant_collection_config()
+    if client.collection_exists(name):
+        client.delete_collection(name)
+
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE, on_disk=on_disk),
+        hnsw_config=HnswConfigDiff(
+            m=collection_config["hnsw_m"],
+            payload_m=collection_config["hnsw_payload_m"],
+            ef_construct=collection_config["hnsw_ef_construct"]
+        ),
+        # Below the default 10000 KB threshold segments stay unindexed and every
+        # search is brute force; 1 KB indexes any segment (0 disables indexing)
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1),
+        quantization_config=build_quantization_config({
+            "quantization": quantization,
+            "quantization_always_ram": True
+        })
+    )
+    ensure_payload_indexes(client, name)
+
+    for start in range(0, len(vectors), batch_size):
+        client.upsert(
+            collection_name=name,
+            points=[
+                PointStruct(id=i, vector=vectors[i].tolist(), payload={"user_id": f"user_{owners[i]}"})
+                for i in range(start, min(start + batch_size, len(vectors)))
+            ],
+            wait=True
+        )
+
+    # GREEN only means no optimization is running; wait until the HNSW index
+    # covers every point, otherwise part of the searches are brute force
+    deadline = time.time() + index_timeout
+    while True:
+        info = client.get_collection(name)
+        if info.status == CollectionStatus.GREEN and (info.indexed_vectors_count or 0) >= len(vectors):
+            break
+        if time.time() > deadline:
+            raise RuntimeError(
+                f"{name}: only {info.indexed_vectors_count or 0}/{len(vectors)} vectors indexed "
+                f"after {index_timeout:g}s"
+            )
+        time.sleep(0.5)
+
+
+def run_searches(client, name, queries, query_owners, k, quantization):
+    from qdrant_client.http.models import (
+        Filter, FieldCondition, MatchValue, SearchParams, QuantizationSearchParams
+    )
+
+    collection_config = Config.get_qdrant_collection_config()
+    search_params = None
+    if quantization != "none":
+        search_params = SearchParams(quantization=QuantizationSearchParams(
+            rescore=collection_config["rescore"],
+            oversampling=collection_config["oversampling"]
+        ))
+
+    latencies, found = [], []
+    for query, owner in zip(queries, query_owners):
+        query_filter = Filter(must=[FieldCondition(key="user_id", match=MatchValue(value=f"user_{owner}"))])
+        start = time.perf_counter()
+        response = client.query_points(
+            collection_name=name,
+            query=query.tolist(),
+            query_filter=query_filter,
+            limit=k,
+            search_params=search_params
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append({point.id for point in response.points})
+    return latencies, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qdrant 量化与落盘模式基准测试")
+    parser.add_argument("--points", type=int, default=20000, help="向量条数")
+    parser.add_argument("--dims", type=int, default=Config.get_qdrant_config()["config"]["embedding_model_dims"], help="向量维度")
+    parser.add_argument("--users", type=int, default=20, help="用户数 (按 user_id 过滤检索)")
+    parser.add_argument("--queries", type=int, default=200, help="查询条数")
+    parser.add_argument("--top-k", type=int, default=5, help="召回数量 k")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES), help="要测试的模式")
+    parser.add_argument("--batch-size", type=int, default=512, help="写入批大小")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--keep", action="store_true", help="保留测试 Collection")
+    parser.add_argument("--output", help="保存 JSON 结果的路径")
+    args = parser.parse_args()
+
+    # Embedded Qdrant searches brute force without HNSW or quantization and
+    # never reports indexed vectors, so there is nothing to compare
+    if is_embedded():
+        print("❌ 该基准测试需要 Qdrant 服务, 嵌入式模式 (QDRANT_PATH) 不构建 HNSW 索引也不支持量化")
+        sys.exit(1)
+
+    client = get_qdrant_client()
+    vectors, owners = make_dataset(args.points, args.dims, args.users, clusters=64, seed=args.seed)
+    queries, query_owners = make_queries(vectors, owners, args.queries, seed=args.seed)
+    truth = exact_top_k(vectors, owners, queries, query_owners, args.top_k)
+
+    results = []
+    for mode in args.modes:
+        quantization, on_disk = MODES[mode]
+        name = f"bench_quantization_{mode.replace('-', '_')}"
+        print(f"⏳ 构建 {mode} ({args.points} 条, {args.dims} 维)...")
+
+        rss_before = server_resident_bytes()
+        build_collection(client, name, vectors, owners, quantization, on_disk, args.batch_size)
+        latencies, found = run_searches(client, name, queries, query_owners, args.top_k, quantization)
+        rss_after = server_resident_bytes()
+
+        recall = np.mean([len(f & t) / args.top_k for f, t in zip(found, truth)])
+        results.append({
+            "mode": mode,
+            "recall_at_k": float(recall),
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+            "estimated_vector_ram_mb": estimated_vector_ram(args.points, args.dims, quantization, on_disk) / 2**20,
+            "server_rss_delta_mb": (rss_after - rss_before) / 2**20 if rss_before and rss_after else None
+        })
+
+        if not args.keep:
+            client.delete_collection(name)
+
+    print(f"\n📊 检索质量与延迟 ({args.queries} 条查询, recall@{args.top_k} 对比精确检索)")
+    print(f"{'模式':<14}{'召回率':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'向量内存(MB)':>14}{'RSS变化(MB)':>14}")
+    for row in results:
+        rss = "-" if row["server_rss_delta_mb"] is None else f"{row['server_rss_delta_mb']:.1f}"
+        print(f"{row['mode']:<14}{row['recall_at_k']:>8.3f}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+              f"{row['estimated_vector_ram_mb']:>14.1f}{rss:>14}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for memory_agent.
+
+Each run happens in a fresh interpreter and measures:
+  - import:  `import memory_agent` (should stay cheap, models are lazy)
+  - warmup:  memory_agent.warmup() (LLM client, model load, dummy encode, pre-connect)
+  - first_token: time from the start of the import to the first streamed token
+    of a real turn (skipped with --no-turn, which needs no LLM API key)
+
+Usage:
+    python benchmarks/startup_benchmark.py --runs 3
+    python benchmarks/startup_benchmark.py --no-turn --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(args):
+    """Measure one cold start; prints a JSON line with the timings."""
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import memory_agent
+    result = {"import": time.perf_counter() - start}
+
+    warmup_start = time.perf_counter()
+    result["warmup_steps"] = memory_agent.warmup()
+    result["warmup"] = time.perf_counter() - warmup_start
+
+    if not args.no_turn:
+        first_token = []
+
+        def on_token(token):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+
+        memory_agent.run_turn(args.message, args.user_id, on_token=on_token)
+        result["first_token"] = first_token[0] if first_token else None
+
+    print(json.dumps(result))
+
+
+def summarize(runs, key):
+    values = [run[key] for run in runs if run.get(key) is not None]
+    if not values:
+        return None
+    return {"median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="memory_agent 启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=3, help="冷启动次数")
+    parser.add_argument("--no-turn", action="store_true", help="不执行对话轮次 (无需 LLM API)")
+    parser.add_argument("--message", default="你好，请用一句话介绍你自己", help="首轮对话输入")
+    parser.add_argument("--user-id", default="startup_benchmark_user", help="首轮对话用户ID")
+    parser.add_argument("--output", help="保存 JSON 结果的路径")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    runs = []
+    for i in range(args.runs):
+        cmd = [sys.executable, os.path.abspath(__file__), "--child",
+               "--message", args.message, "--user-id", args.user_id]
+        if args.no_turn:
+            cmd.append("--no-turn")
+        completed = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+        if completed.returncode != 0:
+            print(f"❌ 第 {i + 1} 次运行失败:\n{completed.stderr[-2000:]}")
+            sys.exit(1)
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        runs.append(run)
+        first_token = f"{run['first_token']:.2f}s" if run.get("first_token") is not None else "N/A"
+        print(f"  运行 {i + 1}: import {run['import']:.2f}s, warmup {run['warmup']:.2f}s, 首字 {first_token}")
+
+    summary = {key: summarize(runs, key) for key in ("import", "warmup", "first_token")}
+
+    print("\n📊 启动耗时 (中位数)")
+    for key, label in (("import", "导入"), ("warmup", "预热"), ("first_token", "导入到首字")):
+        if summary[key]:
+            print(f"  {label}: {summary[key]['median']:.2f}s "
+                  f"(min {summary[key]['min']:.2f}s, max {summary[key]['max']:.2f}s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": runs, "summary": summary}, f, indent=2)
+        print(f"\n💾 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Offline stand-ins for the external services, shared by the benchmarks.
+
+StubLLMServer is a local OpenAI-compatible chat completions endpoint with
+configurable time-to-first-token and per-token latency. It also answers
+Mem0's JSON-mode fact extraction and memory update prompts, so Mem0 add
+runs its full path (extraction, embedding, vector upsert) without a real
+LLM. HashEmbedding is a deterministic character n-gram embedder for runs
+without the m3e model.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Literal, Optional
+
+import numpy as np
+from mem0.embeddings.base import EmbeddingBase
+
+from config import Config
+
+REPLY_TEXT = "好的，我记住了。这是一个用于基准测试的模拟回复，内容长度固定，便于比较每一轮对话的延迟。"
+
+
+class LatencyModel:
+    """Samples a delay in seconds: fixed, uniform (mean ± spread) or lognormal (median, sigma)."""
+
+    def __init__(self, kind: str = "fixed", mean_ms: float = 0.0, spread: float = 0.0, seed: Optional[int] = None):
+        self.kind = kind
+        self.mean_ms = mean_ms
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                value = self._random.uniform(self.mean_ms - self.spread, self.mean_ms + self.spread)
+            elif self.kind == "lognormal":
+                value = self.mean_ms * self._random.lognormvariate(0.0, self.spread)
+            else:
+                value = self.mean_ms
+        return max(value, 0.0) / 1000.0
+
+    def describe(self) -> dict:
+        return {"kind": self.kind, "mean_ms": self.mean_ms, "spread": self.spread}
+
+
+class StubLLMServer:
+    """OpenAI-compatible /v1/chat/completions and /v1/models served from a background thread."""
+
+    def __init__(self, ttft: LatencyModel, token_latency: LatencyModel, reply_tokens: int = 40,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            ttft: Delay before the first token (the whole prefill for non-streamed calls)
+            token_latency: Delay between streamed tokens
+            reply_tokens: Characters in a chat reply, each streamed as one token
+            host: Bind address
+            port: Bind port, 0 picks a free one
+        """
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.reply = (REPLY_TEXT * (reply_tokens // len(REPLY_TEXT) + 1))[:reply_tokens]
+        self.requests = 0
+        self._last_facts: List[str] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _json_reply(self, messages: List[dict]) -> str:
+        """Answer Mem0's fact extraction and memory update prompts."""
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        if "UPDATE" in prompt and "DELETE" in prompt:
+            with self._lock:
+                facts = list(self._last_facts)
+            return json.dumps({"memory": [
+                {"id": str(i), "text": fact, "event": "ADD"} for i, fact in enumerate(facts)
+            ]}, ensure_ascii=False)
+
+        facts = [line.split(":", 1)[1].strip() for line in prompt.splitlines()
+                 if re.match(r"^\s*user\s*:", line)]
+        facts = [fact for fact in facts if fact][-1:]
+        with self._lock:
+            self._last_facts = facts
+        return json.dumps({"facts": facts}, ensure_ascii=False)
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json({"error": "not found"}, 404)
+                    return
+
+                with stub._lock:
+                    stub.requests += 1
+
+                model = request.get("model", "stub")
+                created = int(time.time())
+                json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+                content = stub._json_reply(request.get("messages", [])) if json_mode else stub.reply
+
+                time.sleep(stub.ttft.sample())
+
+                if not request.get("stream"):
+                    # Decode time for a plain reply; Mem0's short JSON answers only pay the TTFT
+                    if not json_mode:
+                        time.sleep(sum(stub.token_latency.sample() for _ in content))
+                    self._send_json({
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                     "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(content), "total_tokens": len(content)}
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                def send_chunk(delta: dict, finish_reason=None):
+                    chunk = {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                send_chunk({"role": "assistant", "content": ""})
+                for i, token in enumerate(content):
+                    if i:
+                        time.sleep(stub.token_latency.sample())
+                    send_chunk({"content": token})
+                send_chunk({}, finish_reason="stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+class HashEmbedding(EmbeddingBase):
+    """Deterministic character 1-2 gram hashing embedder (no model download)."""
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.dims = (getattr(self.config, "embedding_dims", None)
+                     or Config.get_qdrant_config()["config"]["embedding_model_dims"])
+
+    def embed(self, text, memory_action: Optional[Literal["add", "search", "update"]] = None):
+        vector = np.zeros(self.dims, dtype=np.float32)
+        grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+        for gram in grams:
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dims
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+
+def register_hash_embedder() -> None:
+    """Route Mem0's "huggingface" embedder provider to HashEmbedding."""
+    from mem0.utils.factory import EmbedderFactory
+
+    EmbedderFactory.provider_to_class["huggingface"] = "stub_services.HashEmbedding"
+
+
+def configure_offline_environment(stub_url: str, data_dir: str, collection_name: str,
+                                  hash_embedder: bool = False, disable_caches: bool = False) -> None:
+    """
+    Point memory_agent at the stub LLM and embedded in-memory Qdrant.
+
+    Must run before memory_agent is imported. Local state (caches, user
+    registry, queue) goes to data_dir so benchmark runs don't touch ./data.
+    Duplicate suppression is always off: the scripted messages repeat and
+    the stub extracts them verbatim, so repeats would skip the write path.
+    disable_caches also turns off embedding micro-batching.
+    """
+    os.environ.update({
+        "MODELSCOPE_BASE_URL": stub_url,
+        "MODELSCOPE_API_KEY": "stub",
+        "MODEL_NAME": "stub",
+        "LANGCHAIN_API_KEY": "",
+        "LANGCHAIN_TRACING_V2": "false",
+        "QDRANT_PATH": ":memory:",
+        "QDRANT_COLLECTION_NAME": collection_name,
+        "LOCAL_DATA_DIR": data_dir,
+        "MEMORY_WRITE_MODE": "sync",
+        "MEMORY_DEDUP_ENABLED": "false",
+        "MEMORY_DEDUP_SHADOW": "false",
+        "LOG_LEVEL": "WARNING",
+    })
+    if disable_caches:
+        os.environ.update({
+            "EMBEDDING_CACHE_ENABLED": "false",
+            "SEARCH_CACHE_ENABLED": "false",
+            "SEMANTIC_CACHE_ENABLED": "false",
+            "EMBEDDING_BATCHING_ENABLED": "false",
+        })
+    if hash_embedder:
+        os.environ["EMBEDDING_BACKEND"] = "torch"
+        register_hash_embedder()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end turn latency benchmark with a per-stage breakdown.
+
+Runs a scripted conversation through memory_agent.run_conversation (or,
+with --entry app, memory_agent.run_turn with the partial-reply callback
+that app.get_conversation_response adds; the Streamlit page itself is not
+imported) against:
+  - a local OpenAI-compatible stub LLM with configurable TTFT / per-token
+    latency distributions (benchmarks/stub_services.py)
+  - embedded in-memory Qdrant (QDRANT_PATH=:memory:)
+  - the configured embedder, or a deterministic hash embedder (--embedder hash)
+
+Stages per turn (milliseconds):
+  embed          query embedding on the search path
+  vector_search  Qdrant search on the search path
+  prompt_build   build_system_message
+  llm            chat model call (streamed reply)
+  mem0_add       Mem0 add: fact extraction + update LLM calls, embeddings, upserts
+  total          wall time of the turn
+Embedding and search work done inside Mem0 add is attributed to mem0_add.
+
+Results are saved as JSON; with --baseline, p50/p95 of every stage are
+compared with a stored run and the exit code is 1 on a regression.
+
+Usage:
+    python benchmarks/turn_latency_benchmark.py --embedder hash --output turn.json
+    python benchmarks/turn_latency_benchmark.py --save-baseline benchmarks/turn_baseline.json
+    python benchmarks/turn_latency_benchmark.py --baseline benchmarks/turn_baseline.json --threshold 0.2
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import contextlib
+from collections import defaultdict
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGES = ["embed", "vector_search", "prompt_build", "llm", "mem0_add", "total"]
+
+SCRIPT = [
+    "你好，我叫李明，是一名软件工程师",
+    "我住在杭州，周末喜欢去西湖散步",
+    "我对花生过敏，平时要注意什么？",
+    "你还记得我叫什么名字吗？",
+    "我最近在学习机器学习，有什么入门书推荐？",
+    "我的猫叫咪咪，今年三岁了",
+    "我下个月要去日本旅行，有什么建议？",
+    "帮我回忆一下我们刚才聊了什么",
+]
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+
+class StageTimer:
+    """Accumulates wall time per stage for the turn in progress (turns run one at a time)."""
+
+    def __init__(self):
+        self.current = defaultdict(float)
+        self._outer = None
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            # Work nested inside another timed stage (e.g. embeds inside Mem0 add) belongs to it
+            if self._outer is not None:
+                return func(*args, **kwargs)
+            self._outer = stage
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current[stage] += (time.perf_counter() - start) * 1000
+                self._outer = None
+        return timed
+
+    def reset(self):
+        self.current = defaultdict(float)
+
+
+class TimedLLM:
+    """Proxy around the chat model that times invoke() and delegates everything else."""
+
+    def __init__(self, llm, timer):
+        self._llm = llm
+        self._invoke = timer.wrap("llm", llm.invoke)
+
+    def invoke(self, *args, **kwargs):
+        return self._invoke(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+
+def instrument(memory_agent, timer):
+    """Wrap the stage boundaries of the loaded agent with timers."""
+    memory = memory_agent.get_memory()
+    embedder = memory.embedding_model
+    embedder.embed = timer.wrap("embed", embedder.embed)
+    memory.vector_store.search = timer.wrap("vector_search", memory.vector_store.search)
+    memory.add = timer.wrap("mem0_add", memory.add)
+    memory_agent.build_system_message = timer.wrap("prompt_build", memory_agent.build_system_message)
+
+    timed_llm = TimedLLM(memory_agent.get_llm(), timer)
+    memory_agent.get_llm = lambda: timed_llm
+
+
+def summarize(per_turn):
+    stages = {}
+    for stage in STAGES:
+        values = [turn[stage] for turn in per_turn]
+        stages[stage] = {
+            "mean_ms": float(np.mean(values)) if values else 0.0,
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+        }
+    return stages
+
+
+def compare_with_baseline(stages, baseline, threshold, min_delta_ms):
+    """Return (stage, metric, baseline, current) for every regression beyond the threshold."""
+    regressions = []
+    for stage, metrics in baseline.get("stages", {}).items():
+        if stage not in stages:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = metrics[metric], stages[stage][metric]
+            if after > before * (1 + threshold) and after - before > min_delta_ms:
+                regressions.append((stage, metric, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端对话轮次延迟基准测试 (离线)")
+    parser.add_argument("--turns", type=int, default=40, help="计时的对话轮数")
+    parser.add_argument("--warmup-turns", type=int, default=2, help="不计时的预热轮数")
+    parser.add_argument("--entry", choices=["run_conversation", "app"], default="run_conversation",
+                        help="驱动入口: memory_agent.run_conversation 或应用路径 (run_turn + 逐字刷新回复)")
+    parser.add_argument("--embedder", choices=["model", "hash"], default="model",
+                        help="model: 配置的嵌入模型; hash: 确定性哈希嵌入 (无需下载模型)")
+    parser.add_argument("--no-caches", action="store_true", help="关闭嵌入/检索缓存与嵌入批处理, 测量未命中路径")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="模拟 LLM 首字延迟 (毫秒)")
+    parser.add_argument("--ttft-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal", help="首字延迟分布")
+    parser.add_argument("--ttft-spread", type=float, default=0.3, help="uniform: 毫秒半宽; lognormal: sigma")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="模拟逐字生成间隔 (毫秒)")
+    parser.add_argument("--token-dist", choices=["fixed", "uniform", "lognormal"], default="fixed", help="逐字间隔分布")
+    parser.add_argument("--token-spread", type=float, default=0.0, help="逐字间隔分布参数")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="每条回复的字数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="保存 JSON 结果的路径")
+    parser.add_argument("--baseline", help="对比的基线 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定回归的相对增幅")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="判定回归的最小绝对增幅 (毫秒)")
+    parser.add_argument("--save-baseline", help="将本次结果保存为基线")
+    args = parser.parse_args()
+
+    from stub_services import LatencyModel, StubLLMServer, configure_offline_environment
+
+    stub = StubLLMServer(
+        ttft=LatencyModel(args.ttft_dist, args.ttft_ms, args.ttft_spread, seed=args.seed),
+        token_latency=LatencyModel(args.token_dist, args.token_ms, args.token_spread, seed=args.seed + 1),
+        reply_tokens=args.reply_tokens
+    ).start()
+    configure_offline_environment(
+        stub.base_url,
+        data_dir=tempfile.mkdtemp(prefix="turn_benchmark_"),
+        collection_name="turn_latency_benchmark",
+        hash_embedder=args.embedder == "hash",
+        disable_caches=args.no_caches
+    )
+
+    import memory_agent
+
+    timer = StageTimer()
+    instrument(memory_agent, timer)
+
+    if args.entry == "app":
+        # Importing app outside `streamlit run` would execute the page script;
+        # reproduce what it adds instead: the partial reply rebuilt on every token
+        def run(message, user_id):
+            partial_tokens = []
+
+            def handle_token(token):
+                partial_tokens.append(token)
+                "".join(partial_tokens)
+
+            return memory_agent.run_turn(message, user_id, on_token=handle_token)["response"]
+    else:
+        run = memory_agent.run_conversation
+
+    user_id = "turn_benchmark_user"
+    per_turn = []
+    total_turns = args.warmup_turns + args.turns
+    print(f"⏳ 运行 {total_turns} 轮对话 (预热 {args.warmup_turns} 轮, 入口 {args.entry}, 嵌入 {args.embedder})...")
+
+    for i in range(total_turns):
+        message = SCRIPT[i % len(SCRIPT)]
+        timer.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(message, user_id)
+        timings = dict(timer.current)
+        timings["total"] = (time.perf_counter() - start) * 1000
+        if i >= args.warmup_turns:
+            per_turn.append({stage: timings.get(stage, 0.0) for stage in STAGES})
+
+    stub.stop()
+    stages = summarize(per_turn)
+
+    print(f"\n📊 每轮各阶段耗时 ({args.turns} 轮)")
+    print(f"{'阶段':<16}{'均值(ms)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for stage in STAGES:
+        row = stages[stage]
+        print(f"{stage:<16}{row['mean_ms']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+    results = {
+        "config": {
+            "turns": args.turns,
+            "entry": args.entry,
+            "embedder": args.embedder,
+            "caches": not args.no_caches,
+            "ttft": stub.ttft.describe(),
+            "token_latency": stub.token_latency.describe(),
+            "reply_tokens": args.reply_tokens,
+        },
+        "stages": stages,
+        "per_turn": per_turn,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 结果已保存到 {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 基线已保存到 {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("⚠️ 基线的测试配置与本次不同, 对比结果仅供参考")
+
+        regressions = compare_with_baseline(stages, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ 发现 {len(regressions)} 项性能回归 (阈值 +{args.threshold:.0%}):")
+            for stage, metric, before, after in regressions:
+                print(f"   {stage} {metric}: {before:.1f} → {after:.1f} ms")
+            sys.exit(1)
+        print(f"\n✅ 与基线相比无性能回归 (阈值 +{args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
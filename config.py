@@ -36,6 +36,126 @@ class Config:
             }
         }
 
+    @staticmethod
+    def get_embedding_batching_config() -> Dict[str, Any]:
+        """Get micro-batching configuration for concurrent encode calls."""
+        return {
+            "enabled": os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() == "true",
+            "max_batch_size": int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32")),
+            "max_wait_ms": float(os.getenv("EMBEDDING_MAX_WAIT_MS", "3"))
+        }
+
+    @staticmethod
+    def get_onnx_embedding_config() -> Dict[str, Any]:
+        """Get ONNX Runtime embedder configuration (EMBEDDING_BACKEND=onnx)."""
+        return {
+            # "torch" runs the HuggingFace model, "onnx" the exported ONNX graph
+            "backend": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+            "model_dir": os.getenv("ONNX_MODEL_DIR", os.path.join("models", "m3e-base-onnx")),
+            "quantized": os.getenv("ONNX_QUANTIZED", "true").lower() == "true",
+            "num_threads": int(os.getenv("ONNX_NUM_THREADS", "0")),  # 0 lets ONNX Runtime decide
+            "max_length": int(os.getenv("ONNX_MAX_LENGTH", "512"))
+        }
+
+    @staticmethod
+    def get_data_dir() -> str:
+        """Get the directory for local caches and state files."""
+        return os.getenv("LOCAL_DATA_DIR", "data")
+
+    @staticmethod
+    def get_embedding_cache_config() -> Dict[str, Any]:
+        """Get embedding cache configuration (in-RAM LRU plus on-disk SQLite tier)."""
+        return {
+            "enabled": os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true",
+            "max_entries": int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+            "path": os.getenv(
+                "EMBEDDING_CACHE_PATH",
+                os.path.join(Config.get_data_dir(), "embedding_cache.sqlite3")
+            )
+        }
+
+    @staticmethod
+    def get_search_cache_config() -> Dict[str, Any]:
+        """Get memory search result cache configuration."""
+        return {
+            "enabled": os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true",
+            "max_entries": int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+            "ttl": float(os.getenv("SEARCH_CACHE_TTL", "60"))
+        }
+
+    @staticmethod
+    def get_semantic_cache_config() -> Dict[str, Any]:
+        """Get semantic (paraphrase) query cache configuration."""
+        return {
+            "enabled": os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true",
+            "threshold": float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+            "max_per_user": int(os.getenv("SEMANTIC_CACHE_SIZE", "32")),
+            "max_users": int(os.getenv("SEMANTIC_CACHE_MAX_USERS", "1024")),
+            "ttl": float(os.getenv("SEMANTIC_CACHE_TTL", "300"))
+        }
+
+    @staticmethod
+    def get_storage_gate_config() -> Dict[str, Any]:
+        """
+        Get storage gate configuration (which interactions reach Mem0 add).
+
+        STORAGE_GATE is "heuristic" (greeting/keyword/length rules) or
+        "embedding" (similarity to labelled exemplars). With
+        STORAGE_GATE_SHADOW the embedding gate only logs its decisions.
+        """
+        return {
+            "gate": os.getenv("STORAGE_GATE", "heuristic").lower(),
+            "threshold": float(os.getenv("STORAGE_GATE_THRESHOLD", "0.0")),
+            "shadow": os.getenv("STORAGE_GATE_SHADOW", "false").lower() == "true",
+            "exemplars_path": os.getenv("STORAGE_GATE_EXEMPLARS", "").strip() or None
+        }
+
+    @staticmethod
+    def get_memory_dedup_config() -> Dict[str, Any]:
+        """
+        Get pre-insert near-duplicate suppression configuration.
+
+        When the interaction (user message and reply) is at least
+        MEMORY_DEDUP_THRESHOLD similar to one of the user's memories, Mem0 add
+        is skipped; with action "touch" the matched memory's updated_at is
+        refreshed instead. Off by default: a correction that embeds close to
+        the stored fact would be dropped rather than update it. With
+        MEMORY_DEDUP_SHADOW=true duplicates are only logged and counted.
+        """
+        return {
+            "enabled": os.getenv("MEMORY_DEDUP_ENABLED", "false").lower() == "true",
+            "shadow": os.getenv("MEMORY_DEDUP_SHADOW", "false").lower() == "true",
+            "threshold": float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.95")),
+            "action": os.getenv("MEMORY_DEDUP_ACTION", "touch").lower()
+        }
+
+    @staticmethod
+    def get_user_registry_config() -> Dict[str, Any]:
+        """Get user registry configuration."""
+        return {
+            "path": os.getenv(
+                "USER_REGISTRY_PATH",
+                os.path.join(Config.get_data_dir(), "user_registry.sqlite3")
+            )
+        }
+
+    @staticmethod
+    def get_memory_queue_config() -> Dict[str, Any]:
+        """Get write-behind memory queue configuration."""
+        return {
+            # "sync" stores memories inside the turn, "queue" defers them to memory_worker.py
+            "write_mode": os.getenv("MEMORY_WRITE_MODE", "sync").lower(),
+            "path": os.getenv(
+                "MEMORY_QUEUE_PATH",
+                os.path.join(Config.get_data_dir(), "memory_queue.sqlite3")
+            ),
+            "concurrency": int(os.getenv("MEMORY_WORKER_CONCURRENCY", "4")),
+            "max_attempts": int(os.getenv("MEMORY_WORKER_MAX_ATTEMPTS", "5")),
+            "retry_delay": float(os.getenv("MEMORY_WORKER_RETRY_DELAY", "2")),
+            "poll_interval": float(os.getenv("MEMORY_WORKER_POLL_INTERVAL", "0.5")),
+            "visibility_timeout": float(os.getenv("MEMORY_WORKER_VISIBILITY_TIMEOUT", "300"))
+        }
+
     @staticmethod
     def get_qdrant_config() -> Dict[str, Any]:
         """Get Qdrant vector store configuration."""
@@ -45,10 +165,51 @@ class Config:
                 "collection_name": os.getenv("QDRANT_COLLECTION_NAME", "conversation_memories"),
                 "embedding_model_dims": int(os.getenv("EMBEDDING_DIMS", "768")),
                 "url": os.getenv("QDRANT_URL", "http://localhost:6333"),
-                "api_key": os.getenv("QDRANT_API_KEY", None) or None
+                "api_key": os.getenv("QDRANT_API_KEY", None) or None,
+                # Keep original vectors in memmapped files instead of RAM
+                "on_disk": os.getenv("QDRANT_ON_DISK", "false").lower() == "true"
             }
         }
 
+    @staticmethod
+    def get_qdrant_collection_config() -> Dict[str, Any]:
+        """
+        Get collection provisioning options used by setup_qdrant.py.
+
+        payload_m builds per-tenant HNSW links for user_id-filtered search;
+        QDRANT_HNSW_M=0 drops the global graph when every search is per user.
+        QDRANT_QUANTIZATION is "none", "scalar" (int8) or "binary"; searches
+        then oversample candidates and rescore them with the original vectors.
+        """
+        return {
+            "hnsw_m": int(os.getenv("QDRANT_HNSW_M", "16")),
+            "hnsw_payload_m": int(os.getenv("QDRANT_HNSW_PAYLOAD_M", "16")),
+            "hnsw_ef_construct": int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100")),
+            "quantization": os.getenv("QDRANT_QUANTIZATION", "none").lower(),
+            "quantization_always_ram": os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true",
+            "oversampling": float(os.getenv("QDRANT_OVERSAMPLING", "2.0")),
+            "rescore": os.getenv("QDRANT_RESCORE", "true").lower() == "true",
+            "on_disk_payload": os.getenv("QDRANT_ON_DISK_PAYLOAD", "false").lower() == "true"
+        }
+
+    @staticmethod
+    def get_qdrant_connection_config() -> Dict[str, Any]:
+        """
+        Get transport options for the shared Qdrant client.
+
+        QDRANT_PATH switches to qdrant-client's embedded mode: a local
+        directory, or ":memory:" for a throwaway in-process store. The URL
+        and network options are then ignored.
+        """
+        return {
+            "path": os.getenv("QDRANT_PATH", "").strip() or None,
+            "prefer_grpc": os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true",
+            "grpc_port": int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+            "timeout": int(os.getenv("QDRANT_TIMEOUT", "10")),
+            "keepalive_seconds": float(os.getenv("QDRANT_KEEPALIVE_SECONDS", "30")),
+            "max_connections": int(os.getenv("QDRANT_MAX_CONNECTIONS", "20"))
+        }
+
     @staticmethod
     def get_mem0_config() -> Dict[str, Any]:
         """Get complete Mem0 configuration."""
@@ -59,6 +220,54 @@ class Config:
             "version": os.getenv("MEMORY_VERSION", "v1.1")
         }
 
+    @staticmethod
+    def get_server_config() -> Dict[str, Any]:
+        """Get HTTP serving configuration (server.py)."""
+        return {
+            "host": os.getenv("SERVER_HOST", "0.0.0.0"),
+            "port": int(os.getenv("SERVER_PORT", "8000")),
+            "max_concurrency": int(os.getenv("SERVER_MAX_CONCURRENCY", "32")),
+            "max_queue": int(os.getenv("SERVER_MAX_QUEUE", "64")),
+            "per_user_concurrency": int(os.getenv("SERVER_PER_USER_CONCURRENCY", "1")),
+            "queue_timeout": float(os.getenv("SERVER_QUEUE_TIMEOUT", "10"))
+        }
+
+    @staticmethod
+    def get_metrics_config() -> Dict[str, Any]:
+        """Get in-process metrics export configuration (OpenMetrics text)."""
+        return {
+            "host": os.getenv("METRICS_HOST", "127.0.0.1"),
+            "port": int(os.getenv("METRICS_PORT", "0")),
+            "file": os.getenv("METRICS_FILE", "").strip() or None,
+            "file_interval": float(os.getenv("METRICS_FILE_INTERVAL", "15"))
+        }
+
+    @staticmethod
+    def get_trace_config() -> Dict[str, Any]:
+        """
+        Get tracing backend configuration.
+
+        TRACE_BACKEND is "langsmith", "local" (spans recorded by trace_sink.py),
+        "none", or "auto": LangSmith when an API key is set, no tracing otherwise.
+        The local sink keeps every span it records, so it is only used when
+        chosen explicitly.
+        """
+        backend = os.getenv("TRACE_BACKEND", "auto").lower()
+        if backend == "auto":
+            backend = "langsmith" if os.getenv("LANGCHAIN_API_KEY") else "none"
+        sink_format = os.getenv("TRACE_SINK_FORMAT", "sqlite").lower()
+        return {
+            "backend": backend,
+            "format": sink_format,
+            "path": os.getenv("TRACE_SINK_PATH", "").strip() or os.path.join(
+                Config.get_data_dir(), "traces.jsonl" if sink_format == "jsonl" else "traces.sqlite3"
+            ),
+            "sample_rate": float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+            "queue_size": int(os.getenv("TRACE_QUEUE_SIZE", "10000")),
+            "batch_size": int(os.getenv("TRACE_BATCH_SIZE", "256")),
+            "flush_interval": float(os.getenv("TRACE_FLUSH_INTERVAL", "1.0"))
+        }
+
     @staticmethod
     def get_langsmith_config() -> Dict[str, str]:
         """Get LangSmith configuration for tracing."""
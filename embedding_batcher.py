@@ -0,0 +1,116 @@
+import time
+import queue
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingEmbedder:
+    """
+    Micro-batching front end for a Mem0 embedder.
+
+    Concurrent embed() calls (several sessions searching or storing at the
+    same time) are collected for up to max_wait_ms, encoded in one batch on
+    a background thread, and each caller gets its own vector back. A lone
+    call pays at most max_wait_ms of extra latency.
+    """
+
+    def __init__(self, embedder: Any, max_batch_size: int = 32, max_wait_ms: float = 3.0):
+        """
+        Start the batching thread.
+
+        Args:
+            embedder: Mem0 embedder; batches use embed_batch() (ONNX backend)
+                or the SentenceTransformer in `.model` when available
+            max_batch_size: Maximum texts per encode call
+            max_wait_ms: How long the first request of a batch waits for company
+        """
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._requests: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._texts = 0
+
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name: str) -> Any:
+        # Mem0 reads attributes such as `config` from the embedder
+        return getattr(self.embedder, name)
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        """
+        Embed text as part of the next batch.
+
+        Args:
+            text: Text to embed
+            memory_action: Mem0 memory action; the supported models ignore it
+
+        Returns:
+            Embedding vector
+        """
+        future: Future = Future()
+        self._requests.put((text, future))
+        return future.result()
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        if hasattr(self.embedder, "embed_batch"):
+            return [vector.tolist() for vector in self.embedder.embed_batch(texts)]
+
+        model = getattr(self.embedder, "model", None)
+        if model is not None and hasattr(model, "encode"):
+            return [vector.tolist() for vector in model.encode(texts, convert_to_numpy=True)]
+
+        # Embedders without a batch API (e.g. remote TEI endpoints) are called one by one
+        return [self.embedder.embed(text) for text in texts]
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self._encode_batch(texts)
+            except Exception as e:
+                logger.error(f"Batch embedding of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+                self._batches += 1
+                self._texts += len(batch)
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the batch-size histogram and the mean batch size."""
+        with self._lock:
+            histogram = dict(sorted(self._batch_sizes.items()))
+            batches, texts = self._batches, self._texts
+        return {
+            "batches": batches,
+            "texts": texts,
+            "mean_batch_size": texts / batches if batches else 0.0,
+            "batch_size_histogram": histogram
+        }
@@ -0,0 +1,148 @@
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbedder:
+    """
+    Content-hash keyed embedding cache wrapped around a Mem0 embedder.
+
+    Lookups go through an in-RAM LRU tier first and an on-disk SQLite tier
+    second; only misses reach the wrapped embedder (and torch). Vectors are
+    stored as float32 blobs keyed by sha256(model, dims, text), so switching
+    models or dimensions never returns stale vectors.
+    """
+
+    def __init__(self, embedder: Any, model_name: str, dims: int,
+                 max_entries: int = 10000, path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            embedder: Mem0 embedder instance exposing embed(text, memory_action)
+            model_name: Embedding model name, part of the cache key
+            dims: Embedding dimensions, part of the cache key
+            max_entries: Capacity of the in-RAM LRU tier
+            path: SQLite file for the on-disk tier, None to keep RAM only
+        """
+        self.embedder = embedder
+        self.model_name = model_name
+        self.dims = dims
+        self.max_entries = max_entries
+        self.path = path
+
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, dims INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def __getattr__(self, name: str) -> Any:
+        # Mem0 reads attributes such as `config` from the embedder
+        return getattr(self.embedder, name)
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{self.model_name}\x00{self.dims}\x00".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, text: str) -> Optional[List[float]]:
+        """Return the cached vector for text without computing it, or None."""
+        key = self._key(text)
+
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    self._stats["disk_hits"] += 1
+                    return vector
+
+        return None
+
+    def store(self, text: str, vector: List[float]) -> None:
+        """Put a computed vector into both cache tiers."""
+        key = self._key(text)
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, model, dims, vector) VALUES (?, ?, ?, ?)",
+                        (key, self.model_name, self.dims, blob)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist embedding to cache: {e}")
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        """
+        Embed text, serving repeated strings from the cache.
+
+        Args:
+            text: Text to embed
+            memory_action: Mem0 memory action ("add", "search", "update"),
+                passed through to the wrapped embedder on a miss
+
+        Returns:
+            Embedding vector
+        """
+        vector = self.lookup(text)
+        if vector is not None:
+            return vector
+
+        with self._lock:
+            self._stats["misses"] += 1
+
+        vector = self.embedder.embed(text, memory_action)
+        if hasattr(vector, "tolist"):
+            vector = vector.tolist()
+        self.store(text, vector)
+        return vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._lru)
+
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
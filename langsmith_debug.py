@@ -3,38 +3,355 @@
 LangSmith 调试和监控工具
 
 此脚本提供了一系列工具来监控和调试忆语 (YiYu) 的对话流程。
+使用 --backend local 时读取本地追踪存储 (trace_sink.py, 无需 LangSmith API Key)。
 """
 
 import os
 import sys
+import math
 import time
+import sqlite3
 import argparse
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from collections import deque
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from langsmith import Client
 from config import Config
-from memory_agent import run_conversation
+from memory_agent import run_conversation, local_tracing_enabled
+from trace_sink import open_trace_store
 
 # Load environment variables
 load_dotenv()
 
+# Runs fetched again below the cache watermark, for late-arriving LangSmith ingestion
+RUN_CACHE_OVERLAP = timedelta(minutes=5)
+
+# Monitor: re-read window behind the cursor, give-up age for unfinished runs, poll interval bounds
+MONITOR_OVERLAP = timedelta(seconds=30)
+MONITOR_PENDING_TIMEOUT = timedelta(minutes=10)
+MONITOR_MIN_INTERVAL = 0.5
+MONITOR_MAX_INTERVAL = 15.0
+
+# Upper bounds (seconds) of the monitor's latency histogram columns
+MONITOR_HISTOGRAM_BOUNDS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+HISTOGRAM_BARS = " ▁▂▃▄▅▆▇█"
+
+def _epoch(value: datetime) -> float:
+    """Epoch seconds of a LangSmith timestamp (naive datetimes are UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class LatencySketch:
+    """
+    Streaming quantile sketch with logarithmic buckets.
+
+    Every value lands in bucket ceil(log_gamma(value)), so quantiles are
+    accurate to a relative error of `relative_accuracy` while memory grows
+    only with the spread of the values, not their number.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if rank < cumulative:
+            return 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative > rank:
+                return min(2 * self.gamma ** index / (self.gamma + 1), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+class RunStats:
+    """Count, errors and latency sketch of one run name (in one time bucket)"""
+
+    def __init__(self):
+        self.sketch = LatencySketch()
+        self.count = 0
+        self.errors = 0
+
+    def add(self, duration: Optional[float], status: str) -> None:
+        self.count += 1
+        if duration is not None:
+            self.sketch.add(duration)
+        if status == "error":
+            self.errors += 1
+
+class RunCache:
+    """
+    Local SQLite copy of fetched LangSmith run summaries.
+
+    Each project keeps the earliest start time it covers and a watermark,
+    so a repeated analysis only asks LangSmith for runs started after the
+    watermark (minus RUN_CACHE_OVERLAP). Runs still in progress hold the
+    watermark back until they finish.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "project TEXT NOT NULL, id TEXT NOT NULL, name TEXT NOT NULL, start_time REAL NOT NULL, "
+            "end_time REAL, status TEXT, error TEXT, PRIMARY KEY (project, id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS runs_start_time ON runs (project, start_time)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "project TEXT PRIMARY KEY, covered_from REAL NOT NULL, watermark REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def sync(self, client, project_name: str, start_time: datetime, chunk_size: int = 500) -> int:
+        """
+        Fetch runs missing from the cache for the window starting at start_time.
+
+        Returns:
+            Number of runs fetched from LangSmith
+        """
+        state = self._db.execute(
+            "SELECT covered_from, watermark FROM sync_state WHERE project = ?", (project_name,)
+        ).fetchone()
+        window_start = start_time.timestamp()
+        if state and state[0] <= window_start:
+            covered_from, newest = state
+            fetch_from = max(window_start, newest - RUN_CACHE_OVERLAP.total_seconds())
+        else:
+            covered_from = newest = fetch_from = window_start
+
+        fetched = 0
+        oldest_pending = None
+        chunk = []
+        sql = ("INSERT OR REPLACE INTO runs (project, id, name, start_time, end_time, status, error) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?)")
+        for run in client.list_runs(project_name=project_name,
+                                    start_time=datetime.fromtimestamp(fetch_from, timezone.utc)):
+            run_start = _epoch(run.start_time)
+            run_end = _epoch(run.end_time) if run.end_time else None
+            newest = max(newest, run_start)
+            if run_end is None:
+                oldest_pending = run_start if oldest_pending is None else min(oldest_pending, run_start)
+            chunk.append((project_name, str(run.id), run.name, run_start, run_end, run.status, run.error))
+            fetched += 1
+            if len(chunk) >= chunk_size:
+                self._db.executemany(sql, chunk)
+                chunk = []
+        if chunk:
+            self._db.executemany(sql, chunk)
+
+        watermark = newest if oldest_pending is None else min(newest, oldest_pending)
+        self._db.execute(
+            "INSERT OR REPLACE INTO sync_state (project, covered_from, watermark) VALUES (?, ?, ?)",
+            (project_name, covered_from, watermark)
+        )
+        self._db.commit()
+        return fetched
+
+    def iter_runs(self, project_name: str, start_time: float) -> Iterator[Tuple[str, float, Optional[float], str, Optional[str]]]:
+        """Stream (name, start_time, duration, status, error) of cached runs, oldest first."""
+        cursor = self._db.execute(
+            "SELECT name, start_time, end_time - start_time, status, error FROM runs "
+            "WHERE project = ? AND start_time >= ? ORDER BY start_time",
+            (project_name, start_time)
+        )
+        yield from cursor
+
+class LocalRun:
+    """A span from the local trace store, with the attributes of a LangSmith run"""
+
+    def __init__(self, span: Dict[str, Any]):
+        self.id = span["id"]
+        self.trace_id = span["trace_id"]
+        self.parent_run_id = span.get("parent_id")
+        self.name = span["name"]
+        self.status = span["status"]
+        self.start_time = datetime.fromtimestamp(span["start_time"])
+        self.end_time = datetime.fromtimestamp(span["end_time"])
+        self.inputs = {"size": span.get("inputs_size"), "preview": span.get("inputs_preview")}
+        self.outputs = None
+        self.error = span.get("error")
+
+class LocalTraceClient:
+    """Subset of the LangSmith Client API used by the debugger, backed by the local trace store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def list_runs(self, project_name: Optional[str] = None, limit: Optional[int] = None,
+                  start_time: Optional[datetime] = None, parent_run_id: Optional[str] = None) -> List[LocalRun]:
+        spans = self.store.list_spans(
+            limit=limit,
+            start_time=start_time.timestamp() if start_time else None,
+            parent_id=str(parent_run_id) if parent_run_id else None
+        )
+        return [LocalRun(span) for span in spans]
+
+    def read_run(self, run_id: str) -> LocalRun:
+        span = self.store.get_span(str(run_id))
+        if span is None:
+            raise ValueError(f"运行记录 {run_id} 不存在或 ID 前缀不唯一")
+        return LocalRun(span)
+
+class LangSmithRunCursor:
+    """
+    Incremental poll of a LangSmith project by run start time.
+
+    Each poll asks only for runs started after the newest one seen (minus
+    MONITOR_OVERLAP for ingestion lag), or after the oldest run still in
+    progress, so its cost depends on recent traffic, not on how long the
+    monitor has been running. A run is returned once, when it has finished.
+    """
+
+    def __init__(self, client, project_name: str, start_time: datetime):
+        self.client = client
+        self.project_name = project_name
+        self.cursor = start_time.timestamp()
+        self.pending: Dict[str, float] = {}
+        self.reported: Dict[str, float] = {}
+
+    def _window_start(self) -> float:
+        return min([self.cursor - MONITOR_OVERLAP.total_seconds()] + list(self.pending.values()))
+
+    def poll(self) -> List[Any]:
+        """Runs finished since the previous poll"""
+        give_up = time.time() - MONITOR_PENDING_TIMEOUT.total_seconds()
+        self.pending = {run_id: start for run_id, start in self.pending.items() if start >= give_up}
+
+        finished = []
+        for run in self.client.list_runs(project_name=self.project_name,
+                                         start_time=datetime.fromtimestamp(self._window_start(), timezone.utc)):
+            run_id, run_start = str(run.id), _epoch(run.start_time)
+            self.cursor = max(self.cursor, run_start)
+            if run_id in self.reported:
+                continue
+            if run.end_time is None:
+                self.pending[run_id] = run_start
+                continue
+            self.pending.pop(run_id, None)
+            self.reported[run_id] = run_start
+            finished.append(run)
+
+        window_start = self._window_start()
+        self.reported = {run_id: start for run_id, start in self.reported.items() if start >= window_start}
+        return list(reversed(finished))
+
+class LocalRunCursor:
+    """Incremental poll of the local trace store by write position; spans are written when they finish"""
+
+    def __init__(self, store):
+        self.store = store
+        self.cursor = store.latest_cursor()
+
+    def poll(self) -> List[LocalRun]:
+        spans, self.cursor = self.store.read_since(self.cursor)
+        return [LocalRun(span) for span in spans]
+
+class RollingRunStats:
+    """Latency and errors per run name over a sliding time window"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.samples: Dict[str, deque] = {}
+
+    def add(self, name: str, duration: float, is_error: bool) -> None:
+        self.samples.setdefault(name, deque()).append((time.monotonic(), duration, is_error))
+
+    def _prune(self) -> None:
+        horizon = time.monotonic() - self.window_seconds
+        for name in list(self.samples):
+            samples = self.samples[name]
+            while samples and samples[0][0] < horizon:
+                samples.popleft()
+            if not samples:
+                del self.samples[name]
+
+    def render(self) -> List[str]:
+        self._prune()
+        bounds = [f"<{bound:g}s" if bound != float("inf") else f"≥{MONITOR_HISTOGRAM_BOUNDS[-2]:g}s"
+                  for bound in MONITOR_HISTOGRAM_BOUNDS]
+        lines = [f"{'运行类型':<22}{'次数':>6}{'错误率':>8}{'p50(s)':>8}{'p95(s)':>8}  分布 ({' '.join(bounds)})"]
+        for name, samples in sorted(self.samples.items()):
+            durations = sorted(duration for _, duration, _ in samples)
+            errors = sum(1 for _, _, is_error in samples if is_error)
+            counts = [0] * len(MONITOR_HISTOGRAM_BOUNDS)
+            for duration in durations:
+                counts[next(i for i, bound in enumerate(MONITOR_HISTOGRAM_BOUNDS) if duration < bound)] += 1
+            peak = max(counts)
+            bars = "".join(HISTOGRAM_BARS[math.ceil(count / peak * (len(HISTOGRAM_BARS) - 1))] for count in counts)
+            p50 = durations[int(0.5 * (len(durations) - 1))]
+            p95 = durations[int(0.95 * (len(durations) - 1))]
+            lines.append(f"{name[:21]:<22}{len(durations):>6}{errors / len(durations):>8.1%}{p50:>8.2f}{p95:>8.2f}  {bars}")
+        return lines
+
 class LangSmithDebugger:
     """LangSmith 调试器类"""
 
-    def __init__(self):
-        """初始化调试器"""
+    def __init__(self, backend: str = "auto"):
+        """
+        初始化调试器
+
+        Args:
+            backend: "langsmith", "local" (本地追踪存储) 或 "auto" (按 TRACE_BACKEND 配置)
+        """
         self.client = None
         self.project_name = os.getenv("LANGCHAIN_PROJECT", "YiYu")
-        self._initialize_client()
+        if backend == "auto":
+            backend = "langsmith" if Config.get_trace_config()["backend"] == "langsmith" else "local"
+        self.backend = backend
+        if backend == "local":
+            self._initialize_local_client()
+        else:
+            self._initialize_client()
+
+    def _initialize_local_client(self):
+        """打开本地追踪存储"""
+        trace_config = Config.get_trace_config()
+        try:
+            self.client = LocalTraceClient(open_trace_store(trace_config["format"], trace_config["path"]))
+            print(f"✅ 已打开本地追踪存储: {trace_config['path']}")
+        except Exception as e:
+            print(f"❌ 打开本地追踪存储失败: {e}")
+            sys.exit(1)
 
     def _initialize_client(self):
         """初始化 LangSmith 客户端"""
         try:
+            from langsmith import Client
+
             langsmith_config = Config.get_langsmith_config()
             if langsmith_config.get("LANGCHAIN_API_KEY"):
                 self.client = Client(
@@ -46,7 +363,7 @@ class LangSmithDebugger:
                 self._verify_project()
                 print(f"✅ LangSmith 客户端已初始化，项目: {self.project_name}")
             else:
-                print("❌ LangSmith API Key 未配置")
+                print("❌ LangSmith API Key 未配置 (可使用 --backend local 读取本地追踪)")
                 sys.exit(1)
         except Exception as e:
             print(f"❌ 初始化 LangSmith 客户端失败: {e}")
@@ -103,7 +420,7 @@ class LangSmithDebugger:
 
             for i, run in enumerate(runs, 1):
                 print(f"{i:2d}. 【{run.name}】")
-                print(f"    ID: {run.id[:8]}...")
+                print(f"    ID: {str(run.id)[:8]}...")
                 print(f"    状态: {run.status}")
                 print(f"    开始时间: {run.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
                 print(f"    耗时: {run.end_time - run.start_time if run.end_time else 'N/A'}")
@@ -152,10 +469,10 @@ class LangSmithDebugger:
                 print(f"  {run.error}")
 
             # 获取子运行
-            child_runs = self.client.list_runs(
+            child_runs = list(self.client.list_runs(
                 project_name=self.project_name,
-                parent_run_id=run_id
-            )
+                parent_run_id=run.id
+            ))
 
             if child_runs:
                 print(f"\n🔗 子运行 ({len(child_runs)} 个):")
@@ -165,56 +482,101 @@ class LangSmithDebugger:
         except Exception as e:
             print(f"❌ 获取运行详情失败: {e}")
 
-    def analyze_performance(self, hours: int = 24):
-        """分析最近几小时的性能"""
+    def _iter_run_records(self, start_time: datetime, use_cache: bool = True) -> Iterator[Tuple[str, float, Optional[float], str, Optional[str]]]:
+        """Stream (name, start_time, duration, status, error) of runs since start_time."""
+        if self.backend == "local":
+            for span in self.client.store.iter_spans(start_time=start_time.timestamp()):
+                yield (span["name"], span["start_time"], span["duration_ms"] / 1000,
+                       span["status"], span.get("error"))
+            return
+
+        if use_cache:
+            cache = RunCache(os.path.join(Config.get_data_dir(), "langsmith_runs.sqlite3"))
+            fetched = cache.sync(self.client, self.project_name, start_time)
+            print(f"🔄 从 LangSmith 拉取 {fetched} 条新运行记录 (其余来自本地缓存)")
+            yield from cache.iter_runs(self.project_name, start_time.timestamp())
+            return
+
+        for run in self.client.list_runs(project_name=self.project_name, start_time=start_time):
+            yield (run.name, _epoch(run.start_time),
+                   (run.end_time - run.start_time).total_seconds() if run.end_time else None,
+                   run.status, run.error)
+
+    def analyze_performance(self, hours: int = 24, bucket_minutes: int = 0, use_cache: bool = True):
+        """
+        分析最近几小时的性能
+
+        Args:
+            hours: 分析时间范围
+            bucket_minutes: 时间分桶大小 (分钟), 0 为按时间范围自动选择
+            use_cache: LangSmith 后端是否使用本地运行缓存, 只拉取增量
+        """
         print(f"\n📊 性能分析 (最近 {hours} 小时)")
         print("=" * 80)
 
-        try:
-            start_time = datetime.now() - timedelta(hours=hours)
-
-            runs = list(self.client.list_runs(
-                project_name=self.project_name,
-                start_time=start_time
-            ))
+        if not bucket_minutes:
+            bucket_minutes = 5 if hours <= 1 else 60 if hours <= 48 else 24 * 60
+        bucket_seconds = bucket_minutes * 60
 
-            if not runs:
+        try:
+            start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+
+            # Aggregated while streaming; only per-name sketches are kept in memory
+            totals: Dict[str, RunStats] = {}
+            buckets: Dict[Tuple[int, str], RunStats] = {}
+            recent_failures = deque(maxlen=5)
+            total_runs = successful_runs = failed_runs = 0
+
+            for name, run_start, duration, status, error in self._iter_run_records(start_time, use_cache):
+                total_runs += 1
+                if status == "success":
+                    successful_runs += 1
+                elif status == "error":
+                    failed_runs += 1
+                    recent_failures.append((name, error or ""))
+
+                bucket = int(run_start // bucket_seconds) * bucket_seconds
+                totals.setdefault(name, RunStats()).add(duration, status)
+                buckets.setdefault((bucket, name), RunStats()).add(duration, status)
+
+            if not total_runs:
                 print("📭 指定时间范围内没有运行记录")
                 return
 
-            # 统计分析
-            total_runs = len(runs)
-            successful_runs = len([r for r in runs if r.status == "success"])
-            failed_runs = len([r for r in runs if r.status == "error"])
-
-            execution_times = []
-            for run in runs:
-                if run.end_time and run.start_time:
-                    execution_times.append((run.end_time - run.start_time).total_seconds())
-
-            avg_execution_time = sum(execution_times) / len(execution_times) if execution_times else 0
+            window_minutes = hours * 60
+            overall_time = sum(stats.sketch.total for stats in totals.values())
+            overall_count = sum(stats.sketch.count for stats in totals.values())
 
             print(f"总运行次数: {total_runs}")
             print(f"成功次数: {successful_runs} ({successful_runs/total_runs*100:.1f}%)")
             print(f"失败次数: {failed_runs} ({failed_runs/total_runs*100:.1f}%)")
-            print(f"平均执行时间: {avg_execution_time:.2f} 秒")
-
-            # 按运行类型统计
-            run_types = {}
-            for run in runs:
-                run_types[run.name] = run_types.get(run.name, 0) + 1
-
-            print(f"\n📈 运行类型分布:")
-            for run_type, count in sorted(run_types.items(), key=lambda x: x[1], reverse=True):
-                percentage = count / total_runs * 100
-                print(f"  {run_type}: {count} ({percentage:.1f}%)")
+            print(f"平均执行时间: {overall_time / overall_count if overall_count else 0:.2f} 秒")
+
+            header = f"{'运行类型':<22}{'次数':>7}{'错误':>6}{'次/分':>8}{'p50(s)':>9}{'p90(s)':>9}{'p99(s)':>9}{'max(s)':>9}"
+
+            print(f"\n📈 各运行类型延迟:")
+            print(header)
+            for name, stats in sorted(totals.items(), key=lambda item: item[1].count, reverse=True):
+                sketch = stats.sketch
+                print(f"{name[:21]:<22}{stats.count:>7}{stats.errors:>6}{stats.count / window_minutes:>8.2f}"
+                      f"{sketch.quantile(0.5):>9.2f}{sketch.quantile(0.9):>9.2f}{sketch.quantile(0.99):>9.2f}{sketch.max:>9.2f}")
+
+            print(f"\n🕒 按时间分桶 (每 {bucket_minutes} 分钟):")
+            current_bucket = None
+            for (bucket, name), stats in sorted(buckets.items()):
+                if bucket != current_bucket:
+                    current_bucket = bucket
+                    print(f"\n{datetime.fromtimestamp(bucket).strftime('%Y-%m-%d %H:%M')}")
+                    print(header)
+                sketch = stats.sketch
+                print(f"{name[:21]:<22}{stats.count:>7}{stats.errors:>6}{stats.count / bucket_minutes:>8.2f}"
+                      f"{sketch.quantile(0.5):>9.2f}{sketch.quantile(0.9):>9.2f}{sketch.quantile(0.99):>9.2f}{sketch.max:>9.2f}")
 
             # 失败的运行
-            failed_run_list = [r for r in runs if r.status == "error"]
-            if failed_run_list:
-                print(f"\n❌ 失败的运行:")
-                for run in failed_run_list[:5]:  # 只显示前5个
-                    print(f"  • {run.name} - {run.error[:80]}...")
+            if recent_failures:
+                print(f"\n❌ 最近失败的运行:")
+                for name, error in recent_failures:
+                    print(f"  • {name} - {error[:80]}...")
 
         except Exception as e:
             print(f"❌ 性能分析失败: {e}")
@@ -235,8 +597,13 @@ class LangSmithDebugger:
             print(f"AI回复: {response}")
             print(f"\n⏱️ 执行时间: {end_time - start_time:.2f} 秒")
 
-            # 等待一下让追踪数据上传
-            time.sleep(2)
+            if self.backend == "local":
+                if local_tracing_enabled:
+                    from trace_sink import get_trace_sink
+                    get_trace_sink().flush()
+            else:
+                # 等待一下让追踪数据上传
+                time.sleep(2)
 
             # 获取最新的运行记录
             recent_runs = list(self.client.list_runs(
@@ -247,48 +614,80 @@ class LangSmithDebugger:
             if recent_runs:
                 latest_run = recent_runs[0]
                 print(f"🔗 追踪记录ID: {latest_run.id}")
-                print(f"📊 可以在 LangSmith 控制台查看详细追踪信息")
+                if self.backend == "local":
+                    print(f"📊 可以运行 python langsmith_debug.py details --backend local --run-id {str(latest_run.id)[:8]} 查看详细信息")
+                else:
+                    print(f"📊 可以在 LangSmith 控制台查看详细追踪信息")
 
         except Exception as e:
             print(f"❌ 测试对话失败: {e}")
 
-    def monitor_real_time(self, duration_minutes: int = 5):
-        """实时监控运行"""
+    def monitor_real_time(self, duration_minutes: int = 5, window_minutes: float = 5, summary_seconds: float = 10):
+        """
+        实时监控运行
+
+        Args:
+            duration_minutes: 监控时长
+            window_minutes: 滚动统计窗口
+            summary_seconds: 打印滚动统计的间隔
+        """
         print(f"\n👁️ 实时监控 ({duration_minutes} 分钟)")
         print("=" * 80)
         print("按 Ctrl+C 停止监控...")
 
-        start_time = datetime.now()
-        last_run_count = 0
+        if self.backend == "local":
+            cursor = LocalRunCursor(self.client.store)
+        else:
+            cursor = LangSmithRunCursor(self.client, self.project_name, datetime.now(timezone.utc))
+        rolling = RollingRunStats(window_minutes * 60)
+        deadline = time.monotonic() + duration_minutes * 60
+        next_summary = time.monotonic() + summary_seconds
+        interval = 2.0
+        changed = False
+
+        def print_summary():
+            print(f"\n📊 最近 {window_minutes:g} 分钟 (轮询间隔 {interval:.1f} 秒)")
+            for line in rolling.render():
+                print(line)
+            print()
 
         try:
-            while (datetime.now() - start_time).seconds < duration_minutes * 60:
+            while True:
                 try:
-                    runs = list(self.client.list_runs(
-                        project_name=self.project_name,
-                        start_time=start_time
-                    ))
-
-                    current_run_count = len(runs)
-                    if current_run_count > last_run_count:
-                        new_runs = current_run_count - last_run_count
-                        latest_run = runs[0] if runs else None
-
-                        if latest_run:
-                            print(f"🆕 新运行: {latest_run.name} - {latest_run.status}")
-                            if latest_run.status == "error":
-                                print(f"   ❌ 错误: {latest_run.error[:60]}...")
+                    new_runs = cursor.poll()
+                except Exception as e:
+                    print(f"⚠️ 获取运行记录失败: {e}")
+                    new_runs = None
+
+                for run in new_runs or []:
+                    duration = (run.end_time - run.start_time).total_seconds()
+                    rolling.add(run.name, duration, run.status == "error")
+                    print(f"🆕 新运行: {run.name} - {run.status} ({duration:.2f} 秒)")
+                    if run.status == "error":
+                        print(f"   ❌ 错误: {(run.error or '')[:60]}...")
+                changed = changed or bool(new_runs)
+                if time.monotonic() >= deadline:
+                    break
 
-                        last_run_count = current_run_count
+                # Poll faster while runs are arriving, back off while idle or failing
+                if new_runs:
+                    interval = max(MONITOR_MIN_INTERVAL, interval / 2)
+                else:
+                    interval = min(MONITOR_MAX_INTERVAL, interval * 1.5)
 
-                    time.sleep(2)  # 每2秒检查一次
+                if changed and time.monotonic() >= next_summary:
+                    print_summary()
+                    next_summary = time.monotonic() + summary_seconds
+                    changed = False
 
-                except KeyboardInterrupt:
-                    break
+                time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
 
         except KeyboardInterrupt:
             print("\n监控已停止")
 
+        if changed:
+            print_summary()
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="LangSmith 调试和监控工具")
@@ -302,10 +701,15 @@ def main():
     parser.add_argument("--input", help="测试输入 (用于 test 命令)")
     parser.add_argument("--user-id", default="debug_user", help="用户ID (用于 test 命令)")
     parser.add_argument("--duration", type=int, default=5, help="监控时长分钟数 (用于 monitor 命令)")
+    parser.add_argument("--window", type=float, default=5, help="滚动统计窗口分钟数 (用于 monitor 命令)")
+    parser.add_argument("--bucket-minutes", type=int, default=0, help="时间分桶分钟数, 0 为自动 (用于 performance 命令)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用本地运行缓存, 重新拉取全部记录 (用于 performance 命令)")
+    parser.add_argument("--backend", choices=["auto", "langsmith", "local"], default="auto",
+                        help="追踪数据来源: LangSmith 或本地追踪存储 (auto 按 TRACE_BACKEND 配置)")
 
     args = parser.parse_args()
 
-    debugger = LangSmithDebugger()
+    debugger = LangSmithDebugger(args.backend)
 
     if args.command == "list":
         debugger.list_recent_runs(args.limit)
@@ -315,14 +719,14 @@ def main():
             sys.exit(1)
         debugger.get_run_details(args.run_id)
     elif args.command == "performance":
-        debugger.analyze_performance(args.hours)
+        debugger.analyze_performance(args.hours, args.bucket_minutes, not args.no_cache)
     elif args.command == "test":
         if not args.input:
             print("❌ 请提供 --input 参数")
             sys.exit(1)
         debugger.run_test_conversation(args.input, args.user_id)
     elif args.command == "monitor":
-        debugger.monitor_real_time(args.duration)
+        debugger.monitor_real_time(args.duration, args.window)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
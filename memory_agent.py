@@ -1,6 +1,14 @@
 import os
+import time
+import asyncio
+import inspect
 import logging
-from typing import Annotated, List, Dict, Any, TypedDict, Union
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Annotated, List, Dict, Any, TypedDict, Union, Iterator, AsyncIterator, Optional, Callable
 from dotenv import load_dotenv
 
 # LangGraph imports
@@ -8,18 +16,17 @@ from langgraph.graph import StateGraph, START
 from langgraph.graph.message import add_messages
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
-# LangChain imports
-from langchain_openai import ChatOpenAI
-
-# LangSmith imports
-from langsmith import traceable, Client
-from langsmith import utils as langsmith_utils
-
-# Mem0 imports
-from mem0 import Memory
+# Heavy dependencies (langchain_openai, mem0 and through it torch/transformers,
+# the LangSmith client) are imported on first use; see the get_* accessors.
 
 # Local imports
 from config import Config
+from qdrant_pool import get_qdrant_client, apply_search_params, instrument_vector_store
+from user_registry import get_user_registry, count_memory_delta
+from memory_queue import get_memory_queue
+from search_cache import SearchResultCache
+from semantic_cache import SemanticQueryCache
+from metrics import get_metrics_registry, start_metrics_exporters
 
 # Load environment variables
 load_dotenv()
@@ -36,9 +43,14 @@ env_vars = Config.get_env_variables()
 langsmith_config = Config.get_langsmith_config()
 has_langsmith_key = bool(langsmith_config.get("LANGCHAIN_API_KEY"))
 
+# Tracing backend is decided from configuration alone; the LangSmith client itself is lazy
+trace_config = Config.get_trace_config()
+langsmith_enabled = has_langsmith_key and trace_config["backend"] == "langsmith"
+local_tracing_enabled = trace_config["backend"] == "local"
+
 for key, value in env_vars.items():
-    # Only set LangSmith environment variables if API key is provided
-    if key.startswith("LANGCHAIN_") and not has_langsmith_key:
+    # Only set LangSmith environment variables if LangSmith is the tracing backend
+    if key.startswith("LANGCHAIN_") and not langsmith_enabled:
         # Disable LangSmith tracing completely
         if key == "LANGCHAIN_TRACING_V2":
             os.environ[key] = "false"
@@ -46,62 +58,338 @@ for key, value in env_vars.items():
     if value:
         os.environ[key] = value
 
-# Initialize LLM
-try:
-    llm = ChatOpenAI(
-        model=os.getenv("MODEL_NAME", "deepseek-ai/DeepSeek-V3.1"),
-        temperature=float(os.getenv("MODEL_TEMPERATURE", "0.2")),
-        max_tokens=int(os.getenv("MODEL_MAX_TOKENS", "2000"))
-    )
-    logger.info("LLM initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize LLM: {e}")
-    raise
-
-# Initialize Memory with Qdrant
-try:
-    mem0_config = Config.get_mem0_config()
-    memory = Memory.from_config(mem0_config)
-    logger.info("Memory system initialized with Qdrant")
-except Exception as e:
-    logger.error(f"Failed to initialize Memory: {e}")
-    raise
-
-# Initialize LangSmith Client (only if API key is provided)
-langsmith_client = None
-langsmith_enabled = False
-langsmith_config = Config.get_langsmith_config()
-if langsmith_config.get("LANGCHAIN_API_KEY"):
+# Memory write mode ("sync" or write-behind "queue")
+memory_queue_config = Config.get_memory_queue_config()
+
+def _registry_generation(user_id: str) -> Any:
+    """Write marker for a user from the registry, updated by every persisted interaction."""
+    user = get_user_registry().get_user(user_id)
+    return (user["interaction_count"], user["last_activity"]) if user else None
+
+# Search result cache; in queue mode writes happen in memory_worker.py, so
+# entries are also checked against the user's registry row
+search_cache_config = Config.get_search_cache_config()
+search_cache = SearchResultCache(
+    max_entries=search_cache_config["max_entries"],
+    ttl=search_cache_config["ttl"],
+    generation_fn=_registry_generation if memory_queue_config["write_mode"] == "queue" else None
+) if search_cache_config["enabled"] else None
+
+# Paraphrase cache: reuses results of a recent, semantically close query
+semantic_cache_config = Config.get_semantic_cache_config()
+semantic_cache = SemanticQueryCache(
+    threshold=semantic_cache_config["threshold"],
+    max_per_user=semantic_cache_config["max_per_user"],
+    ttl=semantic_cache_config["ttl"],
+    generation_fn=search_cache.generation_fn if search_cache else None,
+    max_users=semantic_cache_config["max_users"]
+) if semantic_cache_config["enabled"] else None
+
+def invalidate_user_searches(user_id: str) -> None:
+    """Drop cached search results for a user after a memory write."""
+    if search_cache:
+        search_cache.invalidate_user(user_id)
+    if semantic_cache:
+        semantic_cache.invalidate_user(user_id)
+
+if local_tracing_enabled:
+    logger.info("Recording traces to the local trace sink")
+elif not has_langsmith_key:
+    logger.info("LangSmith API key not provided, running without tracing")
+elif not langsmith_enabled:
+    logger.info(f"Tracing backend '{trace_config['backend']}', LangSmith tracing disabled")
+
+# Lazily created singletons
+_init_lock = threading.RLock()
+_llm = None
+_memory = None
+_langsmith_client = None
+_conversation_graph = None
+_async_conversation_graph = None
+_storage_gate = None
+embedding_cache = None
+embedding_batcher = None
+
+def get_llm():
+    """Return the chat model, creating it on first use."""
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+
+                try:
+                    _llm = ChatOpenAI(
+                        model=os.getenv("MODEL_NAME", "deepseek-ai/DeepSeek-V3.1"),
+                        temperature=float(os.getenv("MODEL_TEMPERATURE", "0.2")),
+                        max_tokens=int(os.getenv("MODEL_MAX_TOKENS", "2000"))
+                    )
+                    logger.info("LLM initialized successfully")
+                except Exception as e:
+                    logger.error(f"Failed to initialize LLM: {e}")
+                    raise
+    return _llm
+
+def get_memory():
+    """Return the Mem0 memory client (embedder, Qdrant store), creating it on first use."""
+    global _memory, embedding_cache, embedding_batcher
+    if _memory is None:
+        with _init_lock:
+            if _memory is None:
+                from mem0 import Memory
+                from embedding_cache import CachedEmbedder
+                from embedding_batcher import BatchingEmbedder
+
+                if Config.get_onnx_embedding_config()["backend"] == "onnx":
+                    from onnx_embedder import register_onnx_embedder
+                    register_onnx_embedder()
+
+                try:
+                    mem0_config = Config.get_mem0_config()
+                    # Share the process-wide pooled client instead of letting Mem0 open its own
+                    mem0_config["vector_store"]["config"]["client"] = get_qdrant_client()
+                    created = Memory.from_config(mem0_config)
+                    apply_search_params(created.vector_store)
+                    instrument_vector_store(created.vector_store)
+                    logger.info("Memory system initialized with Qdrant")
+                except Exception as e:
+                    logger.error(f"Failed to initialize Memory: {e}")
+                    raise
+
+                # Coalesce concurrent encode calls from different sessions into one batch
+                batching_config = Config.get_embedding_batching_config()
+                if batching_config["enabled"]:
+                    embedding_batcher = BatchingEmbedder(
+                        created.embedding_model,
+                        max_batch_size=batching_config["max_batch_size"],
+                        max_wait_ms=batching_config["max_wait_ms"]
+                    )
+                    created.embedding_model = embedding_batcher
+                    logger.info(
+                        f"Embedding micro-batching enabled (max_batch_size={batching_config['max_batch_size']}, "
+                        f"max_wait_ms={batching_config['max_wait_ms']})"
+                    )
+
+                # Serve repeated texts from the embedding cache instead of re-encoding them.
+                # The semantic cache needs it: it embeds the query for its lookup and
+                # Mem0's search() embeds it again, which must be a cache hit
+                cache_config = Config.get_embedding_cache_config()
+                if cache_config["enabled"] or semantic_cache_config["enabled"]:
+                    embedding_cache = CachedEmbedder(
+                        created.embedding_model,
+                        model_name=mem0_config["embedder"]["config"]["model"],
+                        dims=mem0_config["vector_store"]["config"]["embedding_model_dims"],
+                        max_entries=cache_config["max_entries"],
+                        path=cache_config["path"]
+                    )
+                    created.embedding_model = embedding_cache
+                    if not cache_config["enabled"]:
+                        logger.info("Embedding cache enabled for the semantic cache despite EMBEDDING_CACHE_ENABLED=false")
+                    logger.info(f"Embedding cache enabled at {cache_config['path']}")
+
+                logger.info(f"Memory write mode: {memory_queue_config['write_mode']}")
+                _memory = created
+    return _memory
+
+def get_langsmith_client():
+    """Return the LangSmith client, or None if no API key is configured."""
+    global _langsmith_client
+    if _langsmith_client is None and langsmith_enabled:
+        with _init_lock:
+            if _langsmith_client is None:
+                from langsmith import Client
+
+                try:
+                    _langsmith_client = Client(
+                        api_url=langsmith_config["LANGCHAIN_ENDPOINT"],
+                        api_key=langsmith_config["LANGCHAIN_API_KEY"]
+                    )
+                    logger.info("LangSmith client initialized successfully")
+                except Exception as e:
+                    logger.error(f"Failed to initialize LangSmith client: {e}")
+    return _langsmith_client
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    """Return embedding cache hit/miss counters (empty if the cache is disabled)."""
+    return embedding_cache.get_stats() if embedding_cache else {}
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Return search result cache hit/miss counters (empty if the cache is disabled)."""
+    return search_cache.get_stats() if search_cache else {}
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """Return semantic query cache hit/miss counters (empty if the cache is disabled)."""
+    return semantic_cache.get_stats() if semantic_cache else {}
+
+def get_embedding_batch_stats() -> Dict[str, Any]:
+    """Return the embedding batch-size histogram (empty if batching is disabled)."""
+    return embedding_batcher.get_stats() if embedding_batcher else {}
+
+def _base_embedder(embedder: Any) -> Any:
+    """Unwrap cache/batching layers down to the model-backed embedder."""
+    while hasattr(embedder, "__dict__") and "embedder" in embedder.__dict__:
+        embedder = embedder.__dict__["embedder"]
+    return embedder
+
+def warmup() -> Dict[str, float]:
+    """
+    Load everything a turn needs ahead of the first request.
+
+    Creates the LLM, loads the embedding model and runs a dummy encode
+    through it (bypassing the embedding cache), embeds the storage gate's
+    exemplars, pre-connects the LLM HTTP client and compiles the
+    conversation graphs.
+
+    Returns:
+        Seconds spent in each warm-up step
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    llm = get_llm()
+    timings["llm"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    memory = get_memory()
+    timings["memory"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _base_embedder(memory.embedding_model).embed("预热", "search")
+    timings["encode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_storage_gate().prepare()
+    timings["storage_gate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
     try:
-        langsmith_client = Client(
-            api_url=langsmith_config["LANGCHAIN_ENDPOINT"],
-            api_key=langsmith_config["LANGCHAIN_API_KEY"]
-        )
-        langsmith_enabled = True
-        logger.info("LangSmith client initialized successfully")
+        # Any request opens the pooled connection (TLS included) for the first turn
+        llm.root_client.models.list()
     except Exception as e:
-        logger.error(f"Failed to initialize LangSmith client: {e}")
-        langsmith_client = None
-else:
-    logger.info("LangSmith API key not provided, running without tracing")
+        logger.debug(f"LLM pre-connect request failed (connection is still warmed): {e}")
+    timings["preconnect"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_conversation_graph()
+    get_async_conversation_graph()
+    timings["graph"] = time.perf_counter() - start
+
+    logger.info("Warm-up finished: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+    return timings
+
+def __getattr__(name: str) -> Any:
+    # Keep `memory_agent.llm`, `.memory`, `.conversation_graph` etc. working
+    # for callers while creating them only when first accessed
+    accessors = {
+        "llm": get_llm,
+        "memory": get_memory,
+        "langsmith_client": get_langsmith_client,
+        "conversation_graph": lambda: get_conversation_graph(),
+        "async_conversation_graph": lambda: get_async_conversation_graph(),
+    }
+    if name in accessors:
+        return accessors[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Conditional traceable decorator
 def conditional_traceable(name=None):
-    """Apply traceable decorator only if LangSmith is enabled"""
+    """Apply the LangSmith or local trace sink decorator, depending on TRACE_BACKEND"""
     def decorator(func):
         if langsmith_enabled:
+            from langsmith import traceable
+            return traceable(name=name or func.__name__)(func)
+        elif local_tracing_enabled:
+            from trace_sink import traceable
             return traceable(name=name or func.__name__)(func)
         else:
             return func
     return decorator
 
+# Hot-path metrics, exported in OpenMetrics format (see metrics.py)
+metrics_registry = get_metrics_registry()
+stage_latency = metrics_registry.histogram(
+    "yiyu_stage_duration_seconds", "Latency of conversation hot-path stages", ("stage",)
+)
+stage_errors = metrics_registry.counter(
+    "yiyu_stage_errors", "Exceptions raised by conversation hot-path stages", ("stage",)
+)
+memory_operations = metrics_registry.counter(
+    "yiyu_memory_operations", "Embed, vector search, Mem0 add and duplicate-check operations", ("operation",)
+)
+turns_served = metrics_registry.counter("yiyu_turns", "Conversation turns completed")
+time_to_first_token_seconds = metrics_registry.histogram(
+    "yiyu_time_to_first_token_seconds", "Time from the start of a turn to its first streamed token"
+)
+memory_write_outcomes = metrics_registry.counter(
+    "yiyu_memory_writes", "Storage decisions per turn", ("outcome",)
+)
+memory_dedup_checks = metrics_registry.counter(
+    "yiyu_memory_dedup_checks", "Pre-insert near-duplicate checks", ("result",)
+)
+metrics_registry.gauge(
+    "yiyu_cache_hit_ratio", "Hit ratio of the embedding, search and semantic caches", ("cache",),
+    function=lambda: {
+        cache: stats["hit_rate"]
+        for cache, stats in (
+            ("embedding", get_embedding_cache_stats()),
+            ("search", get_search_cache_stats()),
+            ("semantic", get_semantic_cache_stats())
+        ) if stats
+    }
+)
+metrics_registry.gauge(
+    "yiyu_embedding_mean_batch_size", "Mean number of texts per embedding batch",
+    function=lambda: get_embedding_batch_stats().get("mean_batch_size")
+)
+
+def get_memory_dedup_stats() -> Dict[str, Any]:
+    """Near-duplicate checks and the share of Mem0 adds they skipped."""
+    duplicates = memory_dedup_checks.get(result="duplicate")
+    shadow_duplicates = memory_dedup_checks.get(result="shadow_duplicate")
+    checked = duplicates + shadow_duplicates + memory_dedup_checks.get(result="new")
+    return {
+        "checks": int(checked),
+        "duplicates": int(duplicates),
+        "shadow_duplicates": int(shadow_duplicates),
+        "errors": int(memory_dedup_checks.get(result="error")),
+        "skip_rate": duplicates / checked if checked else 0.0
+    }
+
+def get_stage_latency_summary() -> Dict[str, Dict[str, float]]:
+    """Return count/mean/p50/p95 (seconds) per hot-path stage observed so far."""
+    return {
+        labels["stage"]: stage_latency.summary(**labels)
+        for labels in stage_latency.label_sets()
+    }
+
+# Counters for the expensive memory operations: process totals plus the
+# counter of the turn currently running in this context
+operation_counts = Counter()
+_turn_operation_counts: ContextVar[Union[Counter, None]] = ContextVar("turn_operation_counts", default=None)
+
+def count_operation(name: str) -> None:
+    """Record one embed/search/add operation for the process and the current turn."""
+    operation_counts[name] += 1
+    memory_operations.inc(operation=name)
+    turn_counts = _turn_operation_counts.get()
+    if turn_counts is not None:
+        turn_counts[name] += 1
+
+def get_operation_counts() -> Dict[str, int]:
+    """Return a snapshot of the process-wide embed/search/add counters."""
+    return {key: operation_counts[key] for key in ("embed", "search", "add")}
+
 # Define conversation state
-class State(TypedDict):
+class State(TypedDict, total=False):
     """Conversation state for LangGraph."""
     messages: Annotated[List[Union[HumanMessage, AIMessage]], add_messages]
     mem0_user_id: str
+    # Filled in by the chatbot node so callers don't have to repeat the work
+    memories: List[Dict[str, Any]]
+    memory_result: Dict[str, Any]
 
 @conditional_traceable(name="memory_search")
+@stage_latency.time(errors=stage_errors, stage="search")
 def search_memories(query: str, user_id: str, limit: int = 5) -> Dict[str, Any]:
     """
     Search for relevant memories with LangSmith tracing.
@@ -116,13 +404,38 @@ def search_memories(query: str, user_id: str, limit: int = 5) -> Dict[str, Any]:
     """
     logger.info(f"Searching memories for user {user_id} with query: {query[:50]}...")
 
-    # Perform memory search
-    memories = memory.search(
+    if search_cache:
+        cached = search_cache.get(user_id, query, limit)
+        if cached is not None:
+            logger.info(f"Serving {len(cached.get('results', []))} memories from the search cache")
+            return cached
+        generation = search_cache.generation(user_id)
+
+    # Perform memory search (one query embedding plus one vector search)
+    count_operation("embed")
+    if semantic_cache:
+        # Mem0 re-embeds the query inside search(); the embedding cache serves that second call
+        semantic_generation = semantic_cache.generation(user_id)
+        query_vector = get_memory().embedding_model.embed(query, "search")
+        memories = semantic_cache.get(user_id, query_vector, limit)
+        if memories is not None:
+            logger.info(f"Serving {len(memories.get('results', []))} memories from a similar recent query")
+            if search_cache:
+                search_cache.put(user_id, query, limit, memories, generation)
+            return memories
+
+    count_operation("search")
+    memories = get_memory().search(
         query,
         user_id=user_id,
         limit=limit
     )
 
+    if search_cache:
+        search_cache.put(user_id, query, limit, memories, generation)
+    if semantic_cache:
+        semantic_cache.put(user_id, query_vector, limit, memories, semantic_generation)
+
     # Process results for tracking
     memory_count = len(memories.get('results', [])) if memories and 'results' in memories else 0
     memory_texts = []
@@ -139,7 +452,181 @@ def search_memories(query: str, user_id: str, limit: int = 5) -> Dict[str, Any]:
 
     return memories
 
+# Pre-insert near-duplicate suppression
+memory_dedup_config = Config.get_memory_dedup_config()
+
+def find_duplicate_memory(text: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Find the user's closest existing memory if the text repeats it.
+
+    Embeds the text and runs a user-filtered top-1 query against the Mem0
+    collection.
+
+    Args:
+        text: Candidate interaction text
+        user_id: User identifier
+
+    Returns:
+        {"id", "score", "memory"} of the match at or above the threshold, otherwise None
+    """
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+    memory = get_memory()
+    # Counted apart from the turn's embed/search so the per-turn counts stay 1/1
+    count_operation("dedup_search")
+    vector = memory.embedding_model.embed(text, "search")
+    response = memory.vector_store.client.query_points(
+        collection_name=memory.vector_store.collection_name,
+        query=vector,
+        query_filter=Filter(must=[FieldCondition(key="user_id", match=MatchValue(value=user_id))]),
+        limit=1,
+        with_payload=["data"]
+    )
+    if not response.points or response.points[0].score < memory_dedup_config["threshold"]:
+        return None
+    point = response.points[0]
+    return {"id": point.id, "score": point.score, "memory": (point.payload or {}).get("data", "")}
+
+def touch_memory(memory_id: Any) -> None:
+    """Refresh a memory's updated_at without going through Mem0."""
+    import pytz
+
+    memory = get_memory()
+    memory.vector_store.client.set_payload(
+        collection_name=memory.vector_store.collection_name,
+        # Same timezone and format as Mem0, so ISO strings keep sorting correctly
+        payload={"updated_at": datetime.now(pytz.timezone("US/Pacific")).isoformat()},
+        points=[memory_id]
+    )
+
+def suppress_duplicate_interaction(interaction: List[Dict[str, str]], user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Skip Mem0 add when the interaction repeats one of the user's memories.
+
+    The user message and the reply are compared together, so a reply that
+    acknowledges a change ("got it, no more coffee") pulls a correction
+    away from the fact it corrects.
+
+    Args:
+        interaction: List of message dictionaries
+        user_id: User identifier
+
+    Returns:
+        A "skipped" storage result for a near-duplicate, otherwise None
+        (always None in shadow mode)
+    """
+    user_message = interaction[0]["content"].strip() if interaction else ""
+    if not (memory_dedup_config["enabled"] or memory_dedup_config["shadow"]) or not user_message:
+        return None
+    text = "\n".join(f"{message['role']}: {message['content'].strip()}" for message in interaction)
+
+    try:
+        duplicate = find_duplicate_memory(text, user_id)
+    except Exception as e:
+        # Fail open: the full Mem0 add still deduplicates through its update step
+        logger.warning(f"Duplicate check failed for user {user_id}, adding normally: {e}")
+        memory_dedup_checks.inc(result="error")
+        return None
+
+    if duplicate is None:
+        memory_dedup_checks.inc(result="new")
+        return None
+
+    if not memory_dedup_config["enabled"]:
+        memory_dedup_checks.inc(result="shadow_duplicate")
+        logger.info(
+            f"Duplicate check (shadow) for user {user_id}: would skip Mem0 add, repeats memory "
+            f"{duplicate['id']} (similarity {duplicate['score']:.3f})"
+        )
+        return None
+    memory_dedup_checks.inc(result="duplicate")
+
+    if memory_dedup_config["action"] == "touch":
+        try:
+            touch_memory(duplicate["id"])
+        except Exception as e:
+            logger.warning(f"Failed to touch memory {duplicate['id']}: {e}")
+
+    logger.info(
+        f"Skipping Mem0 add for user {user_id}: repeats memory {duplicate['id']} "
+        f"(similarity {duplicate['score']:.3f})"
+    )
+    return {
+        "results": [],
+        "message": "Skipped: repeats an existing memory",
+        "duplicate_of": str(duplicate["id"]),
+        "similarity": duplicate["score"]
+    }
+
+@stage_latency.time(errors=stage_errors, stage="mem0_add")
+def persist_interaction(interaction: List[Dict[str, str]], user_id: str) -> Dict[str, Any]:
+    """
+    Add an interaction to Mem0 and update the user registry.
+
+    This is the expensive part of storage (LLM fact extraction, embedding
+    and Qdrant upserts). It runs inline in sync write mode and in
+    memory_worker.py in queue mode. Errors are raised to the caller.
+    Interactions that repeat an existing memory can skip Mem0 entirely.
+
+    Args:
+        interaction: List of message dictionaries
+        user_id: User identifier
+
+    Returns:
+        Mem0 add() result, or a "skipped" result for a near-duplicate
+    """
+    duplicate = suppress_duplicate_interaction(interaction, user_id)
+    if duplicate:
+        return duplicate
+
+    count_operation("add")
+    try:
+        memory_result = get_memory().add(interaction, user_id=user_id)
+    finally:
+        # Even a failed add may have written some memories
+        invalidate_user_searches(user_id)
+    memories_added = len(memory_result.get('results', []))
+    logger.info(f"Successfully stored {memories_added} memories")
+
+    # Keep the user registry current so startup never has to scan Qdrant
+    try:
+        get_user_registry().record_write(user_id, count_memory_delta(memory_result))
+    except Exception as e:
+        logger.warning(f"Failed to update user registry for {user_id}: {e}")
+
+    return memory_result
+
+def get_storage_gate():
+    """Return the storage gate (see storage_gate.py), creating it on first use."""
+    global _storage_gate
+    if _storage_gate is None:
+        with _init_lock:
+            if _storage_gate is None:
+                from storage_gate import build_storage_gate
+
+                # The search path already embedded the user message, so this is an embedding cache hit
+                _storage_gate = build_storage_gate(lambda text: get_memory().embedding_model.embed(text, "search"))
+    return _storage_gate
+
+def get_storage_gate_stats() -> Dict[str, Any]:
+    """Storage gate decisions and saved Mem0 add calls since startup."""
+    return _storage_gate.get_stats() if _storage_gate else {}
+
+def check_storage_skip(interaction: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """
+    Decide whether an interaction is worth the cost of a Mem0 add.
+
+    Args:
+        interaction: List of message dictionaries
+
+    Returns:
+        A "skipped" storage result if the interaction should not be stored,
+        otherwise None
+    """
+    return get_storage_gate().check(interaction)
+
 @conditional_traceable(name="memory_storage")
+@stage_latency.time(errors=stage_errors, stage="store")
 def store_interaction(interaction: List[Dict[str, str]], user_id: str) -> Dict[str, Any]:
     """
     Store interaction in memory with smart logic to reduce API calls.
@@ -156,42 +643,56 @@ def store_interaction(interaction: List[Dict[str, str]], user_id: str) -> Dict[s
     # Smart memory storage logic to reduce API calls
     try:
         # Check if this interaction is worth storing
-        user_message = interaction[0]["content"] if interaction else ""
-        assistant_message = interaction[1]["content"] if len(interaction) > 1 else ""
-
-        # Skip storing for very short or simple interactions
-        if len(user_message.strip()) < 5 or len(assistant_message.strip()) < 10:
-            logger.info("Skipping memory storage for very short interaction")
-            return {"results": [], "message": "Skipped: interaction too short"}
-
-        # Skip storing for simple greetings that don't contain meaningful information
-        simple_greetings = ["你好", "hello", "hi", "嗨", "在吗", "在不在", "哈喽", "早上好", "晚上好", "嘿", "嗨嗨"]
-        if user_message.strip().lower() in simple_greetings and len(assistant_message.strip()) < 30:
-            logger.info("Skipping memory storage for simple greeting")
-            return {"results": [], "message": "Skipped: simple greeting"}
-
-        # But DO store interactions with important personal information
-        important_keywords = ["我叫", "我是", "我的名字", "我来自", "我喜欢", "我不喜欢", "我的职业", "我工作", "我学习", "我住"]
-        if any(keyword in user_message for keyword in important_keywords):
-            logger.info("Force storing memory due to important personal information")
-            # Proceed with memory storage without length checks
-        elif len(user_message.strip()) < 8 and len(assistant_message.strip()) < 25:
-            logger.info("Skipping memory storage for short interaction without important info")
-            return {"results": [], "message": "Skipped: short and unimportant"}
+        skipped = check_storage_skip(interaction)
+        if skipped:
+            return skipped
 
-        # Proceed with memory storage
-        memory_result = memory.add(interaction, user_id=user_id)
-        memories_added = len(memory_result.get('results', []))
-        logger.info(f"Successfully stored {memories_added} memories")
+        # Write-behind mode: the turn only pays for the enqueue
+        if memory_queue_config["write_mode"] == "queue":
+            job_id = get_memory_queue().enqueue(user_id, interaction)
+            invalidate_user_searches(user_id)
+            logger.info(f"Queued interaction for user {user_id} as job {job_id}")
+            return {"results": [], "queued": True, "job_id": job_id}
 
-        return memory_result
+        # Proceed with memory storage
+        return persist_interaction(interaction, user_id)
 
     except Exception as e:
         logger.error(f"Error in memory storage: {e}")
         # Return empty result instead of crashing
         return {"results": [], "error": str(e)}
 
+def build_system_message(memory_list: List[Dict[str, Any]]) -> SystemMessage:
+    """
+    Build the system prompt with the retrieved memories as context.
+
+    Args:
+        memory_list: Memory search results for the current turn
+
+    Returns:
+        System message for the LLM
+    """
+    memory_context = ""
+    if memory_list:
+        memory_context = "Relevant information from previous conversations:\n"
+        for i, mem in enumerate(memory_list, 1):
+            memory_context += f"{i}. {mem.get('memory', '')}\n"
+
+    system_content = """你是忆语 (YiYu)，一个具有记忆功能的智能对话伙伴。请根据提供的上下文信息，为用户提供个性化的回应。
+
+    指导原则：
+    1. 利用记忆中的信息提供连贯的对话体验
+    2. 记住用户的偏好和过去的交互
+    3. 保持友好和专业的语调
+    4. 如果没有相关记忆，就基于当前问题进行回答
+    5. 用中文回答
+
+    """ + memory_context
+
+    return SystemMessage(content=system_content)
+
 @conditional_traceable(name="chatbot_response")
+@stage_latency.time(errors=stage_errors, stage="chatbot")
 def chatbot(state: State) -> Dict[str, Any]:
     """
     Main chatbot function that processes user input with memory context.
@@ -200,7 +701,7 @@ def chatbot(state: State) -> Dict[str, Any]:
         state: Current conversation state with messages and user_id
 
     Returns:
-        Dictionary with AI response message
+        Dictionary with AI response message, the memories used and the storage result
     """
     messages = state["messages"]
     user_id = state["mem0_user_id"]
@@ -212,36 +713,17 @@ def chatbot(state: State) -> Dict[str, Any]:
 
     # Search for relevant memories with tracing
     memories = search_memories(latest_message.content, user_id, limit=5)
-
-    # Extract memory context
-    memory_context = ""
-    if memories and 'results' in memories:
-        memory_list = memories['results']
-        if memory_list:
-            memory_context = "Relevant information from previous conversations:\n"
-            for i, mem in enumerate(memory_list, 1):
-                memory_context += f"{i}. {mem.get('memory', '')}\n"
-            logger.info(f"Found {len(memory_list)} relevant memories")
-
-    # Create system message with memory context
-    system_content = """你是忆语 (YiYu)，一个具有记忆功能的智能对话伙伴。请根据提供的上下文信息，为用户提供个性化的回应。
-
-    指导原则：
-    1. 利用记忆中的信息提供连贯的对话体验
-    2. 记住用户的偏好和过去的交互
-    3. 保持友好和专业的语调
-    4. 如果没有相关记忆，就基于当前问题进行回答
-    5. 用中文回答
-
-    """ + memory_context
-
-    system_message = SystemMessage(content=system_content)
+    memory_list = memories.get('results', []) if memories else []
+    if memory_list:
+        logger.info(f"Found {len(memory_list)} relevant memories")
 
     # Prepare full message sequence
-    full_messages = [system_message] + messages
+    full_messages = [build_system_message(memory_list)] + messages
 
     logger.info("Generating AI response")
-    response = llm.invoke(full_messages)
+    # Under graph.stream(stream_mode="messages") this call streams tokens to the caller
+    with stage_latency.time(errors=stage_errors, stage="llm"):
+        response = get_llm().invoke(full_messages)
 
     # Store the interaction in memory with tracing
     interaction = [
@@ -257,23 +739,147 @@ def chatbot(state: State) -> Dict[str, Any]:
 
     memory_result = store_interaction(interaction, user_id)
 
-    return {"messages": [response]}
+    return {
+        "messages": [response],
+        "memories": memory_list,
+        "memory_result": memory_result
+    }
 
-# Build the conversation graph
-graph = StateGraph(State)
-graph.add_node("chatbot", chatbot)
-graph.add_edge(START, "chatbot")
-# Removed self-loop to prevent infinite requests
-# The graph should end after chatbot response and wait for next user input
+def get_conversation_graph():
+    """Return the compiled conversation graph, building it on first use."""
+    global _conversation_graph
+    if _conversation_graph is None:
+        with _init_lock:
+            if _conversation_graph is None:
+                # Build the conversation graph
+                graph = StateGraph(State)
+                graph.add_node("chatbot", chatbot)
+                graph.add_edge(START, "chatbot")
+                # Removed self-loop to prevent infinite requests
+                # The graph should end after chatbot response and wait for next user input
+
+                # Compile the graph
+                _conversation_graph = graph.compile()
+                logger.info("Conversation graph compiled successfully")
+    return _conversation_graph
+
+def _start_turn(user_input: str, user_id: str) -> Dict[str, Any]:
+    """Build the initial graph state of a turn."""
+    logger.info(f"Starting conversation for user {user_id}")
+    return {
+        "messages": [HumanMessage(content=user_input)],
+        "mem0_user_id": user_id
+    }
 
-# Compile the graph
-conversation_graph = graph.compile()
-logger.info("Conversation graph compiled successfully")
+def _finish_turn(user_id: str, final_state: Dict[str, Any], turn_counts: Counter,
+                 time_to_first_token: Optional[float]) -> Dict[str, Any]:
+    """Build the final "done" event of a turn from the graph's final state."""
+    operations = {key: turn_counts[key] for key in ("embed", "search", "add")}
+    logger.info(
+        f"Turn operations for user {user_id}: "
+        f"embed={operations['embed']} search={operations['search']} add={operations['add']}"
+    )
+    if time_to_first_token is not None:
+        logger.info(f"Time to first token for user {user_id}: {time_to_first_token:.3f}s")
+        time_to_first_token_seconds.observe(time_to_first_token)
+
+    memory_result = final_state.get("memory_result", {})
+    if memory_result.get("error"):
+        outcome = "error"
+    elif memory_result.get("queued"):
+        outcome = "queued"
+    elif memory_result.get("duplicate_of"):
+        outcome = "duplicate"
+    elif "message" in memory_result:
+        outcome = "skipped"
+    else:
+        outcome = "stored"
+    memory_write_outcomes.inc(outcome=outcome)
+    turns_served.inc()
+
+    return {
+        "type": "done",
+        "response": final_state["messages"][-1].content,
+        "memories": final_state.get("memories", []),
+        "memory_result": memory_result,
+        "operations": operations,
+        "time_to_first_token": time_to_first_token
+    }
+
+def stream_turn(user_input: str, user_id: str = "default_user") -> Iterator[Dict[str, Any]]:
+    """
+    Run one conversation turn through the graph, streaming the reply.
+
+    The chatbot node performs the only memory search and the only memory
+    write of the turn; callers should consume its results instead of
+    repeating either step. LLM tokens are forwarded from the chatbot node
+    via LangGraph's "messages" stream mode as they are generated.
+
+    Args:
+        user_input: User's message
+        user_id: Unique identifier for the user
+
+    Yields:
+        {"type": "token", "content": ...} for every generated token, then
+        one {"type": "done", ...} event with the response text, the memories
+        used, the storage result, the embed/search/add operation counts and
+        the time to first token in seconds
+    """
+    config = {"configurable": {"thread_id": user_id}}
+    state = _start_turn(user_input, user_id)
+
+    turn_counts = Counter()
+    context_token = _turn_operation_counts.set(turn_counts)
+    start_time = time.perf_counter()
+    time_to_first_token = None
+    final_state = {}
+
+    try:
+        for mode, chunk in get_conversation_graph().stream(state, config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+
+            message_chunk, metadata = chunk
+            if metadata.get("langgraph_node") != "chatbot" or not message_chunk.content:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start_time
+            yield {"type": "token", "content": message_chunk.content}
+    finally:
+        try:
+            _turn_operation_counts.reset(context_token)
+        except ValueError:
+            # Generator was closed from a different context
+            pass
+
+    yield _finish_turn(user_id, final_state, turn_counts, time_to_first_token)
+
+def run_turn(user_input: str, user_id: str = "default_user",
+             on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Run one conversation turn and return its outcome.
+
+    Args:
+        user_input: User's message
+        user_id: Unique identifier for the user
+        on_token: Optional callback receiving each generated token
+
+    Returns:
+        The final event of stream_turn (response, memories, memory_result,
+        operations, time_to_first_token)
+    """
+    for event in stream_turn(user_input, user_id):
+        if event["type"] == "token":
+            if on_token:
+                on_token(event["content"])
+        else:
+            return event
 
 @conditional_traceable(name="conversation_turn")
 def run_conversation(user_input: str, user_id: str = "default_user") -> str:
     """
-    Run a conversation turn with the memory agent.
+    Run a conversation turn with the memory agent, printing tokens as they arrive.
 
     Args:
         user_input: User's message
@@ -282,21 +888,278 @@ def run_conversation(user_input: str, user_id: str = "default_user") -> str:
     Returns:
         AI response string
     """
-    config = {"configurable": {"thread_id": user_id}}
-    state = {
-        "messages": [HumanMessage(content=user_input)],
-        "mem0_user_id": user_id
+    print("AI助手: ", end="", flush=True)
+    turn = run_turn(user_input, user_id, on_token=lambda token: print(token, end="", flush=True))
+    print()
+    return turn["response"]
+
+# ---------------------------------------------------------------------------
+# Async variants: one event loop can serve many concurrent turns without a
+# thread per user. They mirror the synchronous functions above.
+# ---------------------------------------------------------------------------
+
+async_memory = None
+_async_memory_lock = asyncio.Lock()
+
+@contextmanager
+def _shared_embedder(embedding_model):
+    """Make Mem0's EmbedderFactory hand out an existing embedder instead of loading a model."""
+    from mem0.utils.factory import EmbedderFactory
+
+    original = EmbedderFactory.__dict__["create"]
+    EmbedderFactory.create = classmethod(lambda cls, provider_name, config, vector_config: embedding_model)
+    try:
+        yield
+    finally:
+        EmbedderFactory.create = original
+
+async def get_async_memory():
+    """Return Mem0's async memory client, created on first use."""
+    global async_memory
+    if async_memory is None:
+        async with _async_memory_lock:
+            if async_memory is None:
+                from mem0 import AsyncMemory
+
+                # Load the sync client (and the embedding model) off the event loop
+                sync_memory = await asyncio.to_thread(get_memory)
+                async_config = Config.get_mem0_config()
+                async_config["vector_store"]["config"]["client"] = get_qdrant_client()
+                # Share the (cached, batched) embedder with the sync client; letting
+                # AsyncMemory build its own would load a second copy of the model
+                with _shared_embedder(sync_memory.embedding_model):
+                    created = AsyncMemory.from_config(async_config)
+                    if inspect.isawaitable(created):
+                        created = await created
+                apply_search_params(created.vector_store)
+                instrument_vector_store(created.vector_store)
+                async_memory = created
+                logger.info("Async memory system initialized with Qdrant")
+    return async_memory
+
+@conditional_traceable(name="memory_search")
+@stage_latency.time(errors=stage_errors, stage="search")
+async def asearch_memories(query: str, user_id: str, limit: int = 5) -> Dict[str, Any]:
+    """
+    Async version of search_memories.
+
+    Args:
+        query: Search query
+        user_id: User identifier
+        limit: Maximum number of memories to return
+
+    Returns:
+        Dictionary containing search results
+    """
+    logger.info(f"Searching memories for user {user_id} with query: {query[:50]}...")
+
+    if search_cache:
+        cached = search_cache.get(user_id, query, limit)
+        if cached is not None:
+            logger.info(f"Serving {len(cached.get('results', []))} memories from the search cache")
+            return cached
+        generation = search_cache.generation(user_id)
+
+    count_operation("embed")
+    amemory = await get_async_memory()
+    if semantic_cache:
+        semantic_generation = semantic_cache.generation(user_id)
+        query_vector = await asyncio.to_thread(amemory.embedding_model.embed, query, "search")
+        memories = semantic_cache.get(user_id, query_vector, limit)
+        if memories is not None:
+            logger.info(f"Serving {len(memories.get('results', []))} memories from a similar recent query")
+            if search_cache:
+                search_cache.put(user_id, query, limit, memories, generation)
+            return memories
+
+    count_operation("search")
+    memories = await amemory.search(query, user_id=user_id, limit=limit)
+
+    if search_cache:
+        search_cache.put(user_id, query, limit, memories, generation)
+    if semantic_cache:
+        semantic_cache.put(user_id, query_vector, limit, memories, semantic_generation)
+
+    memory_count = len(memories.get('results', [])) if memories and 'results' in memories else 0
+    logger.info(f"Found {memory_count} relevant memories")
+
+    return memories
+
+@stage_latency.time(errors=stage_errors, stage="mem0_add")
+async def apersist_interaction(interaction: List[Dict[str, str]], user_id: str) -> Dict[str, Any]:
+    """Async version of persist_interaction. Errors are raised to the caller."""
+    duplicate = await asyncio.to_thread(suppress_duplicate_interaction, interaction, user_id)
+    if duplicate:
+        return duplicate
+
+    count_operation("add")
+    amemory = await get_async_memory()
+    try:
+        memory_result = await amemory.add(interaction, user_id=user_id)
+    finally:
+        invalidate_user_searches(user_id)
+    memories_added = len(memory_result.get('results', []))
+    logger.info(f"Successfully stored {memories_added} memories")
+
+    try:
+        await asyncio.to_thread(get_user_registry().record_write, user_id, count_memory_delta(memory_result))
+    except Exception as e:
+        logger.warning(f"Failed to update user registry for {user_id}: {e}")
+
+    return memory_result
+
+@conditional_traceable(name="memory_storage")
+@stage_latency.time(errors=stage_errors, stage="store")
+async def astore_interaction(interaction: List[Dict[str, str]], user_id: str) -> Dict[str, Any]:
+    """
+    Async version of store_interaction.
+
+    Args:
+        interaction: List of message dictionaries
+        user_id: User identifier
+
+    Returns:
+        Dictionary containing storage results
+    """
+    logger.info(f"Storing interaction for user {user_id}")
+
+    try:
+        if get_storage_gate().uses_embedder:
+            skipped = await asyncio.to_thread(check_storage_skip, interaction)
+        else:
+            skipped = check_storage_skip(interaction)
+        if skipped:
+            return skipped
+
+        if memory_queue_config["write_mode"] == "queue":
+            job_id = await asyncio.to_thread(get_memory_queue().enqueue, user_id, interaction)
+            invalidate_user_searches(user_id)
+            logger.info(f"Queued interaction for user {user_id} as job {job_id}")
+            return {"results": [], "queued": True, "job_id": job_id}
+
+        return await apersist_interaction(interaction, user_id)
+
+    except Exception as e:
+        logger.error(f"Error in memory storage: {e}")
+        return {"results": [], "error": str(e)}
+
+@conditional_traceable(name="chatbot_response")
+@stage_latency.time(errors=stage_errors, stage="chatbot")
+async def achatbot(state: State) -> Dict[str, Any]:
+    """
+    Async version of the chatbot node.
+
+    Args:
+        state: Current conversation state with messages and user_id
+
+    Returns:
+        Dictionary with AI response message, the memories used and the storage result
+    """
+    messages = state["messages"]
+    user_id = state["mem0_user_id"]
+
+    logger.info(f"Processing message for user: {user_id}")
+
+    latest_message = messages[-1]
+
+    memories = await asearch_memories(latest_message.content, user_id, limit=5)
+    memory_list = memories.get('results', []) if memories else []
+    if memory_list:
+        logger.info(f"Found {len(memory_list)} relevant memories")
+
+    full_messages = [build_system_message(memory_list)] + messages
+
+    logger.info("Generating AI response")
+    with stage_latency.time(errors=stage_errors, stage="llm"):
+        response = await get_llm().ainvoke(full_messages)
+
+    interaction = [
+        {
+            "role": "user",
+            "content": latest_message.content
+        },
+        {
+            "role": "assistant",
+            "content": response.content
+        }
+    ]
+
+    memory_result = await astore_interaction(interaction, user_id)
+
+    return {
+        "messages": [response],
+        "memories": memory_list,
+        "memory_result": memory_result
     }
 
-    logger.info(f"Starting conversation for user {user_id}")
+def get_async_conversation_graph():
+    """Return the compiled async conversation graph, building it on first use."""
+    global _async_conversation_graph
+    if _async_conversation_graph is None:
+        with _init_lock:
+            if _async_conversation_graph is None:
+                async_graph = StateGraph(State)
+                async_graph.add_node("chatbot", achatbot)
+                async_graph.add_edge(START, "chatbot")
+                _async_conversation_graph = async_graph.compile()
+    return _async_conversation_graph
+
+async def astream_turn(user_input: str, user_id: str = "default_user") -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async version of stream_turn.
+
+    Yields:
+        Token events followed by one "done" event (see stream_turn)
+    """
+    config = {"configurable": {"thread_id": user_id}}
+    state = _start_turn(user_input, user_id)
+
+    turn_counts = Counter()
+    context_token = _turn_operation_counts.set(turn_counts)
+    start_time = time.perf_counter()
+    time_to_first_token = None
+    final_state = {}
+
+    try:
+        async for mode, chunk in get_async_conversation_graph().astream(state, config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+
+            message_chunk, metadata = chunk
+            if metadata.get("langgraph_node") != "chatbot" or not message_chunk.content:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start_time
+            yield {"type": "token", "content": message_chunk.content}
+    finally:
+        try:
+            _turn_operation_counts.reset(context_token)
+        except ValueError:
+            pass
+
+    yield _finish_turn(user_id, final_state, turn_counts, time_to_first_token)
 
-    # Stream the response
-    for event in conversation_graph.stream(state, config):
-        for value in event.values():
-            if value.get("messages"):
-                response = value["messages"][-1].content
-                print(f"AI助手: {response}")
-                return response
+async def arun_turn(user_input: str, user_id: str = "default_user") -> Dict[str, Any]:
+    """Async version of run_turn; returns the final event of astream_turn."""
+    async for event in astream_turn(user_input, user_id):
+        if event["type"] == "done":
+            return event
+
+@conditional_traceable(name="conversation_turn")
+async def arun_conversation(user_input: str, user_id: str = "default_user") -> str:
+    """
+    Run a conversation turn on the event loop.
+
+    Args:
+        user_input: User's message
+        user_id: Unique identifier for the user
+
+    Returns:
+        AI response string
+    """
+    turn = await arun_turn(user_input, user_id)
+    return turn["response"]
 
 def interactive_chat():
     """
@@ -305,6 +1168,10 @@ def interactive_chat():
     print("🧠💬 忆语 (YiYu) - 智能对话记忆系统已启动！(输入 'quit', 'exit' 或 'bye' 退出)")
     print("=" * 50)
 
+    # Load models while the user is typing
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+    start_metrics_exporters()
+
     # Get user ID (could be enhanced with actual user management)
     user_id = input("请输入您的用户ID (直接回车使用默认): ").strip()
     if not user_id:
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryQueue:
+    """
+    Durable write-behind queue for memory ingestion, stored in SQLite.
+
+    The chat path only appends interactions here; memory_worker.py drains
+    the queue. Jobs of the same user are delivered strictly in order: only
+    the oldest unfinished job of a user can be claimed, and a job waiting
+    for a retry keeps blocking the jobs queued after it.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the queue database.
+
+        Args:
+            path: SQLite file path, shared by the app and the worker processes
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "user_id TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "available_at REAL NOT NULL, "
+            "claimed_at REAL, "
+            "created_at REAL NOT NULL, "
+            "last_error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user_status ON jobs (user_id, status, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, available_at)")
+
+    def enqueue(self, user_id: str, interaction: List[Dict[str, str]]) -> int:
+        """
+        Append an interaction for later storage.
+
+        Args:
+            user_id: User identifier
+            interaction: List of message dictionaries
+
+        Returns:
+            Job ID
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (user_id, payload, available_at, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, json.dumps(interaction, ensure_ascii=False), now, now)
+            )
+        return cursor.lastrowid
+
+    def claim(self, limit: int, exclude_users: Optional[set] = None) -> List[Dict[str, Any]]:
+        """
+        Claim up to `limit` jobs that are ready to run, at most one per user.
+
+        Args:
+            limit: Maximum number of jobs to claim
+            exclude_users: Users this worker already has jobs in flight for
+
+        Returns:
+            List of claimed jobs with id, user_id, interaction and attempts
+        """
+        if limit <= 0:
+            return []
+
+        exclude_users = exclude_users or set()
+        now = time.time()
+        claimed = []
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Only the head (oldest unfinished job) of each user is eligible
+                rows = self._db.execute(
+                    "SELECT j.id, j.user_id, j.payload, j.attempts FROM jobs j "
+                    "WHERE j.status = 'pending' AND j.available_at <= ? "
+                    "AND j.id = (SELECT MIN(k.id) FROM jobs k "
+                    "            WHERE k.user_id = j.user_id AND k.status IN ('pending', 'processing')) "
+                    "ORDER BY j.id LIMIT ?",
+                    (now, limit + len(exclude_users))
+                ).fetchall()
+
+                for row in rows:
+                    if row["user_id"] in exclude_users:
+                        continue
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'processing', claimed_at = ? WHERE id = ?",
+                        (now, row["id"])
+                    )
+                    claimed.append({
+                        "id": row["id"],
+                        "user_id": row["user_id"],
+                        "interaction": json.loads(row["payload"]),
+                        "attempts": row["attempts"]
+                    })
+                    if len(claimed) >= limit:
+                        break
+
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return claimed
+
+    def complete(self, job_id: int) -> None:
+        """Remove a successfully processed job."""
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job_id: int, error: str, retry_delay: float, max_attempts: int) -> bool:
+        """
+        Record a failed attempt and schedule a retry with exponential backoff.
+
+        Args:
+            job_id: Job ID
+            error: Error message of the failed attempt
+            retry_delay: Base delay in seconds before the first retry
+            max_attempts: Attempts after which the job is parked as failed
+
+        Returns:
+            True if the job will be retried, False if it was given up on
+        """
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+
+            attempts = row["attempts"] + 1
+            if attempts >= max_attempts:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, job_id)
+                )
+                return False
+
+            self._db.execute(
+                "UPDATE jobs SET status = 'pending', attempts = ?, last_error = ?, available_at = ? WHERE id = ?",
+                (attempts, error, time.time() + retry_delay * (2 ** (attempts - 1)), job_id)
+            )
+            return True
+
+    def requeue_stale(self, visibility_timeout: float) -> int:
+        """Return jobs claimed by a crashed worker to the pending state."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'pending' WHERE status = 'processing' AND claimed_at < ?",
+                (time.time() - visibility_timeout,)
+            )
+        return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return the number of jobs per status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        stats = {"pending": 0, "processing": 0, "failed": 0}
+        stats.update({row["status"]: row["n"] for row in rows})
+        return stats
+
+
+_queue: Optional[MemoryQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_memory_queue() -> MemoryQueue:
+    """Return the process-wide memory queue."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = MemoryQueue(Config.get_memory_queue_config()["path"])
+    return _queue
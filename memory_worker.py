@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Memory ingestion worker.
+
+Drains the write-behind queue filled by store_interaction when
+MEMORY_WRITE_MODE=queue and performs the Mem0 add (LLM fact extraction,
+embedding, Qdrant upserts) outside the chat path.
+
+Usage:
+    python memory_worker.py                    # run until interrupted
+    python memory_worker.py --concurrency 8
+    python memory_worker.py --once             # drain what is queued and exit
+    python memory_worker.py --stats
+"""
+
+import time
+import signal
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Tuple
+
+from config import Config
+from memory_queue import get_memory_queue
+from metrics import start_metrics_exporters
+
+logger = logging.getLogger("memory_worker")
+
+
+class MemoryWorker:
+    """Claims queued interactions and stores them with bounded concurrency."""
+
+    def __init__(self, concurrency: int, max_attempts: int, retry_delay: float,
+                 poll_interval: float, visibility_timeout: float):
+        self.queue = get_memory_queue()
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._running = True
+        self._in_flight: Dict[Future, Tuple[int, str]] = {}
+
+    def stop(self, *_):
+        """Stop claiming new jobs; in-flight jobs are allowed to finish."""
+        logger.info("Stopping memory worker after in-flight jobs finish")
+        self._running = False
+
+    def _process(self, job: Dict) -> None:
+        self._persist(job["interaction"], job["user_id"])
+
+    def _reap(self) -> None:
+        for future in [f for f in self._in_flight if f.done()]:
+            job_id, user_id = self._in_flight.pop(future)
+            error = future.exception()
+            if error is None:
+                self.queue.complete(job_id)
+                logger.info(f"Stored job {job_id} for user {user_id}")
+            elif self.queue.fail(job_id, str(error), self.retry_delay, self.max_attempts):
+                logger.warning(f"Job {job_id} for user {user_id} failed, will retry: {error}")
+            else:
+                logger.error(f"Job {job_id} for user {user_id} failed permanently: {error}")
+
+    def run(self, once: bool = False) -> None:
+        """
+        Process jobs until stopped.
+
+        Args:
+            once: Exit as soon as the queue has no claimable jobs left
+        """
+        # Imported here so `--stats` doesn't load the models
+        from memory_agent import persist_interaction
+        self._persist = persist_interaction
+
+        requeued = self.queue.requeue_stale(self.visibility_timeout)
+        if requeued:
+            logger.info(f"Requeued {requeued} stale jobs")
+
+        logger.info(f"Memory worker started with concurrency {self.concurrency}")
+        last_requeue = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while self._running or self._in_flight:
+                self._reap()
+
+                claimed = []
+                if self._running:
+                    busy_users = {user_id for _, user_id in self._in_flight.values()}
+                    claimed = self.queue.claim(self.concurrency - len(self._in_flight), busy_users)
+                    for job in claimed:
+                        future = executor.submit(self._process, job)
+                        self._in_flight[future] = (job["id"], job["user_id"])
+
+                if once and not claimed and not self._in_flight:
+                    break
+
+                if time.time() - last_requeue > self.visibility_timeout:
+                    self.queue.requeue_stale(self.visibility_timeout)
+                    last_requeue = time.time()
+
+                if not claimed:
+                    time.sleep(self.poll_interval)
+
+
+def main():
+    """Command line entry point."""
+    queue_config = Config.get_memory_queue_config()
+
+    parser = argparse.ArgumentParser(description="忆语记忆写入 Worker")
+    parser.add_argument("--concurrency", type=int, default=queue_config["concurrency"], help="并发写入数")
+    parser.add_argument("--max-attempts", type=int, default=queue_config["max_attempts"], help="最大重试次数")
+    parser.add_argument("--once", action="store_true", help="处理完当前队列后退出")
+    parser.add_argument("--stats", action="store_true", help="显示队列状态后退出")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    if args.stats:
+        stats = get_memory_queue().get_stats()
+        print(f"📥 待处理: {stats['pending']}  ⚙️ 处理中: {stats['processing']}  ❌ 失败: {stats['failed']}")
+        return
+
+    start_metrics_exporters()
+    worker = MemoryWorker(
+        concurrency=args.concurrency,
+        max_attempts=args.max_attempts,
+        retry_delay=queue_config["retry_delay"],
+        poll_interval=queue_config["poll_interval"],
+        visibility_timeout=queue_config["visibility_timeout"]
+    )
+    signal.signal(signal.SIGINT, worker.stop)
+    signal.signal(signal.SIGTERM, worker.stop)
+    worker.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
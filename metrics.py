@@ -0,0 +1,361 @@
+"""
+In-process metrics for the conversation hot path.
+
+Counters, gauges and fixed-bucket histograms kept in a process-wide
+registry, independent of LangSmith. The registry renders the OpenMetrics
+text format, served on a local HTTP port (METRICS_PORT), written to a file
+(METRICS_FILE) or exposed by server.py at GET /metrics.
+"""
+
+import os
+import time
+import inspect
+import logging
+import threading
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds; covers cache hits (sub-millisecond) up to slow LLM replies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(text: Any) -> str:
+    """Escape backslashes, double quotes and newlines in label values and HELP text (OpenMetrics)."""
+    return str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.name} {self.type_name}", f"# HELP {self.name} {_escape(self.documentation)}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}_total{_format_labels(self.label_names, key)} {value}"
+                for key, value in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; may be computed at collection time."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 function: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            function: Optional callable evaluated on every render. It returns
+                a number, or a dict of label tuple -> number for labelled gauges.
+        """
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            try:
+                computed = self._function()
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+                computed = {}
+            if isinstance(computed, dict):
+                values.update({tuple(key) if isinstance(key, tuple) else (key,): value
+                               for key, value in computed.items()})
+            elif computed is not None:
+                values[()] = computed
+        return [f"{self.name}{_format_labels(self.label_names, key)} {float(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram of observed values (seconds for latencies)."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def time(self, errors: Optional[Counter] = None, **labels) -> "_Timer":
+        """
+        Time a block (`with`) or a sync/async function (decorator).
+
+        Args:
+            errors: Counter incremented with the same labels when the block raises
+        """
+        return _Timer(self, labels, errors)
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """Count, mean and bucket-interpolated p50/p95 for one label set."""
+        key = self._key(labels)
+        with self._lock:
+            counts = list(self._counts.get(key, []))
+            total_sum = self._sums.get(key, 0.0)
+        total = sum(counts)
+        if not total:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0}
+        return {
+            "count": total,
+            "mean": total_sum / total,
+            "p50": self._quantile(counts, total, 0.5),
+            "p95": self._quantile(counts, total, 0.95),
+        }
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> float:
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def label_sets(self) -> List[Dict[str, str]]:
+        with self._lock:
+            keys = list(self._counts)
+        return [dict(zip(self.label_names, key)) for key in keys]
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            counts = {key: list(value) for key, value in self._counts.items()}
+            sums = dict(self._sums)
+        lines = []
+        for key in sorted(counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[key]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = 'le="' + le + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {sums.get(key, 0.0)}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any], errors: Optional[Counter] = None):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(**self.labels)
+        return False
+
+    def __call__(self, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(self.histogram, self.labels, self.errors):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels, self.errors):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class MetricsRegistry:
+    """Named metrics of this process; creating an existing name returns it."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (),
+              function: Optional[Callable[[], Any]] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labels, function=function)
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render every metric in the OpenMetrics text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+def write_metrics_file(path: str) -> None:
+    """Write the current metrics to a file atomically (for node_exporter's textfile collector etc.)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(_registry.render())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = _registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics served at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_metrics_exporters() -> None:
+    """Start the configured exporters (METRICS_PORT, METRICS_FILE) once per process."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    metrics_config = Config.get_metrics_config()
+
+    if metrics_config["port"]:
+        try:
+            start_metrics_server(metrics_config["host"], metrics_config["port"])
+        except OSError as e:
+            # Another process (e.g. a second Streamlit session server) already serves the port
+            logger.warning(f"Could not start metrics server on port {metrics_config['port']}: {e}")
+
+    if metrics_config["file"]:
+        def write_periodically():
+            while True:
+                try:
+                    write_metrics_file(metrics_config["file"])
+                except Exception as e:
+                    logger.warning(f"Failed to write metrics file: {e}")
+                time.sleep(metrics_config["file_interval"])
+
+        threading.Thread(target=write_periodically, name="metrics-file", daemon=True).start()
+        logger.info(f"Metrics written to {metrics_config['file']} every {metrics_config['file_interval']}s")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime backend for the m3e-base embedder.
+
+Runs an exported (optionally int8-quantized) ONNX graph of the embedding
+model on CPU instead of PyTorch. Selected with EMBEDDING_BACKEND=onnx; the
+pooling matches sentence-transformers (mean over non-padding tokens, no
+normalization), so vectors stay compatible with memories already stored
+by the torch model.
+
+Usage:
+    python onnx_embedder.py export                 # fp32 + int8 graphs
+    python onnx_embedder.py export --no-quantize
+"""
+
+import os
+import logging
+import argparse
+from typing import List, Literal, Optional
+
+import numpy as np
+from mem0.embeddings.base import EmbeddingBase
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FP32_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+
+
+class OnnxEmbedding(EmbeddingBase):
+    """Mem0 embedder running the exported model with ONNX Runtime."""
+
+    def __init__(self, config=None, model_dir: Optional[str] = None,
+                 quantized: Optional[bool] = None, num_threads: Optional[int] = None):
+        """
+        Load the ONNX graph and tokenizer.
+
+        Args:
+            config: Mem0 BaseEmbedderConfig (model name, embedding_dims)
+            model_dir: Directory produced by `python onnx_embedder.py export`
+            quantized: Use the int8 graph instead of fp32
+            num_threads: Intra-op threads, 0 lets ONNX Runtime decide
+        """
+        super().__init__(config)
+
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        onnx_config = Config.get_onnx_embedding_config()
+        model_dir = model_dir or onnx_config["model_dir"]
+        quantized = onnx_config["quantized"] if quantized is None else quantized
+        num_threads = onnx_config["num_threads"] if num_threads is None else num_threads
+
+        model_path = os.path.join(model_dir, INT8_FILENAME if quantized else FP32_FILENAME)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}; run `python onnx_embedder.py export` first"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=onnx_config["max_length"])
+        self.tokenizer.enable_padding()
+
+        self.dims = self.session.get_outputs()[0].shape[-1]
+        if getattr(self.config, "embedding_dims", None) is None:
+            self.config.embedding_dims = self.dims
+
+        logger.info(f"ONNX embedder loaded from {model_path} (threads={num_threads or 'auto'})")
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dims)
+        """
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, as sentence-transformers does for m3e
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).astype(np.float32)
+
+    def embed(self, text, memory_action: Optional[Literal["add", "search", "update"]] = None):
+        """
+        Get the embedding for the given text.
+
+        Args:
+            text (str): The text to embed.
+            memory_action (optional): Unused, the model has no task-specific modes.
+
+        Returns:
+            list: The embedding vector.
+        """
+        return self.embed_batch([text])[0].tolist()
+
+
+def register_onnx_embedder() -> None:
+    """
+    Route Mem0's "huggingface" embedder provider to OnnxEmbedding.
+
+    Mem0 validates provider names against a fixed list, so the ONNX backend
+    is plugged in behind the existing provider instead of a new one. Call
+    before Memory.from_config when EMBEDDING_BACKEND=onnx.
+    """
+    from mem0.utils.factory import EmbedderFactory
+
+    EmbedderFactory.provider_to_class["huggingface"] = "onnx_embedder.OnnxEmbedding"
+    logger.info("Mem0 huggingface embedder provider routed to ONNX Runtime")
+
+
+def export_model(model_name: str, output_dir: str, quantize: bool = True, opset: int = 14) -> None:
+    """
+    Export a HuggingFace encoder to ONNX and optionally quantize it to int8.
+
+    Args:
+        model_name: HuggingFace model ID, e.g. moka-ai/m3e-base
+        output_dir: Directory for model.onnx, model.int8.onnx and the tokenizer
+        quantize: Also write a dynamically int8-quantized graph
+        opset: ONNX opset version
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+
+    dummy = tokenizer(["导出示例文本"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, FP32_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    print(f"✅ 已导出 FP32 模型: {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(output_dir, INT8_FILENAME)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✅ 已导出 INT8 量化模型: {int8_path}")
+
+
+def main():
+    """Command line entry point."""
+    onnx_config = Config.get_onnx_embedding_config()
+
+    parser = argparse.ArgumentParser(description="M3E ONNX 嵌入模型工具")
+    parser.add_argument("command", choices=["export"], help="要执行的命令")
+    parser.add_argument("--model", default=Config.get_embedding_config()["config"]["model"], help="HuggingFace 模型")
+    parser.add_argument("--output", default=onnx_config["model_dir"], help="输出目录")
+    parser.add_argument("--no-quantize", action="store_true", help="不生成 INT8 量化模型")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.model, args.output, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import atexit
+import logging
+import threading
+from typing import Any, Dict
+
+from config import Config
+from metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_client_kwargs() -> Dict[str, Any]:
+    """
+    Build QdrantClient keyword arguments from the application configuration.
+
+    REST connections are kept alive in a bounded httpx pool; with gRPC
+    enabled the channel sends keep-alive pings so idle sidebar/stats calls
+    don't pay for a new connection.
+    """
+    import httpx
+
+    qdrant_config = Config.get_qdrant_config()["config"]
+    connection = Config.get_qdrant_connection_config()
+
+    # Embedded mode: no server, no network hop
+    if connection["path"] == ":memory:":
+        return {"location": ":memory:"}
+    if connection["path"]:
+        return {"path": connection["path"]}
+
+    kwargs: Dict[str, Any] = {
+        "url": qdrant_config["url"],
+        "timeout": connection["timeout"],
+        "prefer_grpc": connection["prefer_grpc"],
+        "grpc_port": connection["grpc_port"],
+        "limits": httpx.Limits(
+            max_connections=connection["max_connections"],
+            max_keepalive_connections=connection["max_connections"],
+            keepalive_expiry=connection["keepalive_seconds"]
+        )
+    }
+    if qdrant_config["api_key"]:
+        kwargs["api_key"] = qdrant_config["api_key"]
+
+    if connection["prefer_grpc"]:
+        keepalive_ms = int(connection["keepalive_seconds"] * 1000)
+        kwargs["grpc_options"] = {
+            "grpc.keepalive_time_ms": keepalive_ms,
+            "grpc.keepalive_timeout_ms": 10000,
+            "grpc.keepalive_permit_without_calls": 1
+        }
+
+    return kwargs
+
+
+def build_search_params():
+    """
+    Return the SearchParams matching the collection's quantization mode.
+
+    Returns:
+        SearchParams with oversampling/rescoring, or None without quantization
+    """
+    collection_config = Config.get_qdrant_collection_config()
+    if collection_config["quantization"] == "none":
+        return None
+
+    from qdrant_client.http.models import SearchParams, QuantizationSearchParams
+
+    return SearchParams(
+        quantization=QuantizationSearchParams(
+            ignore=False,
+            rescore=collection_config["rescore"],
+            oversampling=collection_config["oversampling"]
+        )
+    )
+
+
+class SearchParamsClient:
+    """
+    Client wrapper that adds default SearchParams to vector searches.
+
+    Mem0's Qdrant store calls query_points/search without search params;
+    wrapping its client applies quantization oversampling and rescoring
+    without changing Mem0. Everything else is delegated unchanged.
+    """
+
+    def __init__(self, client: Any, search_params: Any):
+        self.client = client
+        self.search_params = search_params
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def query_points(self, *args, **kwargs):
+        kwargs.setdefault("search_params", self.search_params)
+        return self.client.query_points(*args, **kwargs)
+
+    def search(self, *args, **kwargs):
+        kwargs.setdefault("search_params", self.search_params)
+        return self.client.search(*args, **kwargs)
+
+
+def apply_search_params(vector_store: Any) -> None:
+    """Make a Mem0 Qdrant vector store search with build_search_params()."""
+    search_params = build_search_params()
+    if search_params is not None and not isinstance(vector_store.client, SearchParamsClient):
+        vector_store.client = SearchParamsClient(vector_store.client, search_params)
+        logger.info("Quantized search enabled with oversampling and rescoring")
+
+
+def is_embedded() -> bool:
+    """Whether Qdrant runs in-process (QDRANT_PATH) rather than as a server."""
+    return Config.get_qdrant_connection_config()["path"] is not None
+
+
+qdrant_request_latency = get_metrics_registry().histogram(
+    "yiyu_qdrant_request_duration_seconds", "Latency of Qdrant client calls made by Mem0", ("operation",)
+)
+qdrant_request_errors = get_metrics_registry().counter(
+    "yiyu_qdrant_request_errors", "Failed Qdrant client calls made by Mem0", ("operation",)
+)
+
+
+class InstrumentedClient:
+    """Client wrapper that records the latency of every method call per operation."""
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.client, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+        return qdrant_request_latency.time(errors=qdrant_request_errors, operation=name)(attribute)
+
+
+def instrument_vector_store(vector_store: Any) -> None:
+    """Record latency metrics for the Qdrant calls of a Mem0 vector store."""
+    if not isinstance(vector_store.client, InstrumentedClient):
+        vector_store.client = InstrumentedClient(vector_store.client)
+
+
+def get_qdrant_client():
+    """
+    Return the process-wide QdrantClient.
+
+    Mem0's vector store, the Streamlit user/statistics helpers and the setup
+    scripts all share this client, so its connection pool is reused across
+    calls instead of opening a new TCP connection per call. In embedded mode
+    this matters even more: a local storage path can only be opened once.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from qdrant_client import QdrantClient
+
+                kwargs = build_client_kwargs()
+                _client = QdrantClient(**kwargs)
+                # Close pooled connections (and flush an embedded store) on exit
+                atexit.register(close_qdrant_client)
+                if is_embedded():
+                    logger.info(f"Shared Qdrant client created (embedded, {Config.get_qdrant_connection_config()['path']})")
+                else:
+                    transport = "gRPC" if kwargs["prefer_grpc"] else "HTTP"
+                    logger.info(f"Shared Qdrant client created ({transport}, {kwargs['url']})")
+    return _client
+
+
+def close_qdrant_client() -> None:
+    """Close the shared client, e.g. at process shutdown."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            try:
+                _client.close()
+            except Exception as e:
+                logger.debug(f"Error closing Qdrant client: {e}")
+            _client = None
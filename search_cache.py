@@ -0,0 +1,184 @@
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class UserVersions:
+    """
+    Write versions of a bounded number of users.
+
+    Versions come from one increasing counter. Users that are not tracked
+    share a floor version, which is raised whenever tracked users are
+    forgotten, so a search that started before a forgotten user's write
+    still sees a changed version when it finishes. Raising the floor also
+    retires results cached for other untracked users; that happens once per
+    max_users / 2 forgotten users. Not thread-safe: callers hold their lock.
+    """
+
+    def __init__(self, max_users: int):
+        """
+        Args:
+            max_users: Users tracked before those without cached results are forgotten
+        """
+        self.max_users = max(max_users, 2)
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def get(self, user_id: str) -> int:
+        return self._versions.get(user_id, self._floor)
+
+    def bump(self, user_id: str, cached_users: Callable[[], Set[str]]) -> None:
+        """
+        Give a user a new version after a write.
+
+        Args:
+            user_id: User that wrote
+            cached_users: Users that still have cached results and must stay tracked
+        """
+        self._counter += 1
+        self._versions[user_id] = self._counter
+        self._versions.move_to_end(user_id)
+        if len(self._versions) <= self.max_users:
+            return
+
+        keep = cached_users()
+        forgotten = False
+        for tracked in list(self._versions):
+            if len(self._versions) <= self.max_users // 2:
+                break
+            if tracked not in keep and tracked != user_id:
+                del self._versions[tracked]
+                forgotten = True
+        if forgotten:
+            self._floor = self._counter
+
+
+class SearchResultCache:
+    """
+    Bounded TTL/LRU cache of memory search results.
+
+    Entries are keyed on (user_id, normalized query, limit). Every entry
+    remembers the user's generation when the search started; a write for
+    the user (invalidate_user) bumps the generation, so results computed
+    before the write are never served afterwards, including searches that
+    were still in flight when the write happened.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0,
+                 generation_fn: Optional[Callable[[str], Hashable]] = None):
+        """
+        Create the cache.
+
+        Args:
+            max_entries: Maximum cached results across all users
+            ttl: Seconds a result stays valid
+            generation_fn: Optional external write marker for a user, for
+                writes made by another process (e.g. memory_worker.py)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation_fn = generation_fn
+
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[float, Any, Dict[str, Any]]]" = OrderedDict()
+        # Users with cached entries are at most max_entries, so pruning frees half
+        self._versions = UserVersions(2 * max_entries)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize case and whitespace so trivially different queries share an entry."""
+        return " ".join(query.lower().split())
+
+    def generation(self, user_id: str) -> Tuple[int, Hashable]:
+        """
+        Return the user's current generation.
+
+        Take it before running a search and pass it to put(), so a write that
+        lands during the search keeps the stale result out of the cache.
+        """
+        external = None
+        if self.generation_fn is not None:
+            try:
+                external = self.generation_fn(user_id)
+            except Exception as e:
+                logger.debug(f"Search cache generation lookup failed for {user_id}: {e}")
+        with self._lock:
+            return self._versions.get(user_id), external
+
+    def get(self, user_id: str, query: str, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached search result.
+
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        key = (user_id, self.normalize_query(query), limit)
+        generation = self.generation(user_id)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            stored_at, entry_generation, result = entry
+            if entry_generation != generation or time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+
+        return copy.deepcopy(result)
+
+    def put(self, user_id: str, query: str, limit: int, result: Dict[str, Any],
+            generation: Tuple[int, Hashable]) -> None:
+        """
+        Cache a search result.
+
+        Args:
+            user_id: User identifier
+            query: Search query
+            limit: Maximum number of memories requested
+            result: Mem0 search result
+            generation: Value of generation() taken before the search ran
+        """
+        key = (user_id, self.normalize_query(query), limit)
+        with self._lock:
+            if generation[0] != self._versions.get(user_id):
+                # The user wrote while this search ran
+                return
+            self._entries[key] = (time.monotonic(), generation, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every cached result for a user after a memory write."""
+        with self._lock:
+            self._versions.bump(user_id, lambda: {key[0] for key in self._entries})
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["tracked_users"] = len(self._versions)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,172 @@
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from search_cache import UserVersions
+
+logger = logging.getLogger(__name__)
+
+
+class _UserEntries:
+    """Recent query embeddings of one user, stacked into a unit-norm matrix."""
+
+    def __init__(self, dims: int):
+        self.vectors = np.empty((0, dims), dtype=np.float32)
+        self.limits: List[int] = []
+        self.stored_at: List[float] = []
+        self.results: List[Dict[str, Any]] = []
+
+
+class SemanticQueryCache:
+    """
+    Per-user cache of query embeddings and their memory search results.
+
+    A new query whose embedding has cosine similarity >= threshold with a
+    recent query of the same user (and the same limit) reuses that query's
+    results, skipping the vector search. Matching is one matrix-vector
+    product over at most max_per_user rows. Writes invalidate a user's
+    entries the same way SearchResultCache does. At most max_users users
+    keep entries; the least recently used one is evicted beyond that.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_per_user: int = 32, ttl: float = 300.0,
+                 generation_fn: Optional[Callable[[str], Hashable]] = None, max_users: int = 1024):
+        """
+        Create the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a query to reuse results
+            max_per_user: Most recent queries kept per user
+            ttl: Seconds a result stays valid
+            generation_fn: Optional external write marker for a user, for
+                writes made by another process (e.g. memory_worker.py)
+            max_users: Users whose queries are kept
+        """
+        self.threshold = threshold
+        self.max_per_user = max_per_user
+        self.ttl = ttl
+        self.generation_fn = generation_fn
+        self.max_users = max_users
+
+        self._users: "OrderedDict[str, _UserEntries]" = OrderedDict()
+        self._generations: Dict[str, Tuple[int, Hashable]] = {}
+        self._versions = UserVersions(2 * max_users)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    def generation(self, user_id: str) -> Tuple[int, Hashable]:
+        """Return the user's current generation; take it before searching and pass it to put()."""
+        external = None
+        if self.generation_fn is not None:
+            try:
+                external = self.generation_fn(user_id)
+            except Exception as e:
+                logger.debug(f"Semantic cache generation lookup failed for {user_id}: {e}")
+        with self._lock:
+            return self._versions.get(user_id), external
+
+    def get(self, user_id: str, vector: List[float], limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Find results of a recent query close enough to this one.
+
+        Args:
+            user_id: User identifier
+            vector: Embedding of the new query
+            limit: Maximum number of memories requested
+
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        generation = self.generation(user_id)
+        query = self._normalize(vector)
+
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is not None and self._generations.get(user_id) != generation:
+                # Written to since these results were cached
+                del self._users[user_id]
+                del self._generations[user_id]
+                entries = None
+
+            if entries is None or not entries.results:
+                self._stats["misses"] += 1
+                return None
+
+            similarities = entries.vectors @ query
+            now = time.monotonic()
+            valid = (np.asarray(entries.limits) == limit) & (now - np.asarray(entries.stored_at) <= self.ttl)
+            similarities = np.where(valid, similarities, -1.0)
+
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["hits"] += 1
+            self._users.move_to_end(user_id)
+            result = entries.results[best]
+            logger.debug(f"Semantic cache hit for user {user_id} (similarity {similarities[best]:.3f})")
+
+        return copy.deepcopy(result)
+
+    def put(self, user_id: str, vector: List[float], limit: int, result: Dict[str, Any],
+            generation: Tuple[int, Hashable]) -> None:
+        """
+        Remember a query embedding and its search result.
+
+        Args:
+            user_id: User identifier
+            vector: Embedding of the query
+            limit: Maximum number of memories requested
+            result: Mem0 search result
+            generation: Value of generation() taken before the search ran
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            if generation[0] != self._versions.get(user_id):
+                # The user wrote while this search ran
+                return
+
+            entries = self._users.get(user_id)
+            if entries is None or self._generations.get(user_id) != generation:
+                entries = self._users[user_id] = _UserEntries(query.shape[0])
+                self._generations[user_id] = generation
+
+            entries.vectors = np.vstack([entries.vectors, query[None, :]])[-self.max_per_user:]
+            entries.limits = (entries.limits + [limit])[-self.max_per_user:]
+            entries.stored_at = (entries.stored_at + [time.monotonic()])[-self.max_per_user:]
+            entries.results = (entries.results + [copy.deepcopy(result)])[-self.max_per_user:]
+
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                evicted, _ = self._users.popitem(last=False)
+                self._generations.pop(evicted, None)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every cached query for a user after a memory write."""
+        with self._lock:
+            self._versions.bump(user_id, lambda: set(self._users))
+            self._users.pop(user_id, None)
+            self._generations.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of cached queries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = sum(len(entries.results) for entries in self._users.values())
+            stats["users"] = len(self._users)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+HTTP serving entry point for the conversation graph.
+
+Exposes the async conversation pipeline as an ASGI application:
+
+    POST /v1/chat          {"message": "...", "user_id": "..."} -> JSON reply
+    POST /v1/chat/stream   same body, reply streamed as Server-Sent Events
+    GET  /health           liveness plus admission statistics
+    GET  /metrics          hot-path metrics in OpenMetrics text format
+
+Admission control keeps the process responsive under load: at most
+SERVER_MAX_CONCURRENCY turns run at once, at most SERVER_MAX_QUEUE more
+wait for a slot, and each user may have SERVER_PER_USER_CONCURRENCY turns
+in flight. Requests beyond that are shed with 503 (server saturated) or
+429 (user over limit) so a load balancer can retry on another replica.
+
+Usage:
+    python server.py
+    uvicorn server:app --host 0.0.0.0 --port 8000
+"""
+
+import json
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse, Response
+from starlette.routing import Route
+
+from config import Config
+from metrics import get_metrics_registry, start_metrics_exporters, CONTENT_TYPE
+from qdrant_pool import close_qdrant_client
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed by admission control."""
+
+    def __init__(self, status_code: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounded request queue with a global and a per-user concurrency limit."""
+
+    def __init__(self, max_concurrency: int, max_queue: int,
+                 per_user_concurrency: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.per_user_concurrency = per_user_concurrency
+        self.queue_timeout = queue_timeout
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+        self._per_user: Dict[str, int] = {}
+        self._stats = {"admitted": 0, "rejected_saturated": 0, "rejected_user_limit": 0}
+
+    async def acquire(self, user_id: str) -> None:
+        """
+        Wait for a slot for this user's turn.
+
+        Raises:
+            AdmissionRejected: 429 if the user is over its limit, 503 if the
+                queue is full or no slot frees up within the queue timeout
+        """
+        if self._per_user.get(user_id, 0) >= self.per_user_concurrency:
+            self._stats["rejected_user_limit"] += 1
+            raise AdmissionRejected(429, "too many concurrent requests for this user")
+
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self._stats["rejected_saturated"] += 1
+            raise AdmissionRejected(503, "server saturated")
+
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._waiting += 1
+        waiter = asyncio.ensure_future(self._slots.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except BaseException as e:
+            # Timed out or cancelled while waiting (e.g. the client disconnected);
+            # a permit granted at the same moment is handed back
+            if not waiter.cancel() and not waiter.cancelled() and waiter.exception() is None:
+                self._slots.release()
+            self._release_user(user_id)
+            if isinstance(e, asyncio.TimeoutError):
+                self._stats["rejected_saturated"] += 1
+                raise AdmissionRejected(503, "timed out waiting for a free slot")
+            raise
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        self._stats["admitted"] += 1
+
+    def release(self, user_id: str) -> None:
+        """Free the slot taken by acquire()."""
+        self._running -= 1
+        self._slots.release()
+        self._release_user(user_id)
+
+    def _release_user(self, user_id: str) -> None:
+        remaining = self._per_user.get(user_id, 1) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue depth, running turns and admission counters."""
+        return {
+            "running": self._running,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            **self._stats
+        }
+
+
+server_config = Config.get_server_config()
+admission = AdmissionController(
+    max_concurrency=server_config["max_concurrency"],
+    max_queue=server_config["max_queue"],
+    per_user_concurrency=server_config["per_user_concurrency"],
+    queue_timeout=server_config["queue_timeout"]
+)
+get_metrics_registry().gauge(
+    "yiyu_admission", "Turns running and waiting for a slot, and admission counters", ("state",),
+    function=lambda: {key: value for key, value in admission.get_stats().items()
+                      if key not in ("max_concurrency", "max_queue")}
+)
+
+
+def _rejection_response(error: AdmissionRejected) -> JSONResponse:
+    headers = {"Retry-After": "1"} if error.status_code == 503 else None
+    return JSONResponse({"error": error.reason}, status_code=error.status_code, headers=headers)
+
+
+async def _parse_chat_request(request: Request):
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return None, JSONResponse({"error": "invalid JSON body"}, status_code=400)
+    if not isinstance(body, dict):
+        return None, JSONResponse({"error": "JSON body must be an object"}, status_code=400)
+
+    message = str(body.get("message", "")).strip()
+    user_id = str(body.get("user_id", "default_user")).strip() or "default_user"
+    if not message:
+        return None, JSONResponse({"error": "message is required"}, status_code=400)
+    return (message, user_id), None
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that holds an admission slot until it is done.
+
+    The slot is released when the response finishes, fails or the client
+    disconnects, even if the body generator was never iterated.
+    """
+
+    def __init__(self, content, user_id: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self.user_id = user_id
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release(self.user_id)
+
+
+def _turn_payload(turn: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "response": turn["response"],
+        "memories": turn["memories"],
+        "operations": turn["operations"],
+        "time_to_first_token": turn["time_to_first_token"]
+    }
+
+
+async def chat(request: Request):
+    """Run one conversation turn and return the reply as JSON."""
+    from memory_agent import arun_turn
+
+    parsed, error_response = await _parse_chat_request(request)
+    if error_response:
+        return error_response
+    message, user_id = parsed
+
+    try:
+        await admission.acquire(user_id)
+    except AdmissionRejected as e:
+        return _rejection_response(e)
+
+    try:
+        turn = await arun_turn(message, user_id)
+        return JSONResponse(json.loads(json.dumps(_turn_payload(turn), ensure_ascii=False, default=str)))
+    except Exception as e:
+        logger.error(f"Error serving chat for user {user_id}: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        admission.release(user_id)
+
+
+async def chat_stream(request: Request):
+    """Run one conversation turn and stream tokens as Server-Sent Events."""
+    from memory_agent import astream_turn
+
+    parsed, error_response = await _parse_chat_request(request)
+    if error_response:
+        return error_response
+    message, user_id = parsed
+
+    try:
+        await admission.acquire(user_id)
+    except AdmissionRejected as e:
+        return _rejection_response(e)
+
+    async def event_source():
+        try:
+            async for event in astream_turn(message, user_id):
+                if event["type"] == "token":
+                    data = {"content": event["content"]}
+                else:
+                    data = _turn_payload(event)
+                yield f"event: {event['type']}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming chat for user {user_id}: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+
+    return AdmittedStreamingResponse(
+        event_source(),
+        user_id,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def health(request: Request):
+    """Liveness probe with admission statistics."""
+    return JSONResponse({"status": "ok", "admission": admission.get_stats()})
+
+
+async def metrics(request: Request):
+    """Hot-path metrics of this process in OpenMetrics text format."""
+    return Response(get_metrics_registry().render(), media_type=CONTENT_TYPE)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load models and graphs before accepting traffic
+    import memory_agent
+    await asyncio.to_thread(memory_agent.warmup)
+    await memory_agent.get_async_memory()
+    start_metrics_exporters()
+    logger.info("Conversation service ready")
+    yield
+    close_qdrant_client()
+
+
+app = Starlette(
+    routes=[
+        Route("/v1/chat", chat, methods=["POST"]),
+        Route("/v1/chat/stream", chat_stream, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan
+)
+
+
+def main():
+    """Run the service with uvicorn."""
+    import uvicorn
+
+    uvicorn.run(app, host=server_config["host"], port=server_config["port"])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,24 @@
 """
 Setup script for local Qdrant installation and configuration.
 Supports both Docker and native installation methods.
+
+Usage:
+    python setup_qdrant.py              # start Qdrant, then provision
+    python setup_qdrant.py provision    # create/migrate collection and indexes only
+    QDRANT_PATH=./qdrant_local python setup_qdrant.py    # embedded mode, no Docker
 """
 
 import os
 import sys
 import subprocess
 import time
+import argparse
 import requests
 from pathlib import Path
 
+from config import Config
+from qdrant_pool import get_qdrant_client, is_embedded
+
 def check_docker():
     """Check if Docker is available."""
     try:
@@ -90,28 +99,154 @@ def wait_for_qdrant(max_retries=30, delay=2):
     print("❌ Qdrant 服务启动超时")
     return False
 
-def create_qdrant_collection():
-    """Create the conversation memories collection."""
+def get_embedder_dims():
+    """Load the configured embedder and return the size of its vectors."""
+    if Config.get_onnx_embedding_config()["backend"] == "onnx":
+        from onnx_embedder import OnnxEmbedding
+        return OnnxEmbedding().dims
+
+    from sentence_transformers import SentenceTransformer
+
+    embedding_config = Config.get_embedding_config()["config"]
+    model = SentenceTransformer(embedding_config["model"], **embedding_config["model_kwargs"])
+    return model.get_sentence_embedding_dimension()
+
+def ensure_payload_indexes(client, collection_name):
+    """
+    Create the payload indexes Mem0's filters rely on, skipping existing ones.
+
+    user_id gets a tenant-optimized keyword index (vectors of one user are
+    stored together); created_at/updated_at get datetime indexes.
+
+    Returns:
+        Names of the fields whose index was created or upgraded
+    """
+    from qdrant_client.http.models import KeywordIndexParams, PayloadSchemaType
+
+    existing = client.get_collection(collection_name).payload_schema or {}
+    wanted = {
+        "user_id": KeywordIndexParams(type="keyword", is_tenant=True),
+        "created_at": PayloadSchemaType.DATETIME,
+        "updated_at": PayloadSchemaType.DATETIME,
+    }
+
+    created = []
+    for field_name, schema in wanted.items():
+        index = existing.get(field_name)
+        if index is not None:
+            params = getattr(index, "params", None)
+            # A plain keyword index on user_id is upgraded to a tenant index
+            if field_name != "user_id" or getattr(params, "is_tenant", False):
+                continue
+
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=schema,
+            wait=True
+        )
+        created.append(field_name)
+
+    return created
+
+def build_quantization_config(collection_config):
+    """
+    Build the quantization config for QDRANT_QUANTIZATION.
+
+    Returns:
+        ScalarQuantization (int8), BinaryQuantization, or None when disabled
+    """
+    from qdrant_client.http.models import (
+        ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+        BinaryQuantization, BinaryQuantizationConfig
+    )
+
+    mode = collection_config["quantization"]
+    always_ram = collection_config["quantization_always_ram"]
+    if mode == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=always_ram))
+    if mode != "none":
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION mode: {mode}")
+    return None
+
+def create_qdrant_collection(check_embedder=True):
+    """
+    Create or migrate the conversation memories collection.
+
+    Safe to run repeatedly: an existing collection keeps its data, gets its
+    HNSW settings updated and any missing payload indexes created. A vector
+    size that differs from the configuration is reported, not changed,
+    since fixing it means re-embedding every memory.
+
+    Args:
+        check_embedder: Load the embedder and compare its output size with
+            EMBEDDING_DIMS before touching the collection
+    """
     try:
-        from qdrant_client import QdrantClient
-        from qdrant_client.http.models import Distance, VectorParams
+        from qdrant_client.http.models import (
+            Distance, VectorParams, VectorParamsDiff, HnswConfigDiff, CollectionParamsDiff, Disabled
+        )
+
+        client = get_qdrant_client()
+        qdrant_config = Config.get_qdrant_config()["config"]
+        collection_config = Config.get_qdrant_collection_config()
+        collection_name = qdrant_config["collection_name"]
+        dims = qdrant_config["embedding_model_dims"]
 
-        client = QdrantClient(url="http://localhost:6333")
-        collection_name = "conversation_memories"
+        if check_embedder:
+            embedder_dims = get_embedder_dims()
+            if embedder_dims != dims:
+                print(f"❌ 嵌入模型输出 {embedder_dims} 维, 但 EMBEDDING_DIMS={dims}, 请修正配置")
+                return False
+            print(f"✅ 嵌入模型维度校验通过: {dims}")
+
+        hnsw_config = HnswConfigDiff(
+            m=collection_config["hnsw_m"],
+            payload_m=collection_config["hnsw_payload_m"],
+            ef_construct=collection_config["hnsw_ef_construct"]
+        )
+        quantization_config = build_quantization_config(collection_config)
+        on_disk = qdrant_config["on_disk"]
+        on_disk_payload = collection_config["on_disk_payload"]
 
         # Check if collection exists
         collections = client.get_collections().collections
         if any(c.name == collection_name for c in collections):
-            print(f"✅ Collection '{collection_name}' 已存在")
-            return True
+            info = client.get_collection(collection_name)
+            existing_size = info.config.params.vectors.size
+            if existing_size != dims:
+                print(f"❌ Collection '{collection_name}' 的向量维度为 {existing_size}, 配置为 {dims}")
+                print("   需要删除并重建 Collection 后重新写入记忆")
+                return False
 
-        # Create collection
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=1024, distance=Distance.COSINE)
-        )
+            client.update_collection(
+                collection_name=collection_name,
+                vectors_config={"": VectorParamsDiff(on_disk=on_disk)},
+                hnsw_config=hnsw_config,
+                quantization_config=quantization_config or Disabled.DISABLED,
+                collection_params=CollectionParamsDiff(on_disk_payload=on_disk_payload)
+            )
+            print(f"✅ Collection '{collection_name}' 已存在, HNSW/量化/存储配置已更新")
+        else:
+            client.create_collection(
+                collection_name=collection_name,
+                vectors_config=VectorParams(size=dims, distance=Distance.COSINE, on_disk=on_disk),
+                hnsw_config=hnsw_config,
+                quantization_config=quantization_config,
+                on_disk_payload=on_disk_payload
+            )
+            print(f"✅ 成功创建 Collection: {collection_name} ({dims} 维)")
+        print(f"   量化: {collection_config['quantization']}, 向量落盘: {on_disk}, Payload 落盘: {on_disk_payload}")
 
-        print(f"✅ 成功创建 Collection: {collection_name}")
+        created = ensure_payload_indexes(client, collection_name)
+        if created:
+            print(f"✅ 已创建索引: {', '.join(created)}")
+        else:
+            print("✅ 索引已是最新")
         return True
 
     except Exception as e:
@@ -120,15 +255,31 @@ def create_qdrant_collection():
 
 def main():
     """Main setup function."""
+    parser = argparse.ArgumentParser(description="Qdrant 部署与 Collection 配置")
+    parser.add_argument("command", nargs="?", default="setup", choices=["setup", "provision"],
+                        help="setup: 启动 Qdrant 并配置 Collection; provision: 仅创建/迁移 Collection 与索引")
+    parser.add_argument("--skip-embedder-check", action="store_true", help="不加载嵌入模型校验向量维度")
+    args = parser.parse_args()
+    check_embedder = not args.skip_embedder_check
+
+    if args.command == "provision":
+        sys.exit(0 if create_qdrant_collection(check_embedder) else 1)
+
     print("🚀 Qdrant 本地部署设置")
     print("=" * 40)
 
+    # Embedded mode needs no server: the collection lives under QDRANT_PATH
+    if is_embedded():
+        print(f"✅ 使用嵌入式 Qdrant ({Config.get_qdrant_connection_config()['path']}), 无需启动服务")
+        create_qdrant_collection(check_embedder)
+        return
+
     # Check if Qdrant is already running
     try:
         response = requests.get("http://localhost:6333/health", timeout=5)
         if response.status_code == 200:
             print("✅ Qdrant 已在运行!")
-            create_qdrant_collection()
+            create_qdrant_collection(check_embedder)
             return
     except requests.exceptions.RequestException:
         pass
@@ -144,7 +295,7 @@ def main():
         # Wait for service to be ready
         if wait_for_qdrant():
             # Create collection
-            create_qdrant_collection()
+            create_qdrant_collection(check_embedder)
             print("\n🎉 Qdrant 设置完成!")
             print("📍 服务地址: http://localhost:6333")
             print("📊 管理界面: http://localhost:6333/dashboard")
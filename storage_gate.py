@@ -0,0 +1,307 @@
+"""
+Storage gate: decides which interactions are worth a Mem0 add.
+
+A Mem0 add costs an LLM fact-extraction call, usually a memory-update
+call, embeddings and Qdrant upserts, while most chit-chat yields no facts
+at all. Two gates are available (STORAGE_GATE):
+  heuristic  greeting list, personal-keyword list and length thresholds
+  embedding  similarity of the user message to labelled exemplars
+             ("contains personal facts" vs "chit-chat"), computed with
+             the Mem0 embedder that is already loaded for memory search
+
+With STORAGE_GATE_SHADOW=true the embedding gate runs alongside the
+heuristic one and only its decisions are logged and counted; the
+heuristic gate still decides. Every enforced skip is one saved add call.
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Messages whose facts Mem0 should extract
+FACT_EXEMPLARS = [
+    "我叫张伟，今年三十岁",
+    "我是一名医生，在北京工作",
+    "我对花生过敏",
+    "我喜欢周末去爬山",
+    "我不喜欢吃辣的东西",
+    "我住在上海浦东",
+    "我女儿今年上小学一年级",
+    "我正在学日语，准备明年去东京留学",
+    "我养了一只叫豆豆的柯基",
+    "我的生日是五月二十号",
+    "下个月我要去深圳出差一周",
+    "我最近在减肥，每天跑步五公里",
+    "My name is Alice and I work as a designer",
+    "I'm allergic to cats",
+]
+
+# Messages that carry nothing about the user
+CHITCHAT_EXEMPLARS = [
+    "你好",
+    "在吗",
+    "谢谢你",
+    "好的，明白了",
+    "哈哈哈哈",
+    "今天天气怎么样",
+    "给我讲个笑话吧",
+    "你是谁",
+    "再见",
+    "嗯嗯",
+    "帮我解释一下什么是量子力学",
+    "一加一等于几",
+    "hello",
+    "thanks, bye",
+]
+
+gate_decisions = get_metrics_registry().counter(
+    "yiyu_storage_gate_decisions", "Storage gate decisions", ("gate", "mode", "decision")
+)
+saved_add_calls = get_metrics_registry().counter(
+    "yiyu_storage_gate_saved_adds", "Mem0 add calls avoided by the storage gate"
+)
+
+
+class HeuristicGate:
+    """Greeting, keyword and length rules."""
+
+    name = "heuristic"
+    uses_embedder = False
+
+    simple_greetings = ["你好", "hello", "hi", "嗨", "在吗", "在不在", "哈喽", "早上好", "晚上好", "嘿", "嗨嗨"]
+    important_keywords = ["我叫", "我是", "我的名字", "我来自", "我喜欢", "我不喜欢", "我的职业", "我工作", "我学习", "我住"]
+
+    def decide(self, interaction: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Args:
+            interaction: List of message dictionaries
+
+        Returns:
+            {"store": bool, "reason": str, "score": None}
+        """
+        user_message = interaction[0]["content"] if interaction else ""
+        assistant_message = interaction[1]["content"] if len(interaction) > 1 else ""
+
+        # Skip storing for very short or simple interactions
+        if len(user_message.strip()) < 5 or len(assistant_message.strip()) < 10:
+            return {"store": False, "reason": "interaction too short", "score": None}
+
+        # Skip storing for simple greetings that don't contain meaningful information
+        if user_message.strip().lower() in self.simple_greetings and len(assistant_message.strip()) < 30:
+            return {"store": False, "reason": "simple greeting", "score": None}
+
+        # But DO store interactions with important personal information
+        if any(keyword in user_message for keyword in self.important_keywords):
+            return {"store": True, "reason": "important personal information", "score": None}
+        if len(user_message.strip()) < 8 and len(assistant_message.strip()) < 25:
+            return {"store": False, "reason": "short and unimportant", "score": None}
+
+        return {"store": True, "reason": "default", "score": None}
+
+    def prepare(self) -> None:
+        pass
+
+
+class EmbeddingGate:
+    """Scores the user message against fact and chit-chat exemplar embeddings."""
+
+    name = "embedding"
+    uses_embedder = True
+
+    def __init__(self, embed_fn: Callable[[str], List[float]], threshold: float = 0.0,
+                 fact_exemplars: Optional[List[str]] = None, chitchat_exemplars: Optional[List[str]] = None,
+                 top_k: int = 3):
+        """
+        Args:
+            embed_fn: Text -> embedding; the search-path embedder, so the user
+                message is usually already in the embedding cache
+            threshold: Store when (fact similarity - chit-chat similarity) >= threshold
+            fact_exemplars: Messages that should be stored
+            chitchat_exemplars: Messages that should be skipped
+            top_k: Similarities averaged per exemplar class
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.fact_exemplars = fact_exemplars or FACT_EXEMPLARS
+        self.chitchat_exemplars = chitchat_exemplars or CHITCHAT_EXEMPLARS
+        self.top_k = top_k
+        self._matrices = None
+        self._lock = threading.Lock()
+
+    def _unit(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def prepare(self) -> None:
+        """Embed the exemplars (once; also done on the first decision)."""
+        if self._matrices is None:
+            with self._lock:
+                if self._matrices is None:
+                    self._matrices = (
+                        np.stack([self._unit(text) for text in self.fact_exemplars]),
+                        np.stack([self._unit(text) for text in self.chitchat_exemplars]),
+                    )
+
+    def score(self, text: str) -> float:
+        """Mean top-k similarity to fact exemplars minus that to chit-chat exemplars."""
+        self.prepare()
+        facts, chitchat = self._matrices
+        vector = self._unit(text)
+        fact_similarity = np.sort(facts @ vector)[-self.top_k:].mean()
+        chitchat_similarity = np.sort(chitchat @ vector)[-self.top_k:].mean()
+        return float(fact_similarity - chitchat_similarity)
+
+    def decide(self, interaction: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Args:
+            interaction: List of message dictionaries
+
+        Returns:
+            {"store": bool, "reason": str, "score": float or None}
+        """
+        user_message = (interaction[0]["content"] if interaction else "").strip()
+        if not user_message:
+            return {"store": False, "reason": "empty message", "score": None}
+
+        score = self.score(user_message)
+        if score >= self.threshold:
+            return {"store": True, "reason": "personal facts", "score": score}
+        return {"store": False, "reason": "chit-chat", "score": score}
+
+
+class StorageGate:
+    """Applies the enforced gate, runs an optional shadow gate and counts the outcomes."""
+
+    def __init__(self, gate, shadow_gate=None):
+        """
+        Args:
+            gate: Gate whose decisions are enforced
+            shadow_gate: Gate whose decisions are only logged and counted
+        """
+        self.gate = gate
+        self.shadow_gate = shadow_gate
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.skipped = 0
+        self.gate_errors = 0
+        self.shadow_would_skip = 0
+        self.shadow_disagreements = 0
+
+    @property
+    def uses_embedder(self) -> bool:
+        return self.gate.uses_embedder or bool(self.shadow_gate and self.shadow_gate.uses_embedder)
+
+    def prepare(self) -> None:
+        """Load what the gates need ahead of the first decision."""
+        self.gate.prepare()
+        if self.shadow_gate is not None:
+            self.shadow_gate.prepare()
+
+    def _decide(self, gate, interaction: List[Dict[str, str]]) -> Dict[str, Any]:
+        try:
+            return gate.decide(interaction)
+        except Exception as e:
+            # Fail open: a broken gate must not lose memories
+            logger.warning(f"Storage gate '{gate.name}' failed, storing the interaction: {e}")
+            with self._lock:
+                self.gate_errors += 1
+            return {"store": True, "reason": "gate error", "score": None}
+
+    def check(self, interaction: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """
+        Decide whether an interaction is worth the cost of a Mem0 add.
+
+        Args:
+            interaction: List of message dictionaries
+
+        Returns:
+            A "skipped" storage result if the interaction should not be stored,
+            otherwise None
+        """
+        decision = self._decide(self.gate, interaction)
+        gate_decisions.inc(gate=self.gate.name, mode="enforced", decision="store" if decision["store"] else "skip")
+
+        if self.shadow_gate is not None:
+            shadow = self._decide(self.shadow_gate, interaction)
+            score = f"{shadow['score']:.3f}" if shadow["score"] is not None else "-"
+            logger.info(
+                f"Storage gate shadow ({self.shadow_gate.name}): {'store' if shadow['store'] else 'skip'} "
+                f"(reason={shadow['reason']}, score={score}); "
+                f"enforced ({self.gate.name}): {'store' if decision['store'] else 'skip'}"
+            )
+            gate_decisions.inc(gate=self.shadow_gate.name, mode="shadow",
+                               decision="store" if shadow["store"] else "skip")
+            with self._lock:
+                self.shadow_would_skip += not shadow["store"]
+                self.shadow_disagreements += shadow["store"] != decision["store"]
+
+        with self._lock:
+            self.decisions += 1
+            self.skipped += not decision["store"]
+
+        if decision["store"]:
+            return None
+
+        saved_add_calls.inc()
+        logger.info(f"Skipping memory storage: {decision['reason']}")
+        result = {"results": [], "message": f"Skipped: {decision['reason']}"}
+        if decision["score"] is not None:
+            result["gate_score"] = decision["score"]
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "gate": self.gate.name,
+                "shadow_gate": self.shadow_gate.name if self.shadow_gate else None,
+                "decisions": self.decisions,
+                "saved_add_calls": self.skipped,
+                "gate_errors": self.gate_errors,
+                "shadow_would_skip": self.shadow_would_skip,
+                "shadow_disagreements": self.shadow_disagreements,
+            }
+
+
+def load_exemplars(path: str) -> Dict[str, List[str]]:
+    """Read {"store": [...], "skip": [...]} exemplar lists from a JSON file."""
+    with open(path, encoding="utf-8") as f:
+        exemplars = json.load(f)
+    if not exemplars.get("store") or not exemplars.get("skip"):
+        raise ValueError(f"{path} must contain non-empty 'store' and 'skip' lists")
+    return exemplars
+
+
+def build_storage_gate(embed_fn: Callable[[str], List[float]]) -> StorageGate:
+    """
+    Build the storage gate configured by STORAGE_GATE_* settings.
+
+    Args:
+        embed_fn: Text -> embedding, used by the embedding gate
+    """
+    gate_config = Config.get_storage_gate_config()
+    if gate_config["gate"] == "heuristic":
+        return StorageGate(HeuristicGate())
+    if gate_config["gate"] != "embedding":
+        raise ValueError(f"Unknown STORAGE_GATE: {gate_config['gate']}")
+
+    exemplars = load_exemplars(gate_config["exemplars_path"]) if gate_config["exemplars_path"] else {}
+    embedding_gate = EmbeddingGate(
+        embed_fn,
+        threshold=gate_config["threshold"],
+        fact_exemplars=exemplars.get("store"),
+        chitchat_exemplars=exemplars.get("skip")
+    )
+    if gate_config["shadow"]:
+        logger.info("Storage gate: heuristic, embedding gate in shadow mode")
+        return StorageGate(HeuristicGate(), shadow_gate=embedding_gate)
+    logger.info(f"Storage gate: embedding (threshold {gate_config['threshold']:g})")
+    return StorageGate(embedding_gate)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+from starlette.requests import Request
+
+import server
+from server import AdmissionController, AdmissionRejected, AdmittedStreamingResponse
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_per_user_limit_is_rejected_with_429():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=4, max_queue=4, per_user_concurrency=1, queue_timeout=1)
+        await admission.acquire("alice")
+        with pytest.raises(AdmissionRejected) as error:
+            await admission.acquire("alice")
+        assert error.value.status_code == 429
+        admission.release("alice")
+        await admission.acquire("alice")
+
+    run(scenario())
+
+
+def test_queue_timeout_is_rejected_with_503_and_frees_the_user():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=4, per_user_concurrency=2, queue_timeout=0.05)
+        await admission.acquire("alice")
+        with pytest.raises(AdmissionRejected) as error:
+            await admission.acquire("bob")
+        assert error.value.status_code == 503
+        assert admission._per_user == {"alice": 1}
+        stats = admission.get_stats()
+        assert stats["waiting"] == 0 and stats["rejected_saturated"] == 1
+
+    run(scenario())
+
+
+def test_cancelled_wait_releases_the_user_and_keeps_the_slot_count():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=4, per_user_concurrency=2, queue_timeout=5)
+        await admission.acquire("alice")
+        waiting = asyncio.create_task(admission.acquire("bob"))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert admission._per_user == {"alice": 1}
+        assert admission.get_stats()["waiting"] == 0
+        admission.release("alice")
+        # The only slot is free again
+        await asyncio.wait_for(admission.acquire("carol"), timeout=1)
+
+    run(scenario())
+
+
+def test_streaming_response_releases_the_slot_when_sending_fails(monkeypatch):
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=0, per_user_concurrency=1, queue_timeout=1)
+        monkeypatch.setattr(server, "admission", admission)
+        await admission.acquire("alice")
+
+        async def body():
+            yield "event: token\n\n"
+
+        async def receive():
+            await asyncio.sleep(10)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise RuntimeError("client went away")
+
+        response = AdmittedStreamingResponse(body(), "alice", media_type="text/event-stream")
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(RuntimeError):
+            await response(scope, receive, send)
+
+        assert admission.get_stats()["running"] == 0
+        assert admission._per_user == {}
+
+    run(scenario())
+
+
+@pytest.mark.parametrize("body,status", [(b"[]", 400), (b'"x"', 400), (b"{", 400), (b'{"message": " "}', 400)])
+def test_invalid_chat_bodies_are_rejected(body, status):
+    async def scenario():
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+        parsed, error_response = await server._parse_chat_request(request)
+        assert parsed is None
+        assert error_response.status_code == status
+
+    run(scenario())
+
+
+def test_valid_chat_body_is_parsed():
+    async def scenario():
+        async def receive():
+            payload = json.dumps({"message": " hi ", "user_id": ""}).encode()
+            return {"type": "http.request", "body": payload, "more_body": False}
+
+        request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+        parsed, error_response = await server._parse_chat_request(request)
+        assert error_response is None
+        assert parsed == ("hi", "default_user")
+
+    run(scenario())
@@ -0,0 +1,108 @@
+from search_cache import SearchResultCache, UserVersions
+from semantic_cache import SemanticQueryCache
+
+
+def cache_search(cache, user_id, query, result, limit=5):
+    generation = cache.generation(user_id)
+    cache.put(user_id, query, limit, result, generation)
+
+
+def test_search_cache_normalizes_queries_and_returns_copies():
+    cache = SearchResultCache()
+    cache_search(cache, "alice", "What is my  NAME", {"results": [{"memory": "Alice"}]})
+
+    result = cache.get("alice", "what is my name", 5)
+    assert result == {"results": [{"memory": "Alice"}]}
+    result["results"].clear()
+    assert cache.get("alice", "what is my name", 5) == {"results": [{"memory": "Alice"}]}
+    assert cache.get("alice", "what is my name", 3) is None
+
+
+def test_search_cache_invalidation_is_per_user():
+    cache = SearchResultCache()
+    cache_search(cache, "alice", "q", {"results": [1]})
+    cache_search(cache, "bob", "q", {"results": [2]})
+
+    cache.invalidate_user("alice")
+
+    assert cache.get("alice", "q", 5) is None
+    assert cache.get("bob", "q", 5) == {"results": [2]}
+
+
+def test_search_cache_rejects_results_of_searches_that_overlapped_a_write():
+    cache = SearchResultCache()
+    generation = cache.generation("alice")
+    cache.invalidate_user("alice")
+    cache.put("alice", "q", 5, {"results": ["stale"]}, generation)
+
+    assert cache.get("alice", "q", 5) is None
+
+
+def test_search_cache_external_generation_retires_entries():
+    marker = {"alice": 1}
+    cache = SearchResultCache(generation_fn=lambda user_id: marker.get(user_id))
+    cache_search(cache, "alice", "q", {"results": [1]})
+    assert cache.get("alice", "q", 5) is not None
+
+    marker["alice"] = 2
+    assert cache.get("alice", "q", 5) is None
+
+
+def test_search_cache_bounds_tracked_users_and_stays_correct():
+    cache = SearchResultCache(max_entries=4)
+    generation = cache.generation("alice")
+    cache.invalidate_user("alice")
+    for i in range(100):
+        cache.invalidate_user(f"user_{i}")
+
+    assert cache.get_stats()["tracked_users"] <= 8
+    # alice's write was forgotten, but a search that started before it still can't be cached
+    cache.put("alice", "q", 5, {"results": ["stale"]}, generation)
+    assert cache.get("alice", "q", 5) is None
+
+
+def test_user_versions_keep_users_with_cached_results():
+    versions = UserVersions(max_users=4)
+    for user_id in ["a", "b", "c", "d"]:
+        versions.bump(user_id, set)
+    kept = versions.get("a")
+
+    versions.bump("e", lambda: {"a"})
+
+    assert len(versions) <= 4
+    assert versions.get("a") == kept
+
+
+def test_semantic_cache_reuses_results_of_close_queries():
+    cache = SemanticQueryCache(threshold=0.9)
+    generation = cache.generation("alice")
+    cache.put("alice", [1.0, 0.0], 5, {"results": [1]}, generation)
+
+    assert cache.get("alice", [0.99, 0.05], 5) == {"results": [1]}
+    assert cache.get("alice", [0.0, 1.0], 5) is None
+    assert cache.get("alice", [1.0, 0.0], 3) is None
+    assert cache.get("bob", [1.0, 0.0], 5) is None
+
+
+def test_semantic_cache_invalidation_and_overlapping_writes():
+    cache = SemanticQueryCache()
+    generation = cache.generation("alice")
+    cache.put("alice", [1.0, 0.0], 5, {"results": [1]}, generation)
+    cache.invalidate_user("alice")
+    assert cache.get("alice", [1.0, 0.0], 5) is None
+
+    cache.put("alice", [1.0, 0.0], 5, {"results": ["stale"]}, generation)
+    assert cache.get("alice", [1.0, 0.0], 5) is None
+
+
+def test_semantic_cache_evicts_least_recently_used_users():
+    cache = SemanticQueryCache(max_users=2)
+    for user_id in ["a", "b"]:
+        cache.put(user_id, [1.0, 0.0], 5, {"results": [user_id]}, cache.generation(user_id))
+    assert cache.get("a", [1.0, 0.0], 5) is not None
+
+    cache.put("c", [1.0, 0.0], 5, {"results": ["c"]}, cache.generation("c"))
+
+    assert cache.get_stats()["users"] == 2
+    assert cache.get("b", [1.0, 0.0], 5) is None
+    assert cache.get("a", [1.0, 0.0], 5) == {"results": ["a"]}
@@ -0,0 +1,55 @@
+import pytest
+
+from memory_queue import MemoryQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return MemoryQueue(str(tmp_path / "queue.sqlite3"))
+
+
+def message(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_jobs_of_a_user_are_claimed_in_order_one_at_a_time(queue):
+    first = queue.enqueue("alice", message("one"))
+    second = queue.enqueue("alice", message("two"))
+    other = queue.enqueue("bob", message("three"))
+
+    claimed = queue.claim(10)
+    assert [job["id"] for job in claimed] == [first, other]
+    assert claimed[0]["interaction"] == message("one")
+    assert queue.claim(10) == []
+
+    queue.complete(first)
+    assert [job["id"] for job in queue.claim(10)] == [second]
+
+
+def test_excluded_users_are_skipped(queue):
+    queue.enqueue("alice", message("one"))
+    bob = queue.enqueue("bob", message("two"))
+
+    assert [job["id"] for job in queue.claim(10, exclude_users={"alice"})] == [bob]
+
+
+def test_failed_job_is_retried_then_parked_and_keeps_blocking(queue):
+    job = queue.enqueue("alice", message("one"))
+    queue.enqueue("alice", message("two"))
+
+    queue.claim(1)
+    assert queue.fail(job, "boom", retry_delay=0, max_attempts=2)
+    retried = queue.claim(1)
+    assert [claimed["id"] for claimed in retried] == [job]
+    assert retried[0]["attempts"] == 1
+
+    assert not queue.fail(job, "boom", retry_delay=0, max_attempts=2)
+    assert queue.get_stats() == {"pending": 1, "processing": 0, "failed": 1}
+
+
+def test_stale_claims_are_requeued(queue):
+    job = queue.enqueue("alice", message("one"))
+    queue.claim(1)
+
+    assert queue.requeue_stale(visibility_timeout=-1) == 1
+    assert [claimed["id"] for claimed in queue.claim(1)] == [job]
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def test_label_values_and_help_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests", 'Requests per "user"\nand model', ("user_id",))
+    counter.inc(user_id='a"b\\c\nd')
+
+    lines = registry.render().splitlines()
+    assert '# HELP requests Requests per \\"user\\"\\nand model' in lines
+    assert 'requests_total{user_id="a\\"b\\\\c\\nd"} 1.0' in lines
+    assert lines[-1] == "# EOF"
+
+
+def test_histogram_timer_counts_errors_for_sync_and_async_functions():
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "Stage latency", ("stage",), buckets=(0.1, 1.0))
+    errors = registry.counter("stage_errors", "Stage errors", ("stage",))
+
+    @latency.time(errors=errors, stage="search")
+    def search():
+        raise RuntimeError
+
+    @latency.time(errors=errors, stage="search")
+    async def asearch():
+        return 1
+
+    with pytest.raises(RuntimeError):
+        search()
+    assert asyncio.run(asearch()) == 1
+
+    assert latency.summary(stage="search")["count"] == 2
+    assert errors.get(stage="search") == 1
+
+
+def test_gauge_callback_values_are_rendered():
+    registry = MetricsRegistry()
+    registry.gauge("cache_hit_ratio", "Hit ratio", ("cache",), function=lambda: {"search": 0.5})
+
+    assert 'cache_hit_ratio{cache="search"} 0.5' in registry.render().splitlines()
+
+
+def test_registering_a_name_twice_returns_the_metric_or_fails_on_type():
+    registry = MetricsRegistry()
+    counter = registry.counter("turns", "Turns")
+    assert registry.counter("turns", "Turns") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("turns", "Turns")
@@ -0,0 +1,48 @@
+from storage_gate import EmbeddingGate, HeuristicGate, StorageGate
+
+
+def interaction(user, assistant="好的，我已经记住了这条信息，下次聊天时会用到。"):
+    return [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+
+
+def keyword_embed(text):
+    """Two-dimensional stand-in embedder: [personal, chit-chat]."""
+    return [1.0, 0.0] if "我" in text else [0.0, 1.0]
+
+
+def test_heuristic_gate_skips_greetings_and_stores_personal_facts():
+    gate = StorageGate(HeuristicGate())
+
+    assert gate.check(interaction("你好", "你好！")) is not None
+    assert gate.check(interaction("我叫张伟，是一名医生")) is None
+    assert gate.get_stats()["saved_add_calls"] == 1
+
+
+def test_embedding_gate_scores_against_exemplars():
+    gate = EmbeddingGate(keyword_embed, fact_exemplars=["我喜欢爬山"], chitchat_exemplars=["hello"], top_k=1)
+
+    assert gate.decide(interaction("我住在上海"))["store"]
+    skipped = gate.decide(interaction("hello there"))
+    assert not skipped["store"] and skipped["score"] < 0
+
+
+def test_shadow_gate_is_only_counted():
+    shadow = EmbeddingGate(keyword_embed, fact_exemplars=["我"], chitchat_exemplars=["hi"], top_k=1)
+    gate = StorageGate(HeuristicGate(), shadow_gate=shadow)
+
+    assert gate.check(interaction("tell me something interesting about space")) is None
+
+    stats = gate.get_stats()
+    assert stats["shadow_would_skip"] == 1
+    assert stats["shadow_disagreements"] == 1
+    assert stats["saved_add_calls"] == 0
+
+
+def test_failing_gate_stores_the_interaction():
+    def broken_embed(text):
+        raise RuntimeError("embedder unavailable")
+
+    gate = StorageGate(EmbeddingGate(broken_embed))
+
+    assert gate.check(interaction("我喜欢咖啡")) is None
+    assert gate.get_stats()["gate_errors"] == 1
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import trace_sink
+from metrics import MetricsRegistry
+from trace_sink import JSONLTraceStore, SQLiteTraceStore, TraceSink
+
+
+@pytest.fixture(params=["sqlite", "jsonl"])
+def sink(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteTraceStore(str(tmp_path / "traces.sqlite3"))
+    else:
+        store = JSONLTraceStore(str(tmp_path / "traces.jsonl"))
+    return TraceSink(store, flush_interval=0.01)
+
+
+def spans_by_name(sink):
+    assert sink.flush()
+    return {span["name"]: span for span in sink.store.list_spans()}
+
+
+def test_positional_inputs_are_captured_through_stage_timers(sink):
+    stage_latency = MetricsRegistry().histogram("test_stage_seconds", "Stage latency", ("stage",))
+
+    @sink.traceable(name="memory_search")
+    @stage_latency.time(stage="search")
+    def search_memories(query, user_id, limit=5):
+        return {"results": []}
+
+    search_memories("我喜欢咖啡", "alice", limit=5)
+
+    span = spans_by_name(sink)["memory_search"]
+    assert span["inputs_preview"] == "query='我喜欢咖啡', user_id='alice', limit=int"
+    assert span["inputs_size"] == len("我喜欢咖啡") + len("alice")
+    assert span["status"] == "success"
+
+
+def test_var_keyword_arguments_are_listed_one_by_one(sink):
+    @sink.traceable()
+    def handler(message, **options):
+        return message
+
+    handler("hi", mode="fast")
+
+    assert spans_by_name(sink)["handler"]["inputs_preview"] == "message='hi', mode='fast'"
+
+
+def test_nested_spans_share_the_trace_and_record_errors(sink):
+    @sink.traceable(name="inner")
+    async def inner(text):
+        raise ValueError("boom")
+
+    @sink.traceable(name="outer")
+    async def outer(text):
+        try:
+            await inner(text)
+        except ValueError:
+            pass
+
+    asyncio.run(outer("x"))
+
+    spans = spans_by_name(sink)
+    assert spans["inner"]["trace_id"] == spans["outer"]["trace_id"]
+    assert spans["inner"]["parent_id"] == spans["outer"]["id"]
+    assert spans["outer"]["parent_id"] is None
+    assert spans["inner"]["status"] == "error"
+    assert spans["inner"]["error"] == "ValueError: boom"
+
+
+def test_unsampled_traces_are_not_recorded(tmp_path):
+    sink = TraceSink(JSONLTraceStore(str(tmp_path / "traces.jsonl")), sample_rate=0.0)
+
+    @sink.traceable()
+    def handler():
+        return 1
+
+    handler()
+
+    assert sink.flush()
+    assert sink.store.list_spans() == []
+    assert sink.get_stats()["unsampled_traces"] == 1
+
+
+def test_module_decorator_creates_the_sink_on_first_call(monkeypatch, tmp_path):
+    monkeypatch.setattr(trace_sink, "_sink", None)
+    monkeypatch.setenv("TRACE_SINK_FORMAT", "jsonl")
+    monkeypatch.setenv("TRACE_SINK_PATH", str(tmp_path / "traces.jsonl"))
+
+    @trace_sink.traceable(name="lazy")
+    def handler(text):
+        return text
+
+    assert trace_sink._sink is None
+    handler("x")
+    assert trace_sink._sink is not None
+    assert "lazy" in spans_by_name(trace_sink._sink)
+
+
+def test_auto_backend_does_not_trace_without_a_langsmith_key(monkeypatch):
+    from config import Config
+
+    monkeypatch.setenv("TRACE_BACKEND", "auto")
+    monkeypatch.setenv("LANGCHAIN_API_KEY", "")
+    assert Config.get_trace_config()["backend"] == "none"
@@ -0,0 +1,87 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from user_registry import UserRegistry, count_memory_delta, to_utc_isoformat
+
+
+class FakeQdrant:
+    """Serves scroll() from a list of payloads, two points per page."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def scroll(self, collection_name, offset, limit, with_payload, with_vectors):
+        start = offset or 0
+        page = [SimpleNamespace(id=i, payload=payload)
+                for i, payload in enumerate(self.payloads[start:start + 2], start)]
+        next_offset = start + 2 if start + 2 < len(self.payloads) else None
+        return page, next_offset
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return UserRegistry(str(tmp_path / "users.sqlite3"))
+
+
+def test_to_utc_isoformat_normalizes_offsets():
+    assert to_utc_isoformat("2026-01-01T20:00:00-08:00") == "2026-01-02T04:00:00.000000+00:00"
+    assert to_utc_isoformat("2026-01-02T04:00:00Z") == "2026-01-02T04:00:00.000000+00:00"
+    assert to_utc_isoformat("2026-01-02T04:00:00") == "2026-01-02T04:00:00.000000+00:00"
+    assert to_utc_isoformat("yesterday") is None
+    assert to_utc_isoformat(None) is None
+
+
+def test_record_write_counts_and_keeps_latest_activity(registry):
+    registry.record_write("alice", 2, "2026-01-02T05:00:00+00:00")
+    # Earlier in absolute time despite the larger wall-clock string
+    registry.record_write("alice", -1, "2026-01-01T20:00:00-08:00")
+
+    user = registry.get_user("alice")
+    assert user["memory_count"] == 1
+    assert user["interaction_count"] == 2
+    assert user["interaction_count_known"] == 1
+    assert user["last_activity"] == "2026-01-02T05:00:00.000000+00:00"
+
+
+def test_backfill_compares_mem0_timestamps_in_utc(registry):
+    client = FakeQdrant([
+        {"user_id": "alice", "updated_at": "2026-01-01T23:00:00-08:00"},
+        {"user_id": "alice", "created_at": "2026-01-02T06:00:00+00:00"},
+        {"user_id": "bob", "created_at": "2026-01-01T10:00:00-08:00"},
+        {"user_id": "  "},
+    ])
+    registry.record_write("alice", 1, "2026-01-02T05:00:00+00:00")
+
+    assert registry.backfill(client, "memories") == 2
+
+    alice = registry.get_user("alice")
+    assert alice["memory_count"] == 2
+    assert alice["last_activity"] == "2026-01-02T07:00:00.000000+00:00"
+    assert alice["interaction_count_known"] == 0
+    assert registry.get_user("bob")["last_activity"] == "2026-01-01T18:00:00.000000+00:00"
+    assert registry.is_backfilled()
+    assert [user["user_id"] for user in registry.list_users()] == ["alice", "bob"]
+
+
+def test_registry_from_an_earlier_version_is_migrated(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, memory_count INTEGER NOT NULL DEFAULT 0, "
+               "interaction_count INTEGER NOT NULL DEFAULT 0, last_activity TEXT)")
+    db.execute("CREATE TABLE registry_meta (key TEXT PRIMARY KEY, value TEXT)")
+    db.execute("INSERT INTO users VALUES ('alice', 3, 0, '2026-01-01T20:00:00-08:00')")
+    db.execute("INSERT INTO registry_meta VALUES ('backfilled_at', '2026-01-01T00:00:00+00:00')")
+    db.commit()
+    db.close()
+
+    alice = UserRegistry(path).get_user("alice")
+    assert alice["last_activity"] == "2026-01-02T04:00:00.000000+00:00"
+    assert alice["interaction_count_known"] == 0
+
+
+def test_count_memory_delta():
+    result = {"results": [{"event": "ADD"}, {"event": "ADD"}, {"event": "DELETE"}, {"event": "UPDATE"}]}
+    assert count_memory_delta(result) == 1
+    assert count_memory_delta({}) == 0
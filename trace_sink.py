@@ -0,0 +1,502 @@
+"""
+Local trace sink.
+
+Records spans (name, input size, duration, status, parent) of functions
+decorated with memory_agent.conditional_traceable when TRACE_BACKEND is
+"local", so tracing works without a LangSmith key and without a network
+call per span. Spans go through a bounded in-memory queue to a background
+writer that appends them in batches to a SQLite database or a JSONL file;
+when the queue is full, spans are dropped rather than blocking a turn.
+
+Sampling is head-based: whether a trace is recorded is decided once at its
+root span and inherited by every nested span through a ContextVar, so a
+trace is either complete or absent. langsmith_debug.py reads the store
+with `--backend local`.
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import inspect
+import logging
+import sqlite3
+import threading
+from functools import wraps
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# (trace_id, span_id, sampled) of the span running in this context
+_current_span: ContextVar[Optional[Tuple[str, Optional[str], bool]]] = ContextVar("trace_current_span", default=None)
+
+PREVIEW_CHARS = 100
+
+SPAN_FIELDS = ("id", "trace_id", "parent_id", "name", "start_time", "end_time",
+               "duration_ms", "status", "error", "inputs_size", "inputs_preview")
+
+
+def _approx_size(value: Any, depth: int = 3) -> int:
+    """Characters of text in a value, looking a few levels into containers and messages."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if depth <= 0:
+        return 0
+    if isinstance(value, dict):
+        return sum(_approx_size(item, depth - 1) for item in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sum(_approx_size(item, depth - 1) for item in value)
+    content = getattr(value, "content", None)
+    return len(content) if isinstance(content, str) else 0
+
+
+def _bound_arguments(signature: Optional[inspect.Signature], args: tuple,
+                     kwargs: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """(name, value) of a call's arguments; **kwargs are listed one by one."""
+    if signature is not None:
+        try:
+            bound = signature.bind_partial(*args, **kwargs)
+        except TypeError:
+            pass
+        else:
+            values = []
+            for key, value in bound.arguments.items():
+                if signature.parameters[key].kind is inspect.Parameter.VAR_KEYWORD:
+                    values.extend(value.items())
+                else:
+                    values.append((key, value))
+            return values
+    return [(f"arg{i}", value) for i, value in enumerate(args)] + list(kwargs.items())
+
+
+def _preview(value: Any) -> str:
+    if isinstance(value, str):
+        return repr(value[:PREVIEW_CHARS])
+    if isinstance(value, (dict, list, tuple, set)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+class SQLiteTraceStore:
+    """Spans in a local SQLite table, indexed by start time and parent."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spans ("
+            "id TEXT PRIMARY KEY, trace_id TEXT NOT NULL, parent_id TEXT, name TEXT NOT NULL, "
+            "start_time REAL NOT NULL, end_time REAL NOT NULL, duration_ms REAL NOT NULL, "
+            "status TEXT NOT NULL, error TEXT, inputs_size INTEGER, inputs_preview TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS spans_start_time ON spans (start_time)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS spans_parent_id ON spans (parent_id)")
+        self._db.commit()
+
+    def write(self, spans: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO spans ({', '.join(SPAN_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in SPAN_FIELDS)})",
+                [tuple(span.get(field) for field in SPAN_FIELDS) for span in spans]
+            )
+            self._db.commit()
+
+    def list_spans(self, limit: Optional[int] = None, start_time: Optional[float] = None,
+                   parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Spans newest first.
+
+        Args:
+            limit: Maximum number of spans
+            start_time: Only spans started at or after this epoch time
+            parent_id: Only direct children of this span
+        """
+        clauses, params = [], []
+        if start_time is not None:
+            clauses.append("start_time >= ?")
+            params.append(start_time)
+        if parent_id is not None:
+            clauses.append("parent_id = ?")
+            params.append(parent_id)
+        sql = "SELECT * FROM spans"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY start_time DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_spans(self, start_time: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Stream spans oldest first without loading them all, on a separate read connection."""
+        db = sqlite3.connect(self.path)
+        db.row_factory = sqlite3.Row
+        try:
+            cursor = db.execute(
+                "SELECT * FROM spans WHERE start_time >= ? ORDER BY start_time",
+                (start_time if start_time is not None else 0.0,)
+            )
+            for row in cursor:
+                yield dict(row)
+        finally:
+            db.close()
+
+    def latest_cursor(self) -> int:
+        """Cursor positioned after the newest written span."""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(rowid), 0) FROM spans").fetchone()[0]
+
+    def read_since(self, cursor: int, limit: int = 1000) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Spans written after a cursor, in write order.
+
+        Args:
+            cursor: Position returned by latest_cursor() or a previous call
+            limit: Maximum number of spans
+
+        Returns:
+            (spans, cursor positioned after the last returned span)
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, * FROM spans WHERE rowid > ? ORDER BY rowid LIMIT ?", (cursor, limit)
+            ).fetchall()
+        if not rows:
+            return [], cursor
+        return [{key: row[key] for key in SPAN_FIELDS} for row in rows], rows[-1]["rowid"]
+
+    def get_span(self, span_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a span by its id or a unique id prefix."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM spans WHERE id = ? OR id LIKE ? LIMIT 2", (span_id, f"{span_id}%")
+            ).fetchall()
+        exact = [row for row in rows if row["id"] == span_id]
+        if exact:
+            return dict(exact[0])
+        return dict(rows[0]) if len(rows) == 1 else None
+
+
+class JSONLTraceStore:
+    """Spans appended one JSON object per line; reads scan the whole file."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: JSONL file path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, spans: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(span, ensure_ascii=False) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _read_all(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        spans = []
+        with self._lock, open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    # Partially written last line of a crashed process
+                    continue
+        return spans
+
+    def iter_spans(self, start_time: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Stream spans in file (completion) order, one line at a time."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                if start_time is None or span["start_time"] >= start_time:
+                    yield span
+
+    def latest_cursor(self) -> int:
+        """Cursor (byte offset) positioned at the end of the file."""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def read_since(self, cursor: int, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Complete lines appended after a byte offset; same contract as SQLiteTraceStore.read_since."""
+        if not os.path.exists(self.path):
+            return [], 0
+        if os.path.getsize(self.path) < cursor:
+            # File was truncated or replaced
+            cursor = 0
+        with open(self.path, "rb") as f:
+            f.seek(cursor)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        spans = []
+        for line in data[:end].splitlines():
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue
+        return spans, cursor + end
+
+    def list_spans(self, limit: Optional[int] = None, start_time: Optional[float] = None,
+                   parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Spans newest first; same filters as SQLiteTraceStore.list_spans."""
+        spans = [span for span in self._read_all()
+                 if (start_time is None or span["start_time"] >= start_time)
+                 and (parent_id is None or span.get("parent_id") == parent_id)]
+        spans.sort(key=lambda span: span["start_time"], reverse=True)
+        return spans[:limit] if limit is not None else spans
+
+    def get_span(self, span_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a span by its id or a unique id prefix."""
+        matches = [span for span in self._read_all() if span["id"].startswith(span_id)]
+        exact = [span for span in matches if span["id"] == span_id]
+        if exact:
+            return exact[0]
+        return matches[0] if len(matches) == 1 else None
+
+
+def open_trace_store(sink_format: str, path: str):
+    """Open the SQLite or JSONL store at path."""
+    if sink_format == "jsonl":
+        return JSONLTraceStore(path)
+    if sink_format != "sqlite":
+        raise ValueError(f"Unknown TRACE_SINK_FORMAT: {sink_format}")
+    return SQLiteTraceStore(path)
+
+
+class TraceSink:
+    """Records spans of traced functions through a bounded queue and a background writer."""
+
+    def __init__(self, store, sample_rate: float = 1.0, queue_size: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 1.0):
+        """
+        Args:
+            store: SQLiteTraceStore or JSONLTraceStore
+            sample_rate: Fraction of traces recorded, decided at the root span
+            queue_size: Spans buffered before new ones are dropped
+            batch_size: Spans written per store transaction at most
+            flush_interval: Seconds a finished span may wait before it is written
+        """
+        self.store = store
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.unsampled = 0
+        self.written = 0
+        self.write_errors = 0
+        self._thread = threading.Thread(target=self._run, name="trace-sink", daemon=True)
+        self._thread.start()
+
+    def _submit(self, span: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(span)
+            recorded = True
+        except queue.Full:
+            recorded = False
+        with self._stats_lock:
+            if recorded:
+                self.recorded += 1
+            else:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        waiters: List[threading.Event] = []
+        oldest = None
+        while True:
+            timeout = None if oldest is None else max(oldest + self.flush_interval - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                    oldest = oldest or time.monotonic()
+            except queue.Empty:
+                pass
+
+            due = oldest is not None and time.monotonic() - oldest >= self.flush_interval
+            if batch and (len(batch) >= self.batch_size or waiters or due):
+                try:
+                    self.store.write(batch)
+                    with self._stats_lock:
+                        self.written += len(batch)
+                except Exception as e:
+                    logger.warning(f"Failed to write {len(batch)} trace spans: {e}")
+                    with self._stats_lock:
+                        self.write_errors += len(batch)
+                batch, oldest = [], None
+            if not batch:
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every span queued so far is written; False on timeout."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _start_span(self) -> Tuple[Optional[Tuple[str, Optional[str], bool]], Any]:
+        parent = _current_span.get()
+        if parent is None:
+            sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+            if not sampled:
+                with self._stats_lock:
+                    self.unsampled += 1
+            context = (str(uuid.uuid4()), None, sampled)
+        else:
+            context = parent
+        if context[2]:
+            context = (context[0], str(uuid.uuid4()), True)
+        return parent, _current_span.set(context)
+
+    def _finish_span(self, name: str, parent, token, started: float, start_time: float,
+                     error: Optional[BaseException], signature, args, kwargs) -> None:
+        trace_id, span_id, sampled = _current_span.get()
+        _current_span.reset(token)
+        if not sampled:
+            return
+        duration = time.perf_counter() - started
+        values = _bound_arguments(signature, args, kwargs)
+        self._submit({
+            "id": span_id,
+            "trace_id": trace_id,
+            "parent_id": parent[1] if parent else None,
+            "name": name,
+            "start_time": start_time,
+            "end_time": start_time + duration,
+            "duration_ms": duration * 1000,
+            "status": "error" if error is not None else "success",
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "inputs_size": sum(_approx_size(value) for _, value in values),
+            "inputs_preview": ", ".join(f"{key}={_preview(value)}" for key, value in values),
+        })
+
+    def traceable(self, name: Optional[str] = None) -> Callable:
+        """Decorator recording a span per call of a sync or async function."""
+        return _make_traceable(lambda: self, name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "unsampled_traces": self.unsampled,
+                "written": self.written,
+                "write_errors": self.write_errors,
+                "queued": self._queue.qsize(),
+            }
+
+
+def _make_traceable(get_sink: Callable[[], "TraceSink"], name: Optional[str]) -> Callable:
+    def decorator(func):
+        span_name = name or func.__name__
+        # Follows __wrapped__, so the names of the decorated function are
+        # recovered through (*args, **kwargs) wrappers such as stage timers
+        try:
+            signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            signature = None
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                sink = get_sink()
+                parent, token = sink._start_span()
+                start_time, started, error = time.time(), time.perf_counter(), None
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    sink._finish_span(span_name, parent, token, started, start_time,
+                                      error, signature, args, kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            sink = get_sink()
+            parent, token = sink._start_span()
+            start_time, started, error = time.time(), time.perf_counter(), None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                sink._finish_span(span_name, parent, token, started, start_time,
+                                  error, signature, args, kwargs)
+        return wrapper
+    return decorator
+
+
+_sink: Optional[TraceSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_trace_sink() -> TraceSink:
+    """Return the process-wide trace sink configured by TRACE_* settings."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                trace_config = Config.get_trace_config()
+                _sink = TraceSink(
+                    open_trace_store(trace_config["format"], trace_config["path"]),
+                    sample_rate=trace_config["sample_rate"],
+                    queue_size=trace_config["queue_size"],
+                    batch_size=trace_config["batch_size"],
+                    flush_interval=trace_config["flush_interval"]
+                )
+                # Spans still queued when the interpreter exits would be lost with the daemon writer
+                atexit.register(_sink.flush, 2.0)
+                logger.info(f"Local trace sink writing to {trace_config['path']} "
+                            f"(sample rate {trace_config['sample_rate']:g})")
+    return _sink
+
+
+def traceable(name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording spans in the process-wide sink.
+
+    The sink (store file and writer thread) is only created on the first
+    traced call, not when a module decorates its functions.
+    """
+    return _make_traceable(get_trace_sink, name)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Persistent user registry.
+
+Keeps one row per user (memory_count, interaction_count, last_activity) in
+a local SQLite table that the memory storage path updates on every write,
+so listing users is an O(users) read instead of a scroll over every point
+in the Qdrant collection. Timestamps are stored in UTC so they compare
+correctly as strings; users imported by the backfill have memories from
+before the registry, so their interaction_count is marked as not known.
+
+Usage:
+    python user_registry.py backfill   # one-time import from Qdrant
+    python user_registry.py list
+"""
+
+import os
+import sys
+import logging
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from qdrant_pool import get_qdrant_client
+
+logger = logging.getLogger(__name__)
+
+
+def to_utc_isoformat(timestamp: Optional[str]) -> Optional[str]:
+    """
+    Normalize an ISO timestamp to UTC with a fixed-width format.
+
+    Mem0 writes US/Pacific timestamps; naive ones are taken as UTC.
+
+    Returns:
+        The UTC timestamp, or None if it is missing or unparseable
+    """
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+class UserRegistry:
+    """SQLite-backed registry of users that have interacted with the memory store."""
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the registry database.
+
+        Args:
+            path: SQLite file path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "user_id TEXT PRIMARY KEY, "
+            "memory_count INTEGER NOT NULL DEFAULT 0, "
+            "interaction_count INTEGER NOT NULL DEFAULT 0, "
+            "last_activity TEXT, "
+            "interaction_count_known INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS registry_meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._migrate()
+        self._db.commit()
+
+    def _migrate(self) -> None:
+        """Bring registries created by earlier versions up to date."""
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(users)")}
+        if "interaction_count_known" not in columns:
+            # Interactions of backfilled users were never counted
+            backfilled = self._db.execute(
+                "SELECT 1 FROM registry_meta WHERE key = 'backfilled_at'"
+            ).fetchone() is not None
+            self._db.execute(
+                "ALTER TABLE users ADD COLUMN interaction_count_known INTEGER NOT NULL DEFAULT 1"
+            )
+            if backfilled:
+                self._db.execute("UPDATE users SET interaction_count_known = 0")
+
+        # Earlier versions stored Mem0's US/Pacific timestamps next to UTC ones
+        rows = self._db.execute(
+            "SELECT user_id, last_activity FROM users WHERE last_activity IS NOT NULL"
+        ).fetchall()
+        for row in rows:
+            normalized = to_utc_isoformat(row["last_activity"])
+            if normalized != row["last_activity"]:
+                self._db.execute(
+                    "UPDATE users SET last_activity = ? WHERE user_id = ?", (normalized, row["user_id"])
+                )
+
+    def record_write(self, user_id: str, memory_delta: int = 0,
+                     timestamp: Optional[str] = None) -> None:
+        """
+        Record a stored interaction for a user.
+
+        Args:
+            user_id: User identifier
+            memory_delta: Net number of memories added (ADD minus DELETE events)
+            timestamp: ISO timestamp of the write, defaults to now; stored in UTC
+        """
+        timestamp = to_utc_isoformat(timestamp) or datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO users (user_id, memory_count, interaction_count, last_activity) "
+                "VALUES (?, MAX(?, 0), 1, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                # excluded.memory_count is clamped at 0, so the delta is bound again
+                "memory_count = MAX(memory_count + ?, 0), "
+                "interaction_count = interaction_count + 1, "
+                "last_activity = MAX(COALESCE(last_activity, ''), excluded.last_activity)",
+                (user_id, memory_delta, timestamp, memory_delta)
+            )
+            self._db.commit()
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the registry row for a user, or None if unknown."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        """Return all registry rows ordered by most recent activity."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM users ORDER BY last_activity DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_user_ids(self) -> set:
+        """Return the set of known user IDs."""
+        with self._lock:
+            rows = self._db.execute("SELECT user_id FROM users").fetchall()
+        return {row["user_id"] for row in rows}
+
+    def is_backfilled(self) -> bool:
+        """Whether the one-time backfill from Qdrant has completed."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM registry_meta WHERE key = 'backfilled_at'"
+            ).fetchone()
+        return row is not None
+
+    def backfill(self, client: Any, collection_name: str, batch_size: int = 256) -> int:
+        """
+        Rebuild the registry from the points already stored in Qdrant.
+
+        Only the user_id and timestamp payload fields are fetched; vectors
+        are skipped. Existing rows are replaced with the scanned values.
+        Interactions stored before the registry cannot be counted, so the
+        interaction counts of the found users are marked as not known.
+
+        Args:
+            client: QdrantClient instance
+            collection_name: Collection holding the Mem0 memories
+            batch_size: Points per scroll request
+
+        Returns:
+            Number of users found
+        """
+        users: Dict[str, Dict[str, Any]] = {}
+        offset = None
+
+        while True:
+            records, offset = client.scroll(
+                collection_name=collection_name,
+                offset=offset,
+                limit=batch_size,
+                with_payload=["user_id", "created_at", "updated_at"],
+                with_vectors=False
+            )
+
+            for record in records:
+                payload = record.payload or {}
+                user_id = payload.get("user_id")
+                if not isinstance(user_id, str) or not user_id.strip():
+                    continue
+
+                entry = users.setdefault(user_id.strip(), {"memory_count": 0, "last_activity": ""})
+                entry["memory_count"] += 1
+                timestamp = to_utc_isoformat(payload.get("updated_at") or payload.get("created_at")) or ""
+                if timestamp > entry["last_activity"]:
+                    entry["last_activity"] = timestamp
+
+            if offset is None:
+                break
+
+        with self._lock:
+            for user_id, entry in users.items():
+                self._db.execute(
+                    "INSERT INTO users (user_id, memory_count, interaction_count, last_activity, "
+                    "interaction_count_known) VALUES (?, ?, 0, ?, 0) "
+                    "ON CONFLICT(user_id) DO UPDATE SET "
+                    "memory_count = excluded.memory_count, "
+                    "interaction_count_known = 0, "
+                    "last_activity = MAX(COALESCE(last_activity, ''), excluded.last_activity)",
+                    (user_id, entry["memory_count"], entry["last_activity"] or None)
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO registry_meta (key, value) VALUES ('backfilled_at', ?)",
+                (datetime.now(timezone.utc).isoformat(),)
+            )
+            self._db.commit()
+
+        logger.info(f"Backfilled {len(users)} users from collection '{collection_name}'")
+        return len(users)
+
+
+_registry: Optional[UserRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_user_registry() -> UserRegistry:
+    """Return the process-wide user registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = UserRegistry(Config.get_user_registry_config()["path"])
+    return _registry
+
+
+def count_memory_delta(memory_result: Dict[str, Any]) -> int:
+    """Net number of memories created by a Mem0 add() result."""
+    delta = 0
+    for item in memory_result.get("results", []) if memory_result else []:
+        event = item.get("event")
+        if event == "ADD":
+            delta += 1
+        elif event == "DELETE":
+            delta -= 1
+    return delta
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="用户注册表管理工具")
+    parser.add_argument("command", choices=["backfill", "list"], help="要执行的命令")
+    args = parser.parse_args()
+
+    registry = get_user_registry()
+
+    if args.command == "backfill":
+        collection_name = Config.get_qdrant_config()["config"]["collection_name"]
+        try:
+            count = registry.backfill(get_qdrant_client(), collection_name)
+        except Exception as e:
+            print(f"❌ 回填失败: {e}")
+            sys.exit(1)
+        print(f"✅ 已从 '{collection_name}' 回填 {count} 个用户")
+    elif args.command == "list":
+        users = registry.list_users()
+        if not users:
+            print("📭 注册表中没有用户")
+            return
+        for user in users:
+            writes = f"{user['interaction_count']} 次写入" if user["interaction_count_known"] else "写入次数未知"
+            print(f"  • {user['user_id']}: {user['memory_count']} 条记忆, "
+                  f"{writes}, 最近活动 {user['last_activity'] or '未知'}")
+
+
+if __name__ == "__main__":
+    main()